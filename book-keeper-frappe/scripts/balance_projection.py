@@ -0,0 +1,586 @@
+"""
+Balance Projection
+Keeps a local, read-only view of book-keeper account balances, fed from its ledger events.
+
+book-keeper publishes ledger events to the JetStream stream book_keeper_stream on the
+subjects bk.events.<EventType> (NATS_STREAM_SUBJECT in develop.yaml). A
+ProjectionSubscriber reads them in stream order and applies them to a BalanceProjection.
+Balance reads are then dictionary lookups that take microseconds, instead of an HTTP
+round trip to get_account_balances:
+
+    projection = BalanceProjection("/var/lib/app/balances.db")
+    subscriber = ProjectionSubscriber(projection, NatsEventSource("nats://localhost:4222"))
+    subscriber.start()
+    ...
+    rows = projection.get_account_balances(tenant_id, ["cash", "revenue"])
+
+The projection is eventually consistent: it trails book-keeper by the event delivery
+delay. Reads that must observe a write the caller just made should still go to the API.
+
+Balances follow the TigerBeetle convention used by list_accounts.py:
+credits_posted - debits_posted. A limiter refill credits each refilled account and
+debits the source of funds account by the same amount.
+
+Events are decoded by parse_ledger_event, which reads the shapes the HTTP API accepts
+(tenant_id, debit_legs/credit_legs, accounts_to_refill) from the event payload. Pass
+decoder= to BalanceProjection if the published payloads differ.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from book_keeper_client import logger
+
+try:
+    import nats
+    from nats.js.api import ConsumerConfig, DeliverPolicy
+except ImportError:
+    # nats-py is only needed for NatsEventSource
+    nats = None
+
+try:
+    import orjson
+except ImportError:
+    # Optional faster JSON decoder; the standard library is used without it
+    orjson = None
+
+# (sequence, subject, data) as delivered by an event source
+RawEvent = Tuple[int, str, bytes]
+# (account_code, currency, amount): credits are positive, debits negative
+Posting = Tuple[str, str, int]
+
+
+def _json_loads(data: Any) -> Any:
+    if isinstance(data, (dict, list)):
+        return data
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+# --- Event Decoding ---
+
+
+class LedgerEvent:
+    """
+    A decoded ledger event.
+
+    kind is one of:
+        "posted":  postings were applied to posted balances
+        "pending": postings were reserved (pending balances) under entry_id
+        "commit":  the pending entry entry_id was posted
+        "void":    the pending entry entry_id was voided or expired
+        "ignored": the event does not move balances (e.g. account created)
+    """
+
+    __slots__ = ("event_type", "kind", "tenant_id", "entry_id", "entry_date", "postings")
+
+    def __init__(
+        self,
+        event_type: str,
+        kind: str,
+        tenant_id: Optional[str] = None,
+        entry_id: Optional[str] = None,
+        entry_date: Optional[str] = None,
+        postings: Optional[List[Posting]] = None,
+    ):
+        self.event_type = event_type
+        self.kind = kind
+        self.tenant_id = tenant_id
+        self.entry_id = entry_id
+        self.entry_date = entry_date
+        self.postings = postings or []
+
+    def __repr__(self) -> str:
+        return f"LedgerEvent({self.event_type!r}, {self.kind!r}, {self.tenant_id!r}, postings={len(self.postings)})"
+
+
+def _event_kind(event_type: str, payload: Dict[str, Any]) -> str:
+    name = event_type.lower()
+    if "void" in name or "expire" in name or "cancel" in name:
+        return "void"
+    if "pending" in name or "reserv" in name:
+        return "commit" if "commit" in name or "post" in name else "pending"
+    if "accounts_to_refill" in payload or "debit_legs" in payload or "credit_legs" in payload:
+        return "posted"
+    return "ignored"
+
+
+def _payload_postings(payload: Dict[str, Any]) -> List[Posting]:
+    postings = []
+    for leg in payload.get("debit_legs") or ():
+        postings.append((leg["account_code"], leg["currency"], -int(leg["amount"])))
+    for leg in payload.get("credit_legs") or ():
+        postings.append((leg["account_code"], leg["currency"], int(leg["amount"])))
+
+    source = payload.get("source_of_funds_account_code")
+    for refill in payload.get("accounts_to_refill") or ():
+        amount = int(refill["amount"])
+        postings.append((refill["account_code"], refill["currency"], amount))
+        if source:
+            postings.append((source, refill["currency"], -amount))
+    return postings
+
+
+def parse_ledger_event(subject: str, data: Any) -> LedgerEvent:
+    """Decodes a ledger event published on subject.
+
+    The event type is taken from the payload's "event_type" or "type" field, falling
+    back to the last subject token (bk.events.JournalEntryPosted -> JournalEntryPosted).
+    A payload wrapped as {"event_type": ..., "data": {...}} is unwrapped.
+
+    Raises:
+        ValueError: The payload is not valid JSON or a leg is malformed
+    """
+    try:
+        payload = _json_loads(data)
+    except ValueError as e:
+        raise ValueError(f"Invalid event payload on {subject}: {e}") from e
+    if not isinstance(payload, dict):
+        raise ValueError(f"Invalid event payload on {subject}: expected an object")
+
+    event_type = payload.get("event_type") or payload.get("type") or subject.rsplit(".", 1)[-1]
+    body = payload.get("data")
+    if isinstance(body, dict):
+        payload = {**body, "tenant_id": body.get("tenant_id", payload.get("tenant_id"))}
+
+    kind = _event_kind(event_type, payload)
+    if kind == "ignored":
+        return LedgerEvent(event_type, kind, payload.get("tenant_id"))
+
+    try:
+        postings = _payload_postings(payload)
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid leg in {event_type} event: {e!r}") from e
+
+    return LedgerEvent(
+        event_type,
+        kind,
+        payload.get("tenant_id"),
+        payload.get("journal_id") or payload.get("entry_id") or payload.get("id"),
+        payload.get("entry_date"),
+        postings,
+    )
+
+
+# --- Projection ---
+
+
+class BalanceProjection:
+    """
+    Materialized view of balances per (tenant_id, account_code), built from ledger events.
+
+    Reads (balance, account, get_account_balances) are lock-free dictionary lookups.
+    Writes go through apply(), which applies a batch of events in stream order.
+
+    Every applied event advances last_sequence. Events at or below it are skipped, so
+    redeliveries are harmless and a restarted subscriber resumes from
+    last_sequence + 1. An event whose sequence jumps past last_sequence + 1 means the
+    events in between are gone from the stream (e.g. removed by its retention limits);
+    the missing range is recorded in gaps and the balances of the accounts they touched
+    may be wrong until the projection is rebuilt.
+
+    With path the view is persisted to SQLite (in the same transaction as
+    last_sequence) and loaded back into memory on startup. Without it the view lives
+    in memory only and is rebuilt from the start of the stream on restart.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        synchronous: str = "NORMAL",
+        decoder: Callable[[str, Any], LedgerEvent] = parse_ledger_event,
+    ):
+        self.path = path
+        self.decoder = decoder
+        self.last_sequence = 0
+        self.gaps: List[Tuple[int, int]] = []
+        # (tenant_id, account_code) -> (currency, debits_posted, credits_posted, debits_pending, credits_pending)
+        self._accounts: Dict[Tuple[str, str], Tuple[str, int, int, int, int]] = {}
+        self._pending: Dict[Tuple[str, str], List[Posting]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"events": 0, "ignored": 0, "undecodable": 0, "unmatched": 0, "duplicates": 0}
+        self._conn: Optional[sqlite3.Connection] = None
+        if path is not None:
+            self._open(synchronous)
+
+    def _open(self, synchronous: str) -> None:
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={synchronous}")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS balances ("
+            " tenant_id TEXT NOT NULL, account_code TEXT NOT NULL, currency TEXT NOT NULL,"
+            " debits_posted INTEGER NOT NULL, credits_posted INTEGER NOT NULL,"
+            " debits_pending INTEGER NOT NULL, credits_pending INTEGER NOT NULL,"
+            " PRIMARY KEY (tenant_id, account_code));"
+            "CREATE TABLE IF NOT EXISTS pending_entries ("
+            " tenant_id TEXT NOT NULL, entry_id TEXT NOT NULL, postings TEXT NOT NULL,"
+            " PRIMARY KEY (tenant_id, entry_id));"
+            "CREATE TABLE IF NOT EXISTS gaps (first_sequence INTEGER PRIMARY KEY, last_sequence INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS projection_state (key TEXT PRIMARY KEY, value INTEGER NOT NULL);"
+        )
+        for tenant_id, code, currency, dp, cp, dpend, cpend in self._conn.execute("SELECT * FROM balances"):
+            self._accounts[(tenant_id, code)] = (currency, dp, cp, dpend, cpend)
+        for tenant_id, entry_id, postings in self._conn.execute("SELECT * FROM pending_entries"):
+            self._pending[(tenant_id, entry_id)] = [tuple(p) for p in json.loads(postings)]
+        self.gaps = [tuple(row) for row in self._conn.execute("SELECT * FROM gaps ORDER BY first_sequence")]
+        row = self._conn.execute("SELECT value FROM projection_state WHERE key = 'last_sequence'").fetchone()
+        self.last_sequence = row[0] if row else 0
+
+    # --- Reads ---
+
+    def balance(self, tenant_id: str, account_code: str) -> Optional[int]:
+        """Returns the posted balance, or None if no event has touched the account."""
+        account = self._accounts.get((tenant_id, account_code))
+        return None if account is None else account[2] - account[1]
+
+    def account(self, tenant_id: str, account_code: str) -> Optional[Dict[str, Any]]:
+        """Returns the account's balance and posted/pending totals, or None if unknown."""
+        account = self._accounts.get((tenant_id, account_code))
+        if account is None:
+            return None
+        currency, debits_posted, credits_posted, debits_pending, credits_pending = account
+        return {
+            "account_code": account_code,
+            "currency": currency,
+            "balance": credits_posted - debits_posted,
+            "debits_posted": debits_posted,
+            "credits_posted": credits_posted,
+            "debits_pending": debits_pending,
+            "credits_pending": credits_pending,
+        }
+
+    def get_account_balances(self, tenant_id: str, account_codes: List[str]) -> List[Dict[str, Any]]:
+        """Local counterpart of BookKeeperClient.get_account_balances.
+
+        Returns rows of {"account_code", "balance", "currency"} in input order; accounts no
+        event has touched are left out.
+        """
+        rows = []
+        for code in account_codes:
+            account = self._accounts.get((tenant_id, code))
+            if account is not None:
+                rows.append({"account_code": code, "balance": account[2] - account[1], "currency": account[0]})
+        return rows
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "last_sequence": self.last_sequence,
+                "accounts": len(self._accounts),
+                "pending_entries": len(self._pending),
+                "gaps": list(self.gaps),
+            }
+
+    # --- Writes ---
+
+    def _post(self, tenant_id: str, postings: List[Posting], posted: int, pending: int, touched: set) -> None:
+        """Adds each posting's amount times posted to posted and times pending to pending totals."""
+        for code, currency, amount in postings:
+            key = (tenant_id, code)
+            _, dp, cp, dpend, cpend = self._accounts.get(key) or (currency, 0, 0, 0, 0)
+            if amount < 0:
+                dp, dpend = dp - amount * posted, dpend - amount * pending
+            else:
+                cp, cpend = cp + amount * posted, cpend + amount * pending
+            self._accounts[key] = (currency, dp, cp, dpend, cpend)
+            touched.add(key)
+
+    def _apply_event(self, sequence: int, event: LedgerEvent, touched: set, pending_changes: Dict) -> None:
+        if event.kind == "ignored" or event.tenant_id is None:
+            self._stats["ignored"] += 1
+            return
+
+        tenant_id = event.tenant_id
+        if event.kind == "posted":
+            self._post(tenant_id, event.postings, 1, 0, touched)
+            return
+
+        key = (tenant_id, str(event.entry_id))
+        if event.kind == "pending":
+            if event.entry_id is None:
+                self._stats["unmatched"] += 1
+                logger.warning("Projection: pending event %s has no entry id", sequence)
+                return
+            self._pending[key] = event.postings
+            pending_changes[key] = event.postings
+            self._post(tenant_id, event.postings, 0, 1, touched)
+            return
+
+        reserved = self._pending.pop(key, None)
+        pending_changes[key] = None
+        if reserved is not None:
+            self._post(tenant_id, reserved, 0, -1, touched)
+        if event.kind == "commit":
+            postings = event.postings or reserved
+            if postings is None:
+                self._stats["unmatched"] += 1
+                logger.warning("Projection: event %s commits unknown pending entry %s", sequence, event.entry_id)
+                return
+            self._post(tenant_id, postings, 1, 0, touched)
+
+    def apply(self, events: Iterable[RawEvent]) -> int:
+        """Applies (sequence, subject, data) events in sequence order. Returns the number applied.
+
+        Events that cannot be decoded are logged and skipped, so one bad payload does
+        not stall the projection.
+        """
+        applied = 0
+        touched: set = set()
+        pending_changes: Dict[Tuple[str, str], Optional[List[Posting]]] = {}
+        new_gaps = []
+        with self._lock:
+            for sequence, subject, data in events:
+                if sequence <= self.last_sequence:
+                    self._stats["duplicates"] += 1
+                    continue
+                if sequence > self.last_sequence + 1:
+                    gap = (self.last_sequence + 1, sequence - 1)
+                    new_gaps.append(gap)
+                    self.gaps.append(gap)
+                    logger.error("Projection: events %s-%s are missing from the stream", gap[0], gap[1])
+                self.last_sequence = sequence
+
+                try:
+                    event = self.decoder(subject, data)
+                except ValueError as e:
+                    self._stats["undecodable"] += 1
+                    logger.error("Projection: skipping event %s: %s", sequence, e)
+                    continue
+                self._apply_event(sequence, event, touched, pending_changes)
+                self._stats["events"] += 1
+                applied += 1
+
+            if self._conn is not None and (touched or pending_changes or new_gaps or applied):
+                self._persist(touched, pending_changes, new_gaps)
+        return applied
+
+    def _persist(self, touched: set, pending_changes: Dict, new_gaps: List[Tuple[int, int]]) -> None:
+        conn = self._conn
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO balances VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [key + self._accounts[key] for key in touched],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO pending_entries VALUES (?, ?, ?)",
+                [key + (json.dumps(p),) for key, p in pending_changes.items() if p is not None],
+            )
+            conn.executemany(
+                "DELETE FROM pending_entries WHERE tenant_id = ? AND entry_id = ?",
+                [key for key, p in pending_changes.items() if p is None],
+            )
+            conn.executemany("INSERT OR REPLACE INTO gaps VALUES (?, ?)", new_gaps)
+            conn.execute(
+                "INSERT OR REPLACE INTO projection_state VALUES ('last_sequence', ?)", (self.last_sequence,)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# --- Event Sources ---
+
+
+class InMemoryEventSource:
+    """
+    Stand-in for the JetStream stream, for tests and local development.
+
+    publish() assigns consecutive sequence numbers like JetStream does; purge() drops
+    the oldest events the way stream retention limits do.
+    """
+
+    def __init__(self):
+        self._events: List[RawEvent] = []
+        self._first_sequence = 1
+        self._cond = threading.Condition()
+
+    def publish(self, subject: str, payload: Any) -> int:
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        with self._cond:
+            sequence = self._first_sequence + len(self._events)
+            self._events.append((sequence, subject, data))
+            self._cond.notify_all()
+        return sequence
+
+    def purge(self, up_to_sequence: int) -> None:
+        """Drops events up to and including up_to_sequence."""
+        with self._cond:
+            drop = max(0, min(up_to_sequence - self._first_sequence + 1, len(self._events)))
+            del self._events[:drop]
+            self._first_sequence += drop
+
+    def _read(self, start_sequence: int, max_events: int, timeout: float) -> List[RawEvent]:
+        with self._cond:
+            index = max(0, start_sequence - self._first_sequence)
+            if index >= len(self._events):
+                self._cond.wait(timeout)
+                index = max(0, start_sequence - self._first_sequence)
+            return self._events[index : index + max_events]
+
+    async def fetch(self, start_sequence: int, max_events: int, timeout: float) -> List[RawEvent]:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self._read, start_sequence, max_events, timeout
+        )
+
+    async def close(self) -> None:
+        pass
+
+
+class NatsEventSource:
+    """
+    Reads book-keeper's ledger events from JetStream with an ordered consumer.
+
+    The consumer is ephemeral and starts at the sequence the projection asks for, so it
+    does not interfere with book-keeper's own durable consumers (projector_general_ledger)
+    and needs no acknowledgements. Requires nats-py (pip install nats-py).
+    """
+
+    def __init__(
+        self,
+        servers: Any = "nats://localhost:4222",
+        stream: str = "book_keeper_stream",
+        subject: str = "bk.events.>",
+        **connect_options: Any,
+    ):
+        if nats is None:
+            raise ImportError("nats-py is required for NatsEventSource (pip install nats-py)")
+        self.servers = servers
+        self.stream = stream
+        self.subject = subject
+        self.connect_options = connect_options
+        self._nc = None
+        self._sub = None
+        self._next_sequence = 0
+
+    async def _subscribe(self, start_sequence: int) -> None:
+        if self._nc is None or self._nc.is_closed:
+            self._nc = await nats.connect(self.servers, **self.connect_options)
+        if self._sub is not None:
+            await self._sub.unsubscribe()
+        config = ConsumerConfig(deliver_policy=DeliverPolicy.BY_START_SEQUENCE, opt_start_seq=max(start_sequence, 1))
+        self._sub = await self._nc.jetstream().subscribe(
+            self.subject, stream=self.stream, ordered_consumer=True, config=config
+        )
+        self._next_sequence = start_sequence
+
+    async def fetch(self, start_sequence: int, max_events: int, timeout: float) -> List[RawEvent]:
+        if self._sub is None or start_sequence != self._next_sequence:
+            await self._subscribe(start_sequence)
+
+        try:
+            messages = [await self._sub.next_msg(timeout=timeout)]
+        except nats.errors.TimeoutError:
+            return []
+        while len(messages) < max_events and self._sub.pending_msgs:
+            messages.append(await self._sub.next_msg(timeout=timeout))
+
+        events = [(msg.metadata.sequence.stream, msg.subject, msg.data) for msg in messages]
+        self._next_sequence = events[-1][0] + 1
+        return events
+
+    async def close(self) -> None:
+        sub, nc, self._sub, self._nc = self._sub, self._nc, None, None
+        if sub is not None:
+            try:
+                await sub.unsubscribe()
+            except Exception:
+                pass
+        if nc is not None:
+            await nc.close()
+
+
+# --- Subscriber ---
+
+
+class ProjectionSubscriber:
+    """
+    Feeds a BalanceProjection from an event source on a background thread.
+
+    Each fetch asks the source for the events after projection.last_sequence, so
+    catching up after a restart, a reconnect or a redelivery is the same code path
+    as following the live stream. Source errors are logged and retried with
+    exponential backoff up to max_backoff seconds.
+    """
+
+    def __init__(
+        self,
+        projection: BalanceProjection,
+        source: Any,
+        batch_size: int = 512,
+        fetch_timeout: float = 0.5,
+        max_backoff: float = 10.0,
+    ):
+        self.projection = projection
+        self.source = source
+        self.batch_size = batch_size
+        self.fetch_timeout = fetch_timeout
+        self.max_backoff = max_backoff
+        self.caught_up = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"fetches": 0, "errors": 0, "last_event_at": None}
+
+    async def run(self) -> None:
+        """Applies events until stop() is called."""
+        backoff = 0.0
+        try:
+            while not self._stop.is_set():
+                try:
+                    events = await self.source.fetch(
+                        self.projection.last_sequence + 1, self.batch_size, self.fetch_timeout
+                    )
+                except Exception as e:
+                    self._stats["errors"] += 1
+                    backoff = min(max(backoff * 2, 0.1), self.max_backoff)
+                    logger.warning("Projection: event fetch failed (%r), retrying in %.1fs", e, backoff)
+                    try:
+                        await self.source.close()
+                    except Exception:
+                        pass
+                    await asyncio.sleep(backoff)
+                    continue
+
+                backoff = 0.0
+                self._stats["fetches"] += 1
+                if not events:
+                    self.caught_up.set()
+                    continue
+                self.projection.apply(events)
+                self._stats["last_event_at"] = time.time()
+                if len(events) < self.batch_size:
+                    self.caught_up.set()
+        finally:
+            await self.source.close()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=asyncio.run, args=(self.run(),), name="balance-projection", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout if timeout is not None else self.fetch_timeout + 5.0)
+            self._thread = None
+
+    def wait_caught_up(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until the subscriber has read to the end of the stream once."""
+        return self.caught_up.wait(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "caught_up": self.caught_up.is_set(), **self.projection.stats()}
@@ -1,9 +1,50 @@
+import contextvars
+import itertools
 import json
 import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+if TYPE_CHECKING:
+    from book_keeper_outbox import LedgerOutbox
+
+try:
+    import httpx
+except ImportError:
+    # httpx is only needed for AsyncBookKeeperClient
+    httpx = None
+
+try:
+    from book_keeper_transports import ASGITransport, UnixSocketTransport  # noqa: F401
+except ImportError:
+    # The local transports live in a sibling module; a vendored copy of this file works without it
+    ASGITransport = UnixSocketTransport = None
+
+try:
+    import orjson
+except ImportError:
+    # Optional faster JSON encoder; the standard library is used without it
+    orjson = None
+
+try:
+    from opentelemetry import propagate as otel_propagate
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    # Tracing is optional; without opentelemetry-api requests are not traced
+    otel_trace = None
 
 try:
     import frappe
@@ -28,6 +69,23 @@ def get_current_entry_date() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%d")
 
 
+_compact_json_encoder = json.JSONEncoder(separators=(",", ":"))
+
+
+def _json_dumps(data: Any) -> bytes:
+    """Encodes a request body straight to UTF-8 bytes, using orjson when it is installed.
+
+    Falls back to the standard library for what orjson refuses, e.g. u128 amounts
+    and max_balance values beyond 64 bits.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(data)
+        except orjson.JSONEncodeError:
+            pass
+    return _compact_json_encoder.encode(data).encode("utf-8")
+
+
 # --- Data Model Structures ---
 
 
@@ -38,6 +96,10 @@ class LedgerAccount:
     CREDITS_MUST_NOT_EXCEED_DEBITS = 256
     DEBITS_MUST_NOT_EXCEED_CREDITS = 512
 
+    # Slotted models: no per-instance __dict__, which matters when provisioning or
+    # posting in bulk builds hundreds of thousands of these.
+    __slots__ = ("code", "name", "type", "max_balance", "flags")
+
     def __init__(
         self,
         code: str,
@@ -62,6 +124,8 @@ class LedgerAccount:
 
 
 class JournalLeg:
+    __slots__ = ("account_code", "amount", "currency")
+
     def __init__(self, account_code: str, amount: int, currency: str):
         self.account_code = account_code
         self.amount = amount
@@ -72,18 +136,1030 @@ class JournalLeg:
 
 
 class RefillAccount:
+    __slots__ = ("account_code", "amount", "currency")
+
     def __init__(self, account_code: str, amount: int, currency: str):
         self.account_code = account_code
         self.amount = amount
         self.currency = currency
 
+    def to_dict(self) -> Dict[str, Any]:
+        return {"account_code": self.account_code, "amount": self.amount, "currency": self.currency}
 
-# --- Main Client Class (Updated entry_date defaults) ---
 
+class JournalEntry:
+    """A journal entry (or compound transfer when compound=True) for bulk submission."""
+
+    __slots__ = ("narration", "debit_legs", "credit_legs", "entry_date", "compound", "idempotency_key")
+
+    def __init__(
+        self,
+        narration: str,
+        debit_legs: List[JournalLeg],
+        credit_legs: List[JournalLeg],
+        entry_date: Optional[str] = None,
+        compound: bool = False,
+        idempotency_key: Optional[str] = None,
+    ):
+        self.narration = narration
+        self.debit_legs = debit_legs
+        self.credit_legs = credit_legs
+        self.entry_date = entry_date
+        self.compound = compound
+        self.idempotency_key = idempotency_key
 
-class BookKeeperClient:
+
+class PendingReservation:
+    """A pending entry created by BookKeeperClient.two_phase.
+
+    Call cancel() inside the block to void the reservation instead of committing it
+    without raising an exception.
     """
-    A client for interacting with the book-keeper REST API.
+
+    __slots__ = ("entry_id", "compound", "body", "status_code", "cancelled")
+
+    def __init__(self, entry_id: str, compound: bool, body: Dict[str, Any], status_code: int):
+        self.entry_id = entry_id
+        self.compound = compound
+        self.body = body
+        self.status_code = status_code
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class BulkResult:
+    """Outcome of one item of a bulk call.
+
+    index is the position of the item in the input. status_code is None when no
+    HTTP response was received (e.g. connection error).
+    """
+
+    __slots__ = ("index", "status_code", "body", "error")
+
+    def __init__(
+        self,
+        index: int,
+        status_code: Optional[int],
+        body: Any = None,
+        error: Optional[str] = None,
+    ):
+        self.index = index
+        self.status_code = status_code
+        self.body = body
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self) -> str:
+        return f"BulkResult(index={self.index}, status_code={self.status_code}, error={self.error!r})"
+
+
+# --- Client-side Validation ---
+
+
+class LedgerValidationError(ValueError):
+    """Raised before sending an entry that book-keeper would reject anyway."""
+
+
+def _validate_leg(side: str, leg: JournalLeg) -> None:
+    amount = leg.amount
+    # type() rather than isinstance() so that True/False are not accepted as 1/0.
+    if type(amount) is not int or amount < 0:
+        raise LedgerValidationError(
+            f"Invalid {side} amount {amount!r} for {leg.account_code!r}: must be a non-negative integer"
+        )
+    if not leg.account_code:
+        raise LedgerValidationError(f"A {side} leg has no account_code")
+    if not leg.currency:
+        raise LedgerValidationError(f"The {side} leg for {leg.account_code!r} has no currency")
+
+
+def validate_journal_legs(debit_legs: List[JournalLeg], credit_legs: List[JournalLeg]) -> None:
+    """Checks that an entry can be accepted before spending a round trip on it.
+
+    Both sides must have legs, every leg needs an account code, a currency and a
+    non-negative integer amount (minor units; book-keeper accepts zero, e.g. a fee
+    leg a posting rule left at 0), and debits must equal credits for each currency
+    separately. Runs in a single pass over the legs.
+
+    Raises:
+        LedgerValidationError: describing the first problem found.
+    """
+    if not debit_legs:
+        raise LedgerValidationError("Entry has no debit legs")
+    if not credit_legs:
+        raise LedgerValidationError("Entry has no credit legs")
+
+    totals: Dict[str, int] = {}
+    for side, sign, legs in (("debit", 1, debit_legs), ("credit", -1, credit_legs)):
+        for leg in legs:
+            _validate_leg(side, leg)
+            totals[leg.currency] = totals.get(leg.currency, 0) + sign * leg.amount
+
+    unbalanced = {currency: total for currency, total in totals.items() if total}
+    if unbalanced:
+        detail = ", ".join(
+            f"{currency} debits exceed credits by {total}"
+            if total > 0
+            else f"{currency} credits exceed debits by {-total}"
+            for currency, total in unbalanced.items()
+        )
+        raise LedgerValidationError(f"Entry is unbalanced: {detail}")
+
+
+def compact_journal_legs(
+    debit_legs: List[JournalLeg], credit_legs: List[JournalLeg]
+) -> Tuple[List[JournalLeg], List[JournalLeg]]:
+    """Normalizes an entry's legs without changing its effect on any account.
+
+    Legs for the same (account_code, currency) are merged per side, an account that
+    appears on both sides is netted onto the larger side (or dropped when the two
+    cancel out), and each side is sorted by (account_code, currency). Several
+    postings to, e.g., one suspense account then cost a single ledger transfer.
+
+    NOTE: only for entries whose meaning does not depend on leg order or on each
+    posting being recorded separately.
+    """
+    net: Dict[Tuple[str, str], int] = {}
+    for sign, legs in ((1, debit_legs), (-1, credit_legs)):
+        for leg in legs:
+            key = (leg.account_code, leg.currency)
+            net[key] = net.get(key, 0) + sign * leg.amount
+
+    debits, credits = [], []
+    for (account_code, currency), amount in sorted(net.items()):
+        if amount > 0:
+            debits.append(JournalLeg(account_code, amount, currency))
+        elif amount < 0:
+            credits.append(JournalLeg(account_code, -amount, currency))
+    return debits, credits
+
+
+# --- Balance Cache ---
+
+
+class BalanceCache:
+    """
+    Thread-safe in-process cache of balance rows keyed by (tenant_id, account_code).
+
+    Entries expire after `ttl` seconds and the least recently used entries are
+    evicted beyond `max_entries`. BookKeeperClient invalidates the codes touched
+    by its own writes; writes made by other processes are only picked up once
+    the TTL runs out, so keep it short.
+    """
+
+    def __init__(self, ttl: float = 2.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so that a fetch which started before a write
+        # cannot store its (now stale) result afterwards.
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get_many(self, tenant_id: str, account_codes: Iterable[str]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """Returns (cached rows by account_code, account_codes that missed)."""
+        found: Dict[str, Dict[str, Any]] = {}
+        missing: List[str] = []
+        now = time.monotonic()
+        with self._lock:
+            for code in dict.fromkeys(account_codes):
+                key = (tenant_id, code)
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    found[code] = entry[1]
+                    self.hits += 1
+                else:
+                    if entry is not None:
+                        del self._entries[key]
+                    missing.append(code)
+                    self.misses += 1
+        return found, missing
+
+    def put_many(self, tenant_id: str, rows: Iterable[Dict[str, Any]], generation: Optional[int] = None) -> None:
+        """Stores balance rows. Skipped if an invalidation happened since `generation` was read."""
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            for row in rows:
+                key = (tenant_id, row["account_code"])
+                self._entries[key] = (expires_at, row)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tenant_id: str, account_codes: Optional[Iterable[str]] = None) -> None:
+        """Drops the given codes, or every entry of the tenant when account_codes is None."""
+        with self._lock:
+            self._generation += 1
+            if account_codes is None:
+                for key in [k for k in self._entries if k[0] == tenant_id]:
+                    del self._entries[key]
+                return
+            for code in account_codes:
+                self._entries.pop((tenant_id, code), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+# --- Balance Lookup Coalescing ---
+
+
+class _CoalescedBatch:
+    __slots__ = ("codes", "full", "done", "rows_by_code", "status_code", "error")
+
+    def __init__(self):
+        self.codes: Dict[str, None] = {}
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.rows_by_code: Dict[str, Dict[str, Any]] = {}
+        self.status_code = 200
+        self.error: Optional[BaseException] = None
+
+
+class BalanceCoalescer:
+    """
+    Merges balance lookups from concurrent threads into shared requests (DataLoader style).
+
+    The first caller opens a batch and waits up to `window` seconds (or until max_codes
+    distinct codes have been requested) while other callers add their codes to it; it
+    then makes one request for the union and every caller gets its own rows back.
+    Single-code lookups arriving together cost one request instead of one each.
+    """
+
+    def __init__(self, window: float = 0.002, max_codes: int = 200):
+        self.window = window
+        self.max_codes = max_codes
+        self.calls = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._batch: Optional[_CoalescedBatch] = None
+
+    def load(
+        self,
+        account_codes: List[str],
+        fetch: Callable[[List[str]], Tuple[List[Dict[str, Any]], int]],
+    ) -> tuple[List[Dict[str, Any]], int]:
+        """Returns (rows, status_code) for account_codes, fetched together with concurrent calls.
+
+        fetch is called (by one of the waiting threads) with the merged code list; an
+        exception it raises is re-raised in every caller of the batch.
+        """
+        with self._lock:
+            self.calls += 1
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = _CoalescedBatch()
+                self.requests += 1
+            batch.codes.update(dict.fromkeys(account_codes))
+            if len(batch.codes) >= self.max_codes:
+                # Later callers start a new batch instead of growing this one.
+                self._batch = None
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._batch is batch:
+                    self._batch = None
+            try:
+                rows, batch.status_code = fetch(list(batch.codes))
+                batch.rows_by_code = {row["account_code"]: row for row in rows}
+            except BaseException as e:
+                batch.error = e
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        rows_by_code = batch.rows_by_code
+        return [rows_by_code[code] for code in dict.fromkeys(account_codes) if code in rows_by_code], batch.status_code
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls, requests = self.calls, self.requests
+        return {"calls": calls, "requests": requests, "calls_per_request": calls / requests if requests else 0.0}
+
+
+# --- Client Metrics ---
+
+
+class RequestEvent:
+    """A finished request, as passed to ClientMetrics hooks.
+
+    status_code is None and error is set when no HTTP response was received.
+    """
+
+    __slots__ = ("method", "route", "status_code", "duration", "request_bytes", "response_bytes", "error")
+
+    def __init__(
+        self,
+        method: str,
+        route: str,
+        status_code: Optional[int],
+        duration: float,
+        request_bytes: int,
+        response_bytes: int,
+        error: Optional[str] = None,
+    ):
+        self.method = method
+        self.route = route
+        self.status_code = status_code
+        self.duration = duration
+        self.request_bytes = request_bytes
+        self.response_bytes = response_bytes
+        self.error = error
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (seconds) with Prometheus-style quantile estimates."""
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimates the q-quantile by linear interpolation inside the matching bucket."""
+        if not self.count:
+            return None
+
+        rank = q * self.count
+        cumulative = 0
+        lower = 0.0
+        for upper, bucket_count in zip(self.BUCKETS, self.counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+            lower = upper
+        # Falls in the +Inf bucket; the largest finite bound is the best estimate available.
+        return self.BUCKETS[-1]
+
+
+class _EndpointStats:
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.in_flight = 0
+        self.status_codes: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+        self.gauges: Dict[str, float] = {}
+
+
+def _prometheus_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class ClientMetrics:
+    """
+    Thread-safe per-endpoint request metrics for BookKeeperClient.
+
+    Tracks latency histograms, request/response byte counts, status-code counters and
+    in-flight gauges keyed by (method, route), where route is the endpoint with IDs
+    replaced by placeholders, plus the time requests spent queued per PriorityLanes
+    lane. Hooks added with add_hook receive every RequestEvent, e.g. to forward them
+    to StatsD or an existing Prometheus registry.
+    """
+
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, hooks: Optional[List[Callable[[RequestEvent], None]]] = None):
+        self._stats: Dict[Tuple[str, str], _EndpointStats] = {}
+        self._lane_waits: Dict[str, LatencyHistogram] = {}
+        self._hooks: List[Callable[[RequestEvent], None]] = list(hooks or [])
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook: Callable[[RequestEvent], None]) -> None:
+        self._hooks.append(hook)
+
+    def _endpoint(self, method: str, route: str) -> _EndpointStats:
+        stats = self._stats.get((method, route))
+        if stats is None:
+            stats = self._stats[(method, route)] = _EndpointStats()
+        return stats
+
+    def request_started(self, method: str, route: str) -> None:
+        with self._lock:
+            self._endpoint(method, route).in_flight += 1
+
+    def request_finished(self, event: RequestEvent) -> None:
+        status = str(event.status_code) if event.status_code is not None else "error"
+        with self._lock:
+            stats = self._endpoint(event.method, event.route)
+            stats.in_flight -= 1
+            stats.latency.observe(event.duration)
+            stats.request_bytes += event.request_bytes
+            stats.response_bytes += event.response_bytes
+            stats.status_codes[status] = stats.status_codes.get(status, 0) + 1
+
+        for hook in self._hooks:
+            try:
+                hook(event)
+            except Exception:
+                # A broken metrics sink must never fail a ledger call.
+                logger.exception("BOOKKEEPER metrics hook failed")
+
+    def increment(self, name: str, method: str, route: str, amount: int = 1) -> None:
+        """Bumps a named per-endpoint counter (e.g. hedges sent), exported as {prefix}_{name}_total."""
+        with self._lock:
+            counters = self._endpoint(method, route).counters
+            counters[name] = counters.get(name, 0) + amount
+
+    def set_gauge(self, name: str, method: str, route: str, value: float) -> None:
+        """Sets a named per-endpoint gauge (e.g. circuit state), exported as {prefix}_{name}."""
+        with self._lock:
+            self._endpoint(method, route).gauges[name] = value
+
+    def observe_lane_wait(self, lane: str, seconds: float) -> None:
+        """Records how long a request waited for a slot in its lane."""
+        with self._lock:
+            histogram = self._lane_waits.get(lane)
+            if histogram is None:
+                histogram = self._lane_waits[lane] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    def lane_waits(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the queue wait per lane."""
+        with self._lock:
+            return {
+                lane: {
+                    "count": histogram.count,
+                    "total_seconds": histogram.sum,
+                    "p50": histogram.quantile(0.5),
+                    "p95": histogram.quantile(0.95),
+                    "p99": histogram.quantile(0.99),
+                }
+                for lane, histogram in self._lane_waits.items()
+            }
+
+    def sample_count(self, method: str, route: str) -> int:
+        """Returns how many requests to an endpoint have been observed."""
+        with self._lock:
+            stats = self._stats.get((method, route))
+            return stats.latency.count if stats is not None else 0
+
+    def quantile(self, method: str, route: str, q: float) -> Optional[float]:
+        """Returns the estimated q-quantile latency of an endpoint, or None without samples."""
+        with self._lock:
+            stats = self._stats.get((method, route))
+            return stats.latency.quantile(q) if stats is not None else None
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the current metrics per "METHOD route"."""
+        with self._lock:
+            return {
+                f"{method} {route}": {
+                    "count": stats.latency.count,
+                    "p50": stats.latency.quantile(0.5),
+                    "p95": stats.latency.quantile(0.95),
+                    "p99": stats.latency.quantile(0.99),
+                    "request_bytes": stats.request_bytes,
+                    "response_bytes": stats.response_bytes,
+                    "status_codes": dict(stats.status_codes),
+                    "in_flight": stats.in_flight,
+                    "counters": dict(stats.counters),
+                    "gauges": dict(stats.gauges),
+                }
+                for (method, route), stats in self._stats.items()
+            }
+
+    def export_prometheus(self, prefix: str = "bookkeeper_client") -> str:
+        """Renders all metrics in the Prometheus text exposition format."""
+
+        def labels(method: str, route: str, **extra: str) -> str:
+            pairs = {"method": method, "endpoint": route, **extra}
+            return "{" + ",".join(f'{k}="{_prometheus_escape(v)}"' for k, v in pairs.items()) + "}"
+
+        with self._lock:
+            items = sorted(self._stats.items())
+            lines = [
+                f"# HELP {prefix}_request_duration_seconds Book-keeper request latency.",
+                f"# TYPE {prefix}_request_duration_seconds histogram",
+            ]
+            for (method, route), stats in items:
+                cumulative = 0
+                for upper, bucket_count in zip(LatencyHistogram.BUCKETS + (float("inf"),), stats.latency.counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if upper == float("inf") else repr(upper)
+                    lines.append(f"{prefix}_request_duration_seconds_bucket{labels(method, route, le=le)} {cumulative}")
+                lines.append(f"{prefix}_request_duration_seconds_sum{labels(method, route)} {stats.latency.sum}")
+                lines.append(f"{prefix}_request_duration_seconds_count{labels(method, route)} {stats.latency.count}")
+
+            lines.append(f"# TYPE {prefix}_request_duration_quantile_seconds gauge")
+            for (method, route), stats in items:
+                for q in self.QUANTILES:
+                    value = stats.latency.quantile(q)
+                    if value is not None:
+                        series = labels(method, route, quantile=str(q))
+                        lines.append(f"{prefix}_request_duration_quantile_seconds{series} {value}")
+
+            for name, attr in (("request_bytes_total", "request_bytes"), ("response_bytes_total", "response_bytes")):
+                lines.append(f"# TYPE {prefix}_{name} counter")
+                for (method, route), stats in items:
+                    lines.append(f"{prefix}_{name}{labels(method, route)} {getattr(stats, attr)}")
+
+            lines.append(f"# TYPE {prefix}_responses_total counter")
+            for (method, route), stats in items:
+                for status, count in sorted(stats.status_codes.items()):
+                    lines.append(f"{prefix}_responses_total{labels(method, route, status=status)} {count}")
+
+            for name in sorted({name for _, stats in items for name in stats.counters}):
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                for (method, route), stats in items:
+                    if name in stats.counters:
+                        lines.append(f"{prefix}_{name}_total{labels(method, route)} {stats.counters[name]}")
+
+            for name in sorted({name for _, stats in items for name in stats.gauges}):
+                lines.append(f"# TYPE {prefix}_{name} gauge")
+                for (method, route), stats in items:
+                    if name in stats.gauges:
+                        lines.append(f"{prefix}_{name}{labels(method, route)} {stats.gauges[name]}")
+
+            lines.append(f"# TYPE {prefix}_in_flight_requests gauge")
+            for (method, route), stats in items:
+                lines.append(f"{prefix}_in_flight_requests{labels(method, route)} {stats.in_flight}")
+
+            if self._lane_waits:
+                lines.append(f"# HELP {prefix}_lane_wait_seconds Time requests waited for a slot in their lane.")
+                lines.append(f"# TYPE {prefix}_lane_wait_seconds histogram")
+            for lane, histogram in sorted(self._lane_waits.items()):
+                lane_label = _prometheus_escape(lane)
+                cumulative = 0
+                for upper, bucket_count in zip(LatencyHistogram.BUCKETS + (float("inf"),), histogram.counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if upper == float("inf") else repr(upper)
+                    lines.append(f'{prefix}_lane_wait_seconds_bucket{{lane="{lane_label}",le="{le}"}} {cumulative}')
+                lines.append(f'{prefix}_lane_wait_seconds_sum{{lane="{lane_label}"}} {histogram.sum}')
+                lines.append(f'{prefix}_lane_wait_seconds_count{{lane="{lane_label}"}} {histogram.count}')
+
+        return "\n".join(lines) + "\n"
+
+
+# --- Circuit Breaker ---
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without contacting the server while an endpoint's circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker with half-open probing.
+
+    closed: requests flow; failure_threshold consecutive failures open the circuit.
+    open: requests are rejected immediately until recovery_timeout has passed.
+    half_open: up to half_open_max_calls probe requests are let through; a success
+    closes the circuit, a failure opens it again for another recovery_timeout.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    # Numeric encoding used for the circuit_state metric
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Returns True if a request may be sent now (counting it as a probe when half-open)."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return True
+            return False
+
+    def release_probe(self) -> None:
+        """Returns a half-open probe allowed by allow_request() whose request was never sent."""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+# --- Priority Lanes ---
+
+# Lane of the requests made in the current context; see BookKeeperClient.lane(). None
+# means no lane was chosen: bulk helpers then use "bulk", and other requests "interactive".
+_current_lane: contextvars.ContextVar = contextvars.ContextVar("bookkeeper_lane", default=None)
+
+
+class PriorityLanes:
+    """
+    Per-lane request budgets shared by every thread using a client.
+
+    lanes maps lane names to their in-flight budget, highest priority first (by
+    default "interactive" then "bulk"). A lane never starts a request while a higher
+    priority lane has requests waiting, so bulk traffic yields as soon as
+    interactive traffic queues up. The highest priority lane may also borrow the
+    idle budget of the others, up to the total.
+
+    NOTE: keep the total budget <= pool_maxsize so that every admitted request gets
+    a pooled connection.
+    """
+
+    def __init__(self, lanes: Optional[Dict[str, int]] = None):
+        self.budgets: Dict[str, int] = dict(lanes or {"interactive": 8, "bulk": 2})
+        if not self.budgets or min(self.budgets.values()) < 1:
+            raise ValueError("every lane needs a budget of at least 1")
+        self.capacity = sum(self.budgets.values())
+        self._priority = list(self.budgets)
+        self._in_flight = dict.fromkeys(self._priority, 0)
+        self._waiting = dict.fromkeys(self._priority, 0)
+        self._total = 0
+        self._cond = threading.Condition()
+
+    def _can_start(self, lane: str) -> bool:
+        if self._total >= self.capacity:
+            return False
+        for other in self._priority:
+            if other == lane:
+                break
+            if self._waiting[other]:
+                return False
+        return self._in_flight[lane] < self.budgets[lane] or lane == self._priority[0]
+
+    def acquire(self, lane: str, timeout: Optional[float] = None) -> bool:
+        """Waits for a slot in lane. Returns False if none was free within timeout seconds."""
+        if lane not in self.budgets:
+            raise ValueError(f"Unknown lane {lane!r}")
+
+        with self._cond:
+            self._waiting[lane] += 1
+            try:
+                if not self._cond.wait_for(lambda: self._can_start(lane), timeout):
+                    return False
+            finally:
+                self._waiting[lane] -= 1
+            self._in_flight[lane] += 1
+            self._total += 1
+            return True
+
+    def release(self, lane: str) -> None:
+        with self._cond:
+            self._in_flight[lane] -= 1
+            self._total -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._cond:
+            return {
+                lane: {"budget": budget, "in_flight": self._in_flight[lane], "waiting": self._waiting[lane]}
+                for lane, budget in self.budgets.items()
+            }
+
+
+# --- Adaptive Concurrency ---
+
+
+# Limiter fed by the requests made in the current context; see AdaptiveConcurrencyLimiter.wrap().
+_current_limiter: contextvars.ContextVar = contextvars.ContextVar("bookkeeper_limiter", default=None)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limit for bulk operations, usable wherever a bulk helper takes
+    `concurrency`.
+
+    The limit grows by `increase` per limit's worth of successful calls while their
+    latency stays within latency_tolerance times the no-load baseline, and is
+    multiplied by `backoff` when latency inflates beyond that or a call fails with a
+    connection error, timeout, 429 or 5xx (at most once per round trip, so one burst
+    of failures counts once). Each (method, route) has its own baseline, so that a
+    bulk call mixing a fast balance read with a slower write is not read as
+    inflation; a baseline is the lowest latency seen on its route, drifting slowly
+    upwards so that it follows a lasting change in the backend.
+
+    NOTE: keep max_limit <= the client's pool_maxsize.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        latency_tolerance: float = 2.0,
+        backoff: float = 0.5,
+        increase: float = 1.0,
+    ):
+        if not 1 <= min_limit <= initial <= max_limit:
+            raise ValueError("expected 1 <= min_limit <= initial <= max_limit")
+
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.increase = increase
+        self.increases = 0
+        self.decreases = 0
+        self._limit = float(initial)
+        self._baselines: Dict[Tuple[str, str], float] = {}
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def on_result(self, latency: float, status_code: Optional[int], method: str = "", route: str = "") -> None:
+        """Feeds back one finished call; status_code is None for connection errors and timeouts.
+
+        latency is compared with the baseline of the call's method and route.
+        """
+        key = (method, route)
+        with self._lock:
+            baseline = self._baselines.get(key)
+            if baseline is None or latency < baseline:
+                self._baselines[key] = baseline = latency
+            else:
+                self._baselines[key] = baseline + (latency - baseline) * 0.01
+
+            failed = status_code is None or status_code == 429 or status_code >= 500
+            if failed or latency > baseline * self.latency_tolerance:
+                now = time.monotonic()
+                if now - self._last_decrease >= latency:
+                    self._last_decrease = now
+                    self._limit = max(self.min_limit, self._limit * self.backoff)
+                    self.decreases += 1
+            elif self._limit < self.max_limit:
+                self._limit = min(self.max_limit, self._limit + self.increase / self._limit)
+                self.increases += 1
+
+    def wrap(self, fn: Callable[[Any], Any]) -> Callable[[Any], Any]:
+        """Returns fn reporting every BookKeeperClient request it makes to this limiter.
+
+        Each request is a sample, timed from send to response; calls that send nothing
+        (e.g. a chunk of already known account codes) feed nothing, so they cannot
+        drag the latency baseline down.
+        """
+
+        def reported(item: Any) -> Any:
+            token = _current_limiter.set(self)
+            try:
+                return fn(item)
+            finally:
+                _current_limiter.reset(token)
+
+        return reported
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "limit": int(self._limit),
+                "baseline_latency": {" ".join(key).strip(): baseline for key, baseline in self._baselines.items()},
+                "increases": self.increases,
+                "decreases": self.decreases,
+            }
+
+
+# --- Pending Entry Tracking ---
+
+
+class PendingRegistry:
+    """
+    Local record of pending entries created by BookKeeperClient, with their lease deadlines.
+
+    Backed by SQLite so that, with a file path, reservations left behind by a crashed
+    worker can be found and voided by a PendingSweeper (book_keeper_jobs.py) running in
+    any process on the host. The default ":memory:" database only covers the current
+    process.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30.0)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pending_entries ("
+            " entry_id TEXT PRIMARY KEY,"
+            " tenant_id TEXT NOT NULL,"
+            " compound INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " deadline REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS pending_entries_deadline ON pending_entries (tenant_id, deadline)"
+        )
+
+    def add(self, tenant_id: str, entry_id: str, compound: bool, deadline: float) -> None:
+        """Records a pending entry; deadline is a time.time() value."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pending_entries VALUES (?, ?, ?, ?, ?)",
+                (entry_id, tenant_id, int(compound), time.time(), deadline),
+            )
+
+    def remove(self, entry_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM pending_entries WHERE entry_id = ?", [(i,) for i in entry_ids])
+
+    def expired(self, tenant_id: str, now: Optional[float] = None, limit: int = 1000) -> List[Tuple[str, bool]]:
+        """Returns (entry_id, compound) of entries whose lease deadline has passed, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT entry_id, compound FROM pending_entries"
+                " WHERE tenant_id = ? AND deadline <= ? ORDER BY deadline LIMIT ?",
+                (tenant_id, time.time() if now is None else now, limit),
+            ).fetchall()
+        return [(entry_id, bool(compound)) for entry_id, compound in rows]
+
+    def outstanding(self, tenant_id: Optional[str] = None) -> int:
+        """Returns the number of recorded entries that have not been finalized."""
+        with self._lock:
+            if tenant_id is None:
+                return self._conn.execute("SELECT COUNT(*) FROM pending_entries").fetchone()[0]
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM pending_entries WHERE tenant_id = ?", (tenant_id,)
+            ).fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# --- Bulk Job Helpers ---
+
+
+class Checkpoint:
+    """
+    Durable progress marker for resumable bulk jobs.
+
+    Stores the number of input items that have been fully processed (every item
+    before the offset is done) as JSON, replacing the file atomically on each save
+    so an interrupted job never leaves a torn checkpoint behind. Jobs whose items
+    finish out of order may also store the [start, end) input ranges completed
+    beyond the offset.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> int:
+        """Returns the saved offset, or 0 if there is no checkpoint yet."""
+        return self.load_state()[0]
+
+    def load_state(self) -> Tuple[int, List[Tuple[int, int]]]:
+        """Returns (offset, ranges completed beyond the offset), or (0, []) if there is no checkpoint yet."""
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return 0, []
+        return int(state["offset"]), [(int(start), int(end)) for start, end in state.get("completed", [])]
+
+    def save(self, offset: int, completed: Optional[List[Tuple[int, int]]] = None) -> None:
+        state: Dict[str, Any] = {"offset": offset, "updated_at": time.time()}
+        if completed:
+            state["completed"] = [list(done) for done in completed]
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def offset_chunks(items: Iterable[Any], chunk_size: int, start_offset: int = 0) -> Iterator[Tuple[int, List[Any]]]:
+    """Splits items into lists of up to chunk_size, skipping the first start_offset items.
+
+    Yields (input offset just after the chunk, chunk) so that a consumer can
+    checkpoint how far the input has been processed. Always yields at least once.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+
+    chunk: List[Any] = []
+    offset = start_offset
+    for offset, item in enumerate(itertools.islice(items, start_offset, None), start_offset + 1):
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield offset, chunk
+            chunk = []
+    if chunk or offset == start_offset:
+        yield offset, chunk
+
+
+class KnownAccountCodes:
+    """
+    Set of account codes known to exist, per tenant.
+
+    Used by BookKeeperClient.provision_accounts to skip accounts that were already
+    created. Backed by SQLite; pass a file path to keep it across runs.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30.0)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS known_accounts ("
+            " tenant_id TEXT NOT NULL,"
+            " code TEXT NOT NULL,"
+            " PRIMARY KEY (tenant_id, code)) WITHOUT ROWID"
+        )
+
+    def unknown(self, tenant_id: str, codes: List[str]) -> List[str]:
+        """Returns the codes not known to exist, in input order."""
+        known = set()
+        with self._lock:
+            # Batched to stay under SQLite's bound-parameter limit on older builds.
+            for i in range(0, len(codes), 500):
+                batch = codes[i : i + 500]
+                placeholders = ",".join("?" * len(batch))
+                known.update(
+                    row[0]
+                    for row in self._conn.execute(
+                        f"SELECT code FROM known_accounts WHERE tenant_id = ? AND code IN ({placeholders})",
+                        (tenant_id, *batch),
+                    )
+                )
+        return [code for code in codes if code not in known]
+
+    def add(self, tenant_id: str, codes: Iterable[str]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO known_accounts VALUES (?, ?)", [(tenant_id, code) for code in codes]
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# --- Shared Client Plumbing ---
+
+
+class _BookKeeperBase:
+    """
+    Configuration and payload building shared by the sync and async clients.
     """
 
     def __init__(
@@ -92,6 +1168,8 @@ class BookKeeperClient:
         tenant_id: str,
         headers: Optional[Dict[str, str]],
         logger: logging.Logger = logger,
+        validate_entries: bool = True,
+        compact_legs: bool = False,
     ):
         if base_url.endswith("/"):
             base_url = base_url.rstrip("/")
@@ -106,69 +1184,984 @@ class BookKeeperClient:
         # Merge static headers with dynamic security headers from settings
         self._headers = {
             "Content-Type": "application/json",
-            **headers,
+            **(headers or {}),
+        }
+
+        # Reject malformed entries locally (see validate_journal_legs) instead of
+        # sending them to the server.
+        self.validate_entries = validate_entries
+        # Merge, net and sort legs (see compact_journal_legs) before sending entries.
+        self.compact_legs = compact_legs
+
+    def _accounts_payload(self, accounts: List[LedgerAccount]) -> Dict[str, Any]:
+        return {"tenant_id": self.TENANT_ID, "accounts": [acc.to_dict() for acc in accounts]}
+
+    def _refill_payload(
+        self, accounts_to_refill: List[RefillAccount], source_of_funds_account_code: str
+    ) -> Dict[str, Any]:
+        return {
+            "tenant_id": self.TENANT_ID,
+            "source_of_funds_account_code": source_of_funds_account_code,
+            "accounts_to_refill": [acc.to_dict() for acc in accounts_to_refill],
         }
 
-    def _post(self, endpoint: str, data: Dict[str, Any]) -> requests.Response:
+    def _entry_payload(
+        self,
+        narration: str,
+        debit_legs: List[JournalLeg],
+        credit_legs: List[JournalLeg],
+        entry_date: Optional[str] = None,
+        timeout_seconds: Optional[int] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Builds the body shared by journal entries, compound transfers and their pending variants.
+
+        Raises:
+            LedgerValidationError: if validate_entries is set and the legs are invalid,
+                or if compact_legs is set and the legs cancel out completely.
+        """
+        if self.compact_legs:
+            if self.validate_entries:
+                # Malformed or negative legs must fail rather than be netted into valid ones.
+                for side, legs in (("debit", debit_legs), ("credit", credit_legs)):
+                    for leg in legs:
+                        _validate_leg(side, leg)
+            # Compact before the entry-level checks, so that zero legs and pairs that
+            # cancel out are dropped instead of being judged on their own.
+            debit_legs, credit_legs = compact_journal_legs(debit_legs, credit_legs)
+            if not debit_legs or not credit_legs:
+                raise LedgerValidationError("Entry moves nothing once its legs are netted")
+        if self.validate_entries:
+            validate_journal_legs(debit_legs, credit_legs)
+
+        data = {
+            "tenant_id": self.TENANT_ID,
+            "entry_date": entry_date or get_current_entry_date(),
+            "narration": narration,
+            "debit_legs": [leg.to_dict() for leg in debit_legs],
+            "credit_legs": [leg.to_dict() for leg in credit_legs],
+        }
+        if timeout_seconds is not None:
+            data["timeout_seconds"] = timeout_seconds
+        if idempotency_key is not None:
+            data["idempotency_key"] = idempotency_key
+        return data
+
+    def _tenant_payload(self) -> Dict[str, Any]:
+        return {"tenant_id": self.TENANT_ID}
+
+    def _close_account_payload(self, destination_account_code: str, currency: str) -> Dict[str, Any]:
+        return {
+            "tenant_id": self.TENANT_ID,
+            "destination_account_code": destination_account_code,
+            "currency": currency,
+        }
+
+    def _balances_params(self, account_codes: List[str]) -> Dict[str, Any]:
+        # Pass list directly - requests and httpx both convert it to repeated query params
+        return {"tenant_id": self.TENANT_ID, "account_codes": account_codes}
+
+    @staticmethod
+    def _leg_codes(*leg_lists: Iterable[Any]) -> List[str]:
+        """Returns the distinct account codes of the given JournalLeg/RefillAccount lists."""
+        return list(dict.fromkeys(leg.account_code for legs in leg_lists for leg in legs))
+
+    @staticmethod
+    def _pending_entry_id(body: Dict[str, Any]) -> Optional[str]:
+        """Extracts the entry ID from a pending journal entry / compound transfer response."""
+        if not isinstance(body, dict):
+            return None
+        return body.get("journal_id") or body.get("entry_id") or body.get("id")
+
+    @contextmanager
+    def _traced(self, method: str, route: str, url: str, request_bytes: int):
+        """Wraps a request in an OpenTelemetry client span.
+
+        Yields (span, headers): the headers to send, carrying the W3C trace context of
+        the span, and the span (None when opentelemetry is not installed) to be
+        finished with _end_span. An exception raised inside marks the span as failed.
+        """
+        if otel_trace is None:
+            yield None, self._headers
+            return
+
+        tracer = otel_trace.get_tracer(__name__)
+        attributes = {
+            "http.request.method": method,
+            "http.route": route,
+            "url.full": url,
+            "bookkeeper.tenant_id": self.TENANT_ID,
+            "http.request.body.size": request_bytes,
+        }
+        with tracer.start_as_current_span(
+            f"BOOKKEEPER {method} {route}", kind=otel_trace.SpanKind.CLIENT, attributes=attributes
+        ) as span:
+            headers = dict(self._headers)
+            otel_propagate.inject(headers)
+            yield span, headers
+
+    @staticmethod
+    def _end_span(span: Any, status_code: Optional[int], response_bytes: int) -> None:
+        if span is not None and status_code is not None:
+            span.set_attribute("http.response.status_code", status_code)
+            span.set_attribute("http.response.body.size", response_bytes)
+
+    @staticmethod
+    def _result(response: Any, no_content_message: str) -> tuple[Dict[str, Any], int]:
+        """Unpacks a response into (response_data, status_code), mapping 204 No Content to a message."""
+        if response.status_code == 204:
+            return {"message": no_content_message}, response.status_code
+
+        return response.json(), response.status_code
+
+
+# --- Main Client Class (Updated entry_date defaults) ---
+
+
+class BookKeeperClient(_BookKeeperBase):
+    """
+    A client for interacting with the book-keeper REST API.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        tenant_id: str,
+        headers: Optional[Dict[str, str]],
+        logger: logging.Logger = logger,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        pool_idle_timeout: Optional[float] = 60.0,
+        balance_cache: Optional[BalanceCache] = None,
+        balance_chunk_size: int = 200,
+        balance_fetch_concurrency: int = 4,
+        balance_coalesce_window: Optional[float] = None,
+        metrics: Optional[ClientMetrics] = None,
+        hedge_after: Union[None, float, str] = None,
+        hedge_min_samples: int = 50,
+        hedge_max_workers: int = 32,
+        timeout: Union[float, Tuple[float, float]] = (3.05, 10.0),
+        breaker_failure_threshold: Optional[int] = 5,
+        breaker_recovery_timeout: float = 30.0,
+        pending_registry: Optional[PendingRegistry] = None,
+        pending_lease_seconds: Optional[float] = None,
+        validate_entries: bool = True,
+        compact_legs: bool = False,
+        outbox: Optional["LedgerOutbox"] = None,
+        transport: Optional[BaseAdapter] = None,
+        lanes: Optional[PriorityLanes] = None,
+    ):
+        super().__init__(base_url, tenant_id, headers, logger, validate_entries, compact_legs)
+
+        # Optional durable queue for enqueue_journal_entry, delivered by an OutboxDrainer
+        # (both in book_keeper_outbox.py).
+        self.outbox = outbox
+
+        # Optional registry of pending entries created by this client. Each one is leased
+        # for pending_lease_seconds (capped by its timeout_seconds), after which a
+        # PendingSweeper may void it. The lease must cover the longest time a caller
+        # legitimately holds a reservation before committing it, and be well below the
+        # timeout_seconds used, or the sweeper frees nothing the server would not.
+        if pending_registry is not None and (pending_lease_seconds is None or pending_lease_seconds <= 0):
+            raise ValueError("pending_registry needs a positive pending_lease_seconds")
+        self.pending_registry = pending_registry
+        self.pending_lease_seconds = pending_lease_seconds
+
+        # (connect, read) timeout in seconds applied to every request, so a degraded
+        # ledger cannot pin worker threads on a socket indefinitely.
+        self.timeout = timeout
+
+        # Per-endpoint circuit breakers fail fast with CircuitOpenError while the backend
+        # keeps failing (connection errors, timeouts, 429 and 5xx responses).
+        # breaker_failure_threshold=None disables them.
+        self.breaker_failure_threshold = breaker_failure_threshold
+        self.breaker_recovery_timeout = breaker_recovery_timeout
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+
+        self.metrics = metrics or ClientMetrics()
+
+        # Optional PriorityLanes: every request first takes a slot in the lane of its
+        # context (set with lane(); otherwise "bulk" in bulk helpers, else "interactive"), and
+        # the time spent waiting is recorded in metrics.lane_waits().
+        self.lanes = lanes
+
+        # Hedged GETs: when a GET has not answered after hedge_after seconds, a duplicate
+        # is sent and whichever responds first wins. hedge_after may also be a latency
+        # quantile of the endpoint such as "p95" or "p99.9", which is used once
+        # hedge_min_samples requests have been observed.
+        self.hedge_after = hedge_after
+        self._hedge_seconds, self._hedge_quantile = self._parse_hedge_after(hedge_after)
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_max_workers = hedge_max_workers
+        self._hedge_executor: Optional[ThreadPoolExecutor] = None
+
+        # get_account_balances splits code lists longer than balance_chunk_size into
+        # several requests (keeping URLs well under server/proxy limits) and runs up to
+        # balance_fetch_concurrency of them at once.
+        self.balance_chunk_size = balance_chunk_size
+        self.balance_fetch_concurrency = balance_fetch_concurrency
+
+        # With balance_coalesce_window (seconds, e.g. 0.001-0.005) balance lookups made by
+        # concurrent threads within the window share one request. Lookups with a deadline
+        # are never delayed by it.
+        self.balance_coalescer = (
+            BalanceCoalescer(balance_coalesce_window, balance_chunk_size)
+            if balance_coalesce_window is not None
+            else None
+        )
+
+        # Optional balance cache, may be shared by several clients in the same process.
+        self.balance_cache = balance_cache
+        # Account codes touched by pending entries created through this client, so that
+        # committing/voiding them only invalidates those codes.
+        self._pending_codes: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._pending_codes_lock = threading.Lock()
+
+        # Connection pool settings:
+        # pool_connections: number of per-host pools to cache
+        # pool_maxsize: keep-alive connections kept per host
+        # pool_block: wait for a free connection instead of opening a throwaway one
+        # pool_idle_timeout: drop all pooled connections after this many idle seconds (None disables)
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.pool_idle_timeout = pool_idle_timeout
+
+        # Optional transport replacing the default HTTP connection pool, e.g.
+        # ASGITransport(app) to call a co-located book-keeper in-process or
+        # UnixSocketTransport(path) for a local sidecar (both in book_keeper_transports.py).
+        # It is mounted for base_url only.
+        self.transport = transport
+        if ASGITransport is not None and isinstance(transport, ASGITransport):
+            # No sockets to go stale, and recycling would restart the app's lifespan.
+            self.pool_idle_timeout = None
+
+        self._session_lock = threading.Lock()
+        self._session: Optional[requests.Session] = None
+        self._last_used = 0.0
+        self._closed = False
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        if self.transport is not None:
+            # Proxy and netrc settings do not apply to a local transport, and looking them
+            # up scans os.environ on every request.
+            session.trust_env = False
+            session.mount(self.base_url, self.transport)
+            return session
+
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _get_session(self) -> requests.Session:
+        """Returns the pooled session, recycling it if it has been idle too long.
+
+        requests.Session is safe to share between threads for sending requests
+        as long as its configuration is not mutated, so a single session (and
+        its urllib3 pools) is shared by every thread using this client.
+        """
+        with self._session_lock:
+            if self._closed:
+                raise RuntimeError("BookKeeperClient is closed")
+
+            now = time.monotonic()
+            if (
+                self._session is not None
+                and self.pool_idle_timeout is not None
+                and now - self._last_used > self.pool_idle_timeout
+            ):
+                # Idle keep-alive sockets are likely to have been dropped by the server or a
+                # load balancer; start from a fresh pool instead of hitting a dead connection.
+                self.logger.debug("BOOKKEEPER evicting idle connection pool")
+                self._session.close()
+                self._session = None
+
+            if self._session is None:
+                self._session = self._new_session()
+
+            self._last_used = now
+            return self._session
+
+    def close(self) -> None:
+        """Closes all pooled connections. The client cannot be used afterwards."""
+        with self._session_lock:
+            self._closed = True
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+            if self._hedge_executor is not None:
+                self._hedge_executor.shutdown(wait=False)
+                self._hedge_executor = None
+
+    def __enter__(self) -> "BookKeeperClient":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _post(self, endpoint: str, data: Dict[str, Any], route: Optional[str] = None) -> requests.Response:
         """Helper for making POST requests with logging."""
+        return self._request("POST", endpoint, route, data=data)
+
+    def _get(
+        self,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        route: Optional[str] = None,
+        deadline_at: Optional[float] = None,
+    ) -> requests.Response:
+        """Helper for making GET requests with logging.
+
+        deadline_at is a time.monotonic() value after which the call gives up with
+        requests.exceptions.Timeout. GETs are idempotent, so they may be hedged.
+        """
+        route = route or endpoint
+        hedge_delay = self._hedge_delay(route)
+        if hedge_delay is None and deadline_at is None:
+            return self._request("GET", endpoint, route, params=params)
+        return self._hedged_get(endpoint, params, route, deadline_at, hedge_delay)
+
+    @staticmethod
+    def _parse_hedge_after(hedge_after: Union[None, float, str]) -> Tuple[Optional[float], Optional[float]]:
+        """Splits hedge_after into (fixed delay in seconds, latency quantile); at most one is set.
+
+        Raises:
+            ValueError: if hedge_after is neither a non-negative number nor "pNN" with
+                0 < NN < 100.
+        """
+        if hedge_after is None:
+            return None, None
+        if isinstance(hedge_after, (int, float)) and not isinstance(hedge_after, bool):
+            if hedge_after < 0:
+                raise ValueError(f"hedge_after must not be negative, got {hedge_after}")
+            return float(hedge_after), None
+
+        match = re.fullmatch(r"p(\d+(?:\.\d+)?)", hedge_after) if isinstance(hedge_after, str) else None
+        if match is None or not 0 < float(match.group(1)) < 100:
+            raise ValueError(f'hedge_after must be seconds or a quantile such as "p95", got {hedge_after!r}')
+        return None, float(match.group(1)) / 100
+
+    def _hedge_delay(self, route: str) -> Optional[float]:
+        """Returns the configured hedge delay for a GET route, or None to not hedge."""
+        if self._hedge_quantile is None:
+            return self._hedge_seconds
+
+        # A latency quantile; wait until the histogram has enough samples.
+        if self.metrics.sample_count("GET", route) < self.hedge_min_samples:
+            return None
+        return self.metrics.quantile("GET", route, self._hedge_quantile)
+
+    @staticmethod
+    def _remaining(deadline_at: Optional[float]) -> Optional[float]:
+        if deadline_at is None:
+            return None
+        return deadline_at - time.monotonic()
+
+    def _hedged_get(
+        self,
+        endpoint: str,
+        params: Optional[Dict[str, Any]],
+        route: str,
+        deadline_at: Optional[float],
+        hedge_delay: Optional[float],
+    ) -> requests.Response:
+        """Runs a GET with an optional hedge and deadline, returning the first response.
+
+        An HTTP error response counts as a response; a connection error only fails the
+        call once no other attempt is left running. The losing attempt is cancelled if it
+        has not started yet, otherwise its result is discarded when it finishes (requests
+        cannot abort a blocking call) and its connection goes back to the pool.
+        """
+        with self._session_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(
+                    max_workers=self.hedge_max_workers, thread_name_prefix="bookkeeper-hedge"
+                )
+            executor = self._hedge_executor
+
+        def attempt() -> requests.Response:
+            remaining = self._remaining(deadline_at)
+            if remaining is not None and remaining <= 0:
+                raise requests.exceptions.Timeout("BOOKKEEPER deadline exceeded before request was sent")
+            return self._request("GET", endpoint, route, params=params, timeout=remaining)
+
+        started = time.monotonic()
+        primary = executor.submit(contextvars.copy_context().run, attempt)
+        attempts = [primary]
+        hedged = False
+        last_error: Optional[BaseException] = None
+        try:
+            while attempts:
+                wait_for = self._remaining(deadline_at)
+                if not hedged and hedge_delay is not None:
+                    until_hedge = started + hedge_delay - time.monotonic()
+                    wait_for = until_hedge if wait_for is None else min(wait_for, until_hedge)
+
+                if wait_for is not None:
+                    wait_for = max(wait_for, 0)
+                done, _ = wait(attempts, timeout=wait_for, return_when=FIRST_COMPLETED)
+                for future in done:
+                    attempts.remove(future)
+                    error = future.exception()
+                    if error is None or isinstance(error, requests.exceptions.HTTPError):
+                        if future is not primary:
+                            self.metrics.increment("hedge_wins", "GET", route)
+                        return future.result()
+                    last_error = error
+
+                remaining = self._remaining(deadline_at)
+                if remaining is not None and remaining <= 0:
+                    self.metrics.increment("deadline_exceeded", "GET", route)
+                    raise requests.exceptions.Timeout(f"BOOKKEEPER GET {endpoint} exceeded its deadline")
+
+                if attempts and not hedged and hedge_delay is not None and time.monotonic() >= started + hedge_delay:
+                    hedged = True
+                    attempts.append(executor.submit(contextvars.copy_context().run, attempt))
+                    self.metrics.increment("hedges", "GET", route)
+        finally:
+            for future in attempts:
+                future.cancel()
+
+        raise last_error
+
+    def _breaker(self, method: str, route: str) -> Optional[CircuitBreaker]:
+        if self.breaker_failure_threshold is None:
+            return None
+        breaker = self._breakers.get((method, route))
+        if breaker is None:
+            breaker = self._breakers.setdefault(
+                (method, route), CircuitBreaker(self.breaker_failure_threshold, self.breaker_recovery_timeout)
+            )
+        return breaker
+
+    def circuit_states(self) -> Dict[str, str]:
+        """Returns the circuit breaker state of every endpoint used so far, keyed by "METHOD route"."""
+        return {f"{method} {route}": breaker.state for (method, route), breaker in list(self._breakers.items())}
+
+    def _request_timeout(self, deadline_timeout: Optional[float]) -> Union[float, Tuple[float, float]]:
+        """Returns the requests timeout, shortened to the remaining deadline if there is one."""
+        if deadline_timeout is None:
+            return self.timeout
+        if isinstance(self.timeout, tuple):
+            return tuple(min(t, deadline_timeout) for t in self.timeout)
+        return min(self.timeout, deadline_timeout)
+
+    def _request(
+        self,
+        method: str,
+        endpoint: str,
+        route: Optional[str] = None,
+        data: Optional[Dict[str, Any]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> requests.Response:
+        """Sends a request with logging, metrics and circuit breaking.
+
+        route is the endpoint with IDs replaced by placeholders (e.g.
+        "accounts/{account_code}/close") so metrics and breakers are not split per ID.
+        timeout, when given, is the remaining deadline and caps self.timeout.
+        """
         url = f"{self.base_url}/{endpoint}"
+        route = route or endpoint
 
         # Log the outgoing request details
-        self.logger.info("BOOKKEEPER POST Request -> %s", url)
-        self.logger.debug("Payload: %s", json.dumps(data, indent=2))
+        self.logger.info("BOOKKEEPER %s Request -> %s", method, url)
+        body = None
+        if data is not None:
+            body = _json_dumps(data)
+            # Pretty-printing the payload is costly; only do it when it will be emitted.
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Payload: %s", json.dumps(data, indent=2))
+        else:
+            self.logger.debug("Params: %s", params)
+
+        # Wait for a lane slot before any breaker or metrics accounting: a request that
+        # times out in the queue was never sent and must not hold a half-open probe.
+        with self._lane_slot(timeout):
+            breaker = self._breaker(method, route)
+            if breaker is not None and not breaker.allow_request():
+                self.metrics.increment("circuit_rejected", method, route)
+                self.logger.warning("BOOKKEEPER %s Rejected <- circuit open for %s", method, route)
+                raise CircuitOpenError(f"BOOKKEEPER circuit open for {method} {route}")
+
+            status_code = None
+            response_bytes = 0
+            error = None
+            backend_failed = False
+            self.metrics.request_started(method, route)
+            started = time.perf_counter()
+            with self._traced(method, route, url, len(body) if body is not None else 0) as (span, headers):
+                try:
+                    response = self._get_session().request(
+                        method,
+                        url,
+                        headers=headers,
+                        data=body,
+                        params=params,
+                        timeout=self._request_timeout(timeout),
+                    )
+                    status_code = response.status_code
+                    response_bytes = len(response.content)
+                    response.raise_for_status()
+
+                    # Log successful response
+                    self.logger.info("BOOKKEEPER %s Success <- Status: %s", method, response.status_code)
+                    return response
+
+                except requests.exceptions.HTTPError as e:
+                    # Log failure with status code and response body
+                    error = str(e)
+                    # Client errors (other than 429) mean the backend is healthy and said no.
+                    backend_failed = e.response.status_code == 429 or e.response.status_code >= 500
+                    self.logger.error(
+                        "BOOKKEEPER %s Failure <- HTTP Error: %s. Response: %s",
+                        method,
+                        e.response.status_code,
+                        e.response.text,
+                    )
+                    raise
+
+                except requests.exceptions.RequestException as e:
+                    # Log generic request error
+                    error = str(e)
+                    backend_failed = True
+                    self.logger.error("BOOKKEEPER %s Failure <- Request Error: %s", method, e)
+                    raise
+
+                finally:
+                    self._end_span(span, status_code, response_bytes)
+                    if breaker is not None:
+                        if backend_failed:
+                            breaker.record_failure()
+                        elif status_code is not None:
+                            breaker.record_success()
+                        else:
+                            breaker.release_probe()
+                        self.metrics.set_gauge(
+                            "circuit_state", method, route, CircuitBreaker.STATE_VALUES[breaker.state]
+                        )
+                    duration = time.perf_counter() - started
+                    limiter = _current_limiter.get()
+                    if limiter is not None and (status_code is not None or backend_failed):
+                        limiter.on_result(duration, status_code, method, route)
+                    self.metrics.request_finished(
+                        RequestEvent(
+                            method,
+                            route,
+                            status_code,
+                            duration,
+                            len(body) if body is not None else 0,
+                            response_bytes,
+                            error,
+                        )
+                    )
+
+    @contextmanager
+    def lane(self, name: str):
+        """Sends the requests made inside the block (including from bulk helpers'
+        worker threads) in the given PriorityLanes lane, e.g. for a reconciliation job:
+
+            with client.lane("bulk"):
+                client.get_account_balances(codes)
+
+        A lane chosen here also applies to bulk helpers, which otherwise use "bulk":
+
+            with client.lane("interactive"):
+                client.submit_journal_entries(order_entries)
+        """
+        token = _current_lane.set(name)
+        try:
+            yield
+        finally:
+            _current_lane.reset(token)
+
+    @contextmanager
+    def _lane_slot(self, timeout: Optional[float] = None):
+        if self.lanes is None:
+            yield
+            return
+
+        lane = _current_lane.get() or "interactive"
+        started = time.perf_counter()
+        acquired = self.lanes.acquire(lane, timeout)
+        self.metrics.observe_lane_wait(lane, time.perf_counter() - started)
+        if not acquired:
+            raise requests.exceptions.Timeout(f"BOOKKEEPER no {lane} lane slot free before the deadline")
+        try:
+            yield
+        finally:
+            self.lanes.release(lane)
+
+    @contextmanager
+    def _invalidates(self, account_codes: Optional[Iterable[str]]):
+        """Invalidates cached balances of account_codes once the wrapped write finishes.
 
+        Runs whether or not the write succeeded: a timed-out write may still have been
+        applied by the server. account_codes=None invalidates the whole tenant.
+        """
         try:
-            response = requests.post(url, headers=self._headers, data=json.dumps(data))
-            response.raise_for_status()
+            yield
+        finally:
+            if self.balance_cache is not None:
+                self.balance_cache.invalidate(self.TENANT_ID, account_codes)
+
+    def _remember_pending(
+        self, body: Dict[str, Any], account_codes: List[str], compound: bool, timeout_seconds: int
+    ) -> None:
+        entry_id = self._pending_entry_id(body)
+        if entry_id is None:
+            return
+
+        if self.pending_registry is not None:
+            lease = timeout_seconds
+            if self.pending_lease_seconds is not None:
+                lease = min(lease, self.pending_lease_seconds)
+            self.pending_registry.add(self.TENANT_ID, entry_id, compound, time.time() + lease)
+
+        if self.balance_cache is None:
+            return
+        with self._pending_codes_lock:
+            self._pending_codes[entry_id] = account_codes
+            # Entries that are never finalized through this client would otherwise pile up;
+            # forgetting one only means its commit/void invalidates the whole tenant.
+            while len(self._pending_codes) > 10000:
+                self._pending_codes.popitem(last=False)
+
+    def _forget_pending(self, entry_id: str) -> Optional[List[str]]:
+        with self._pending_codes_lock:
+            return self._pending_codes.pop(entry_id, None)
+
+    @contextmanager
+    def _finalizes_pending(self, entry_id: str):
+        """Wraps a commit/void: invalidates the entry's balances and drops it from the registry.
+
+        The registry entry is kept when the outcome is unknown (connection error, 5xx) so
+        that the sweeper can still void it.
+        """
+        with self._invalidates(self._forget_pending(entry_id)):
+            try:
+                yield
+            except requests.exceptions.HTTPError as e:
+                if self.pending_registry is not None and e.response.status_code < 500:
+                    self.pending_registry.remove([entry_id])
+                raise
+            if self.pending_registry is not None:
+                self.pending_registry.remove([entry_id])
+
+    def _iter_bulk(
+        self,
+        fn: Callable[[Any], Any],
+        items: Iterable[Any],
+        concurrency: Union[int, AdaptiveConcurrencyLimiter],
+        lane: Optional[str] = "bulk",
+    ) -> Iterator[Tuple[int, Any, Any]]:
+        """Calls fn on every item with at most `concurrency` calls in flight.
+
+        concurrency may be an AdaptiveConcurrencyLimiter, which is fed the latency
+        and outcome of every request the calls make and re-read before each new
+        call is started.
+
+        Yields (index, item, future) in input order. Items are pulled from the
+        iterable lazily and at most a few windows of finished results are held
+        back waiting for a slow earlier item, so memory stays bounded. The calls'
+        requests go in the caller's lane or, if the caller chose none, in the given
+        lane (None leaves it to the requests' default, "interactive").
+
+        NOTE: keep concurrency <= pool_maxsize, otherwise the extra connections
+        are opened and discarded per call instead of being kept alive.
+        """
+        if isinstance(concurrency, AdaptiveConcurrencyLimiter):
+            limiter = concurrency
+            fn = limiter.wrap(fn)
+            max_workers = limiter.max_limit
+        else:
+            if concurrency < 1:
+                raise ValueError("concurrency must be at least 1")
+            limiter = None
+            max_workers = concurrency
+
+        source = enumerate(items)
+        window: deque = deque()
+        exhausted = False
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bookkeeper-bulk") as pool:
+            while True:
+                limit = limiter.limit if limiter is not None else max_workers
+                in_flight = [f for _, _, f in window if not f.done()]
+                while not exhausted and len(in_flight) < limit and len(window) < limit * 4:
+                    try:
+                        index, item = next(source)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    context = contextvars.copy_context()
+                    if lane is not None and context.get(_current_lane) is None:
+                        context.run(_current_lane.set, lane)
+                    future = pool.submit(context.run, fn, item)
+                    window.append((index, item, future))
+                    in_flight.append(future)
+
+                if not window:
+                    return
+
+                if not window[0][2].done():
+                    wait(in_flight, return_when=FIRST_COMPLETED)
+
+                while window and window[0][2].done():
+                    yield window.popleft()
+
+    @staticmethod
+    def _bulk_result(index: int, future: Any) -> BulkResult:
+        """Converts a finished future from _iter_bulk into a BulkResult."""
+        try:
+            body, status_code = future.result()
+            return BulkResult(index, status_code, body)
+        except requests.exceptions.HTTPError as e:
+            try:
+                body = e.response.json()
+            except ValueError:
+                body = e.response.text
+            return BulkResult(index, e.response.status_code, body, str(e))
+        except Exception as e:
+            return BulkResult(index, None, None, str(e))
+
+    def map_bulk(
+        self,
+        fn: Callable[[Any], tuple[Dict[str, Any], int]],
+        items: Iterable[Any],
+        concurrency: Union[int, AdaptiveConcurrencyLimiter] = 8,
+        lane: Optional[str] = "bulk",
+    ) -> Iterator[Tuple[Any, BulkResult]]:
+        """Bulk: Calls fn on every item concurrently, streaming (item, BulkResult) in input order.
+
+        fn makes its requests through this client and returns (response_data, status_code)
+        like the client's methods; an exception it raises is reported on the item's
+        result. Items are read lazily, so a generator over a large input keeps memory
+        flat.
 
-            # Log successful response
-            self.logger.info("BOOKKEEPER POST Success <- Status: %s", response.status_code)
+        Args:
+            fn: Called once per item, from a worker thread.
+            items: Items to process. May be a generator; it is consumed lazily.
+            concurrency: Maximum number of calls in flight, or an AdaptiveConcurrencyLimiter.
+            lane: PriorityLanes lane for the calls' requests unless the caller chose one
+                with lane() (None: "interactive").
+
+        Yields:
+            tuple: (item, BulkResult), where the result's index is the item's position.
+        """
+        for index, item, future in self._iter_bulk(fn, items, concurrency, lane):
+            yield item, self._bulk_result(index, future)
 
-            if response.status_code == 204:
-                # If 204 No Content, return the response object itself
-                return response
+    def submit_journal_entry(self, entry: JournalEntry) -> tuple[Dict[str, Any], int]:
+        """Submits one JournalEntry as a journal entry or, if entry.compound, a compound transfer.
 
-            return response
+        Returns:
+            tuple: (response_data, status_code)
+        """
+        submit = self.atomic_compound_transfer if entry.compound else self.simple_journal_entry
+        return submit(entry.narration, entry.debit_legs, entry.credit_legs, entry.entry_date, entry.idempotency_key)
 
-        except requests.exceptions.HTTPError as e:
-            # Log failure with status code and response body
-            self.logger.error(
-                "BOOKKEEPER POST Failure <- HTTP Error: %s. Response: %s", e.response.status_code, e.response.text
-            )
-            raise
+    def iter_journal_entries(
+        self, entries: Iterable[JournalEntry], concurrency: Union[int, AdaptiveConcurrencyLimiter] = 8
+    ) -> Iterator[BulkResult]:
+        """Bulk: Submits journal entries / compound transfers concurrently, streaming results.
 
-        except requests.exceptions.RequestException as e:
-            # Log generic request error
-            self.logger.error("BOOKKEEPER POST Failure <- Request Error: %s", e)
-            raise
+        Failures do not stop the run; they are reported on the entry's result.
 
-    def _get(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> requests.Response:
-        """Helper for making GET requests with logging."""
-        url = f"{self.base_url}/{endpoint}"
+        Args:
+            entries: Entries to submit. May be a generator; it is consumed lazily.
+            concurrency: Maximum number of requests in flight, or an AdaptiveConcurrencyLimiter.
 
-        # Log the outgoing request details
-        self.logger.info("BOOKKEEPER GET Request -> %s", url)
-        self.logger.debug("Params: %s", params)
+        Yields:
+            BulkResult: One per entry, in input order.
+        """
+        for _, result in self.map_bulk(self.submit_journal_entry, entries, concurrency):
+            yield result
+
+    def submit_journal_entries(
+        self, entries: Iterable[JournalEntry], concurrency: Union[int, AdaptiveConcurrencyLimiter] = 8
+    ) -> List[BulkResult]:
+        """Bulk: Same as iter_journal_entries but collects all results into a list."""
+        return list(self.iter_journal_entries(entries, concurrency))
+
+    @contextmanager
+    def two_phase(
+        self,
+        narration: str,
+        debit_legs: List[JournalLeg],
+        credit_legs: List[JournalLeg],
+        timeout_seconds: int,
+        entry_date: Optional[str] = None,
+        compound: bool = False,
+    ) -> Iterator[PendingReservation]:
+        """Two-phase commit: reserves a pending entry, runs the block, then commits or voids it.
+
+        The pending journal entry (or compound transfer when compound=True) is committed
+        when the block exits normally and voided when it raises or calls cancel() on the
+        reservation. A failed commit is raised as is; the entry is not voided because the
+        commit may have been applied. A failed void is logged and the block's exception
+        is re-raised.
+
+        With a pending_registry, a PendingSweeper may void the entry once
+        pending_lease_seconds have passed, even while the block is still running: the
+        commit then fails with a 4xx and the block's side effects must be undone by the
+        caller. If the sweeper's void and the commit race, the server applies whichever
+        arrives first. Keep the block well within the lease.
+
+        Example:
+            with client.two_phase("Cart 42", debit_legs, credit_legs, timeout_seconds=60) as reservation:
+                place_order(reservation.entry_id)
+        """
+        create = self.create_pending_compound_transfer if compound else self.create_pending_journal_entry
+        body, status_code = create(narration, debit_legs, credit_legs, timeout_seconds, entry_date)
+        entry_id = self._pending_entry_id(body)
+        if entry_id is None:
+            raise ValueError(f"BOOKKEEPER pending entry response has no ID: {body}")
 
+        reservation = PendingReservation(entry_id, compound, body, status_code)
         try:
-            response = requests.get(url, headers=self._headers, params=params)
-            response.raise_for_status()
+            yield reservation
+        except BaseException:
+            try:
+                self._finalize_pending(entry_id, compound, commit=False)
+            except Exception:
+                self.logger.exception("BOOKKEEPER failed to void pending entry %s", entry_id)
+            raise
 
-            # Log successful response
-            self.logger.info("BOOKKEEPER GET Success <- Status: %s", response.status_code)
-            return response
+        self._finalize_pending(entry_id, compound, commit=not reservation.cancelled)
 
-        except requests.exceptions.HTTPError as e:
-            # Log failure
-            self.logger.error(
-                "BOOKKEEPER GET Failure <- HTTP Error: %s. Response: %s", e.response.status_code, e.response.text
+    def _finalize_pending(self, entry_id: str, compound: bool, commit: bool) -> tuple[Dict[str, Any], int]:
+        if compound:
+            finalize = self.post_pending_compound_transfer if commit else self.void_pending_compound_transfer
+        else:
+            finalize = self.post_pending_journal_entry if commit else self.void_pending_journal_entry
+        return finalize(entry_id)
+
+    def commit_pending_entries(
+        self,
+        entry_ids: Iterable[str],
+        compound: bool = False,
+        concurrency: Union[int, AdaptiveConcurrencyLimiter] = 8,
+        lane: Optional[str] = None,
+    ) -> List[BulkResult]:
+        """Bulk: Commits pending journal entries (or compound transfers) concurrently.
+
+        Finalizing usually completes a user's request, so the requests go in the
+        caller's lane ("interactive" unless set with lane()); pass lane="bulk" for
+        background settlement.
+
+        Returns:
+            list: One BulkResult per entry ID, in input order.
+        """
+        return self._finalize_pending_entries(entry_ids, compound, True, concurrency, lane)
+
+    def void_pending_entries(
+        self,
+        entry_ids: Iterable[str],
+        compound: bool = False,
+        concurrency: Union[int, AdaptiveConcurrencyLimiter] = 8,
+        lane: Optional[str] = None,
+    ) -> List[BulkResult]:
+        """Bulk: Voids pending journal entries (or compound transfers) concurrently.
+
+        The requests go in the caller's lane, as for commit_pending_entries.
+
+        Returns:
+            list: One BulkResult per entry ID, in input order.
+        """
+        return self._finalize_pending_entries(entry_ids, compound, False, concurrency, lane)
+
+    def _finalize_pending_entries(
+        self,
+        entry_ids: Iterable[str],
+        compound: bool,
+        commit: bool,
+        concurrency: Union[int, AdaptiveConcurrencyLimiter],
+        lane: Optional[str],
+    ) -> List[BulkResult]:
+        return [
+            result
+            for _, result in self.map_bulk(
+                lambda entry_id: self._finalize_pending(entry_id, compound, commit), entry_ids, concurrency, lane
             )
-            raise
+        ]
 
-        except requests.exceptions.RequestException as e:
-            # Log generic request error
-            self.logger.error("BOOKKEEPER GET Failure <- Request Error: %s", e)
-            raise
+    def provision_accounts(
+        self,
+        accounts: Iterable[LedgerAccount],
+        chunk_size: int = 500,
+        concurrency: Union[int, AdaptiveConcurrencyLimiter] = 4,
+        known_codes: Optional[KnownAccountCodes] = None,
+        checkpoint: Optional[Checkpoint] = None,
+    ) -> Dict[str, Any]:
+        """Bulk: Creates a large stream of accounts in chunked, concurrent create_accounts calls.
+
+        Accounts are read lazily from the iterable and grouped into requests of up to
+        chunk_size accounts. Codes already in known_codes are skipped, and codes created
+        successfully are added to it. With a checkpoint, the input offset up to which
+        every chunk succeeded is saved as the run progresses and skipped on the next
+        run, so an interrupted run resumes instead of starting over. Chunks after a
+        failed one are still submitted; on resume they are skipped through known_codes.
+
+        NOTE: the accounts iterable must yield the same accounts in the same order on
+        every run for the checkpoint offset to be meaningful.
+
+        Returns:
+            dict: Counts of accounts read, created, skipped as known and failed, the
+            final checkpoint offset, and a BulkResult per failed chunk under "errors"
+            (index is the chunk number).
+        """
+        start_offset = checkpoint.load() if checkpoint is not None else 0
+        report: Dict[str, Any] = {"read": 0, "created": 0, "skipped": 0, "failed": 0, "errors": []}
+
+        def chunks() -> Iterator[Tuple[int, List[LedgerAccount]]]:
+            # Yields (input offset after the chunk, accounts to create).
+            for end_offset, batch in offset_chunks(accounts, chunk_size, start_offset):
+                report["read"] += len(batch)
+                yield end_offset, self._unknown_accounts(batch, known_codes, report)
+
+        def create(chunk: Tuple[int, List[LedgerAccount]]) -> tuple[Dict[str, Any], int]:
+            _, batch = chunk
+            if not batch:
+                return {"message": "No new accounts"}, 200
+            result = self.create_accounts(batch)
+            if known_codes is not None:
+                known_codes.add(self.TENANT_ID, (acc.code for acc in batch))
+            return result
+
+        completed_offset = start_offset
+        for index, (end_offset, batch), future in self._iter_bulk(create, chunks(), concurrency):
+            result = self._bulk_result(index, future)
+            if not result.ok:
+                report["failed"] += len(batch)
+                report["errors"].append(result)
+                continue
+
+            report["created"] += len(batch)
+            if not report["errors"]:
+                completed_offset = end_offset
+                if checkpoint is not None:
+                    checkpoint.save(completed_offset)
+
+        report["offset"] = completed_offset
+        return report
+
+    def _unknown_accounts(
+        self, batch: List[LedgerAccount], known_codes: Optional[KnownAccountCodes], report: Dict[str, Any]
+    ) -> List[LedgerAccount]:
+        if known_codes is None or not batch:
+            return batch
+        unknown = set(known_codes.unknown(self.TENANT_ID, [acc.code for acc in batch]))
+        new_accounts = [acc for acc in batch if acc.code in unknown]
+        report["skipped"] += len(batch) - len(new_accounts)
+        return new_accounts
 
     def create_accounts(self, accounts: List[LedgerAccount]) -> tuple[Dict[str, Any], int]:
         """1. Setup: Creates system or user-specific ledger accounts.
@@ -176,14 +2169,8 @@ class BookKeeperClient:
         Returns:
             tuple: (response_data, status_code)
         """
-        data = {"tenant_id": self.TENANT_ID, "accounts": [acc.to_dict() for acc in accounts]}
-        response = self._post("accounts", data)
-
-        # Handle 204 No Content
-        if response.status_code == 204:
-            return {"message": "Accounts created successfully"}, response.status_code
-
-        return response.json(), response.status_code
+        response = self._post("accounts", self._accounts_payload(accounts))
+        return self._result(response, "Accounts created successfully")
 
     def refill_limiter_accounts(
         self, accounts_to_refill: List[RefillAccount], source_of_funds_account_code: str = "sys_rate_limiter_credit"
@@ -193,21 +2180,12 @@ class BookKeeperClient:
         Returns:
             tuple: (response_data, status_code)
         """
-        data = {
-            "tenant_id": self.TENANT_ID,
-            "source_of_funds_account_code": source_of_funds_account_code,
-            "accounts_to_refill": [
-                {"account_code": acc.account_code, "amount": acc.amount, "currency": acc.currency}
-                for acc in accounts_to_refill
-            ],
-        }
-        response = self._post("admin/limiter-accounts/refill", data)
+        data = self._refill_payload(accounts_to_refill, source_of_funds_account_code)
+        with self._invalidates(self._leg_codes(accounts_to_refill) + [source_of_funds_account_code]):
+            response = self._post("admin/limiter-accounts/refill", data)
 
         # NOTE: Refill operation might also return 204, but assuming it returns content for now.
-        if response.status_code == 204:
-            return {"message": "Limiter accounts refilled successfully"}, response.status_code
-
-        return response.json(), response.status_code
+        return self._result(response, "Limiter accounts refilled successfully")
 
     def atomic_compound_transfer(
         self,
@@ -215,26 +2193,17 @@ class BookKeeperClient:
         debit_legs: List[JournalLeg],
         credit_legs: List[JournalLeg],
         entry_date: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
     ) -> tuple[Dict[str, Any], int]:
         """3/4. Use Case: Performs an atomic, multi-leg transfer (including limit consumption).
 
         Returns:
             tuple: (response_data, status_code)
         """
-        entry_date = entry_date or get_current_entry_date()
-        data = {
-            "tenant_id": self.TENANT_ID,
-            "entry_date": entry_date,
-            "narration": narration,
-            "debit_legs": [leg.to_dict() for leg in debit_legs],
-            "credit_legs": [leg.to_dict() for leg in credit_legs],
-        }
-        response = self._post("transfers/compound", data)
-
-        if response.status_code == 204:
-            return {"message": "Compound transfer executed successfully"}, response.status_code
-
-        return response.json(), response.status_code
+        data = self._entry_payload(narration, debit_legs, credit_legs, entry_date, idempotency_key=idempotency_key)
+        with self._invalidates(self._leg_codes(debit_legs, credit_legs)):
+            response = self._post("transfers/compound", data)
+        return self._result(response, "Compound transfer executed successfully")
 
     def simple_journal_entry(
         self,
@@ -242,44 +2211,135 @@ class BookKeeperClient:
         debit_legs: List[JournalLeg],
         credit_legs: List[JournalLeg],
         entry_date: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
     ) -> tuple[Dict[str, Any], int]:
         """5/6. Use Case: Performs a standard journal entry (e.g., top-up, max_balance change).
 
         Returns:
             tuple: (response_data, status_code)
         """
-        entry_date = entry_date or get_current_entry_date()
-        data = {
-            "tenant_id": self.TENANT_ID,
-            "entry_date": entry_date,
-            "narration": narration,
-            "debit_legs": [leg.to_dict() for leg in debit_legs],
-            "credit_legs": [leg.to_dict() for leg in credit_legs],
-        }
-        response = self._post("journal-entries", data)
+        data = self._entry_payload(narration, debit_legs, credit_legs, entry_date, idempotency_key=idempotency_key)
+        with self._invalidates(self._leg_codes(debit_legs, credit_legs)):
+            response = self._post("journal-entries", data)
+        return self._result(response, "Journal entry posted successfully")
 
-        if response.status_code == 204:
-            return {"message": "Journal entry posted successfully"}, response.status_code
+    def enqueue_journal_entry(
+        self,
+        narration: str,
+        debit_legs: List[JournalLeg],
+        credit_legs: List[JournalLeg],
+        entry_date: Optional[str] = None,
+        compound: bool = False,
+        ordering_keys: Optional[List[str]] = None,
+    ) -> int:
+        """Queues a journal entry (or compound transfer) in the outbox instead of posting it.
 
-        return response.json(), response.status_code
+        The entry is validated and its entry_date fixed now; an OutboxDrainer posts it
+        later with an idempotency_key, in order with other queued writes sharing one of
+        its ordering_keys. These default to every account of the entry; pass the
+        per-user accounts (e.g. [wallet_code]) so that entries sharing a house account
+        such as BANK_SUSPENSE are not delivered one at a time.
+
+        Returns:
+            int: The outbox item id
+        """
+        if self.outbox is None:
+            raise ValueError("enqueue_journal_entry needs a client with an outbox")
 
-    def get_account_balances(self, account_codes: List[str]) -> tuple[List[Dict[str, Any]], int]:
+        data = self._entry_payload(narration, debit_legs, credit_legs, entry_date, idempotency_key=str(uuid.uuid4()))
+        endpoint = "transfers/compound" if compound else "journal-entries"
+        return self.outbox.enqueue(
+            self.TENANT_ID, endpoint, data, self._leg_codes(debit_legs, credit_legs), ordering_keys
+        )
+
+    def post_prepared(
+        self, endpoint: str, data: Dict[str, Any], account_codes: Optional[List[str]] = None
+    ) -> tuple[Dict[str, Any], int]:
+        """Posts a request body built earlier, e.g. an entry queued by enqueue_journal_entry.
+
+        Cached balances of account_codes are invalidated whether or not the write
+        succeeds; None invalidates the whole tenant.
+
+        Returns:
+            tuple: (response_data, status_code)
+        """
+        with self._invalidates(account_codes):
+            response = self._post(endpoint, data)
+        return self._result(response, "Request accepted")
+
+    def get_account_balances(
+        self, account_codes: List[str], deadline: Optional[float] = None
+    ) -> tuple[List[Dict[str, Any]], int]:
         """7. Use Case: Queries the current balance for one or more accounts.
 
         NOTE: FastAPI expects multiple query parameters with the same name (account_codes).
         The requests library automatically converts a list to repeated parameters:
         account_codes=['A', 'B'] becomes ?account_codes=A&account_codes=B
 
+        Args:
+            account_codes: Account codes to query
+            deadline: Optional time budget in seconds for the whole call; raises
+                requests.exceptions.Timeout when exceeded
+
         Returns:
             tuple: (response_data, status_code)
         """
         if not account_codes:
             return [], 200
 
-        # Pass list directly - requests converts to repeated query params
-        params = {"tenant_id": self.TENANT_ID, "account_codes": account_codes}
-        response = self._get("accounts/balances", params)
-        return response.json(), response.status_code
+        deadline_at = time.monotonic() + deadline if deadline is not None else None
+        if self.balance_cache is None:
+            return self._load_balances(account_codes, deadline_at)
+
+        # Only the codes that miss the cache are fetched; rows are returned in input order.
+        rows_by_code, missing = self.balance_cache.get_many(self.TENANT_ID, account_codes)
+        status_code = 200
+        if missing:
+            generation = self.balance_cache.generation
+            fetched, status_code = self._load_balances(missing, deadline_at)
+            self.balance_cache.put_many(self.TENANT_ID, fetched, generation)
+            for row in fetched:
+                rows_by_code[row["account_code"]] = row
+
+        rows = [rows_by_code[code] for code in dict.fromkeys(account_codes) if code in rows_by_code]
+        return rows, status_code
+
+    def _load_balances(
+        self, account_codes: List[str], deadline_at: Optional[float] = None
+    ) -> tuple[List[Dict[str, Any]], int]:
+        if self.balance_coalescer is None or deadline_at is not None:
+            return self._fetch_balances(account_codes, deadline_at)
+        return self.balance_coalescer.load(account_codes, self._fetch_balances)
+
+    def _fetch_balances(
+        self, account_codes: List[str], deadline_at: Optional[float] = None
+    ) -> tuple[List[Dict[str, Any]], int]:
+        """Fetches balances from the server, chunking and parallelising long code lists.
+
+        Duplicate codes are collapsed. When more than one chunk is needed the rows are
+        merged back into input order; the first failing chunk raises.
+        """
+        account_codes = list(dict.fromkeys(account_codes))
+        chunk_size = self.balance_chunk_size
+        if len(account_codes) <= chunk_size:
+            response = self._get("accounts/balances", self._balances_params(account_codes), deadline_at=deadline_at)
+            return response.json(), response.status_code
+
+        chunks = [account_codes[i : i + chunk_size] for i in range(0, len(account_codes), chunk_size)]
+        rows_by_code: Dict[str, Dict[str, Any]] = {}
+        status_code = 200
+        for _, _, future in self._iter_bulk(
+            lambda chunk: self._get("accounts/balances", self._balances_params(chunk), deadline_at=deadline_at),
+            chunks,
+            self.balance_fetch_concurrency,
+            lane=None,
+        ):
+            response = future.result()
+            status_code = response.status_code
+            for row in response.json():
+                rows_by_code[row["account_code"]] = row
+
+        return [rows_by_code[code] for code in account_codes if code in rows_by_code], status_code
 
     def create_pending_journal_entry(
         self,
@@ -294,21 +2354,13 @@ class BookKeeperClient:
         Returns:
             tuple: (response_data, status_code)
         """
-        entry_date = entry_date or get_current_entry_date()
-        data = {
-            "tenant_id": self.TENANT_ID,
-            "narration": narration,
-            "entry_date": entry_date,
-            "debit_legs": [leg.to_dict() for leg in debit_legs],
-            "credit_legs": [leg.to_dict() for leg in credit_legs],
-            "timeout_seconds": timeout_seconds,
-        }
-        response = self._post("pending-journal-entries", data)
-
-        if response.status_code == 204:
-            return {"message": "Pending journal entry created successfully"}, response.status_code
-
-        return response.json(), response.status_code
+        data = self._entry_payload(narration, debit_legs, credit_legs, entry_date, timeout_seconds)
+        account_codes = self._leg_codes(debit_legs, credit_legs)
+        with self._invalidates(account_codes):
+            response = self._post("pending-journal-entries", data)
+        result = self._result(response, "Pending journal entry created successfully")
+        self._remember_pending(result[0], account_codes, False, timeout_seconds)
+        return result
 
     def create_pending_compound_transfer(
         self,
@@ -323,21 +2375,13 @@ class BookKeeperClient:
         Returns:
             tuple: (response_data, status_code)
         """
-        entry_date = entry_date or get_current_entry_date()
-        data = {
-            "tenant_id": self.TENANT_ID,
-            "narration": narration,
-            "entry_date": entry_date,
-            "debit_legs": [leg.to_dict() for leg in debit_legs],
-            "credit_legs": [leg.to_dict() for leg in credit_legs],
-            "timeout_seconds": timeout_seconds,
-        }
-        response = self._post("pending-compound-transfers", data)
-
-        if response.status_code == 204:
-            return {"message": "Pending compound transfer created successfully"}, response.status_code
-
-        return response.json(), response.status_code
+        data = self._entry_payload(narration, debit_legs, credit_legs, entry_date, timeout_seconds)
+        account_codes = self._leg_codes(debit_legs, credit_legs)
+        with self._invalidates(account_codes):
+            response = self._post("pending-compound-transfers", data)
+        result = self._result(response, "Pending compound transfer created successfully")
+        self._remember_pending(result[0], account_codes, True, timeout_seconds)
+        return result
 
     def void_pending_journal_entry(self, entry_id: str) -> tuple[Dict[str, Any], int]:
         """Voids (cancels) a pending journal entry.
@@ -348,13 +2392,13 @@ class BookKeeperClient:
         Returns:
             tuple: (response_data, status_code)
         """
-        data = {"tenant_id": self.TENANT_ID}
-        response = self._post(f"pending-journal-entries/{entry_id}/void", data)
-
-        if response.status_code == 204:
-            return {"message": f"Pending journal entry {entry_id} voided successfully"}, response.status_code
-
-        return response.json(), response.status_code
+        with self._finalizes_pending(entry_id):
+            response = self._post(
+                f"pending-journal-entries/{entry_id}/void",
+                self._tenant_payload(),
+                route="pending-journal-entries/{entry_id}/void",
+            )
+        return self._result(response, f"Pending journal entry {entry_id} voided successfully")
 
     def post_pending_journal_entry(self, entry_id: str) -> tuple[Dict[str, Any], int]:
         """Posts (commits) a pending journal entry.
@@ -365,13 +2409,13 @@ class BookKeeperClient:
         Returns:
             tuple: (response_data, status_code)
         """
-        data = {"tenant_id": self.TENANT_ID}
-        response = self._post(f"pending-journal-entries/{entry_id}/commit", data)
-
-        if response.status_code == 204:
-            return {"message": f"Pending journal entry {entry_id} posted successfully"}, response.status_code
-
-        return response.json(), response.status_code
+        with self._finalizes_pending(entry_id):
+            response = self._post(
+                f"pending-journal-entries/{entry_id}/commit",
+                self._tenant_payload(),
+                route="pending-journal-entries/{entry_id}/commit",
+            )
+        return self._result(response, f"Pending journal entry {entry_id} posted successfully")
 
     def void_pending_compound_transfer(self, entry_id: str) -> tuple[Dict[str, Any], int]:
         """Voids (cancels) a pending compound transfer.
@@ -382,13 +2426,13 @@ class BookKeeperClient:
         Returns:
             tuple: (response_data, status_code)
         """
-        data = {"tenant_id": self.TENANT_ID}
-        response = self._post(f"pending-compound-transfers/{entry_id}/void", data)
-
-        if response.status_code == 204:
-            return {"message": f"Pending compound transfer {entry_id} voided successfully"}, response.status_code
-
-        return response.json(), response.status_code
+        with self._finalizes_pending(entry_id):
+            response = self._post(
+                f"pending-compound-transfers/{entry_id}/void",
+                self._tenant_payload(),
+                route="pending-compound-transfers/{entry_id}/void",
+            )
+        return self._result(response, f"Pending compound transfer {entry_id} voided successfully")
 
     def post_pending_compound_transfer(self, entry_id: str) -> tuple[Dict[str, Any], int]:
         """Posts (commits) a pending compound transfer.
@@ -399,13 +2443,13 @@ class BookKeeperClient:
         Returns:
             tuple: (response_data, status_code)
         """
-        data = {"tenant_id": self.TENANT_ID}
-        response = self._post(f"pending-compound-transfers/{entry_id}/commit", data)
-
-        if response.status_code == 204:
-            return {"message": f"Pending compound transfer {entry_id} posted successfully"}, response.status_code
-
-        return response.json(), response.status_code
+        with self._finalizes_pending(entry_id):
+            response = self._post(
+                f"pending-compound-transfers/{entry_id}/commit",
+                self._tenant_payload(),
+                route="pending-compound-transfers/{entry_id}/commit",
+            )
+        return self._result(response, f"Pending compound transfer {entry_id} posted successfully")
 
     def close_account(
         self, account_code: str, destination_account_code: str = "PAYABLES_EXTERNAL", currency: str = "INR"
@@ -420,14 +2464,237 @@ class BookKeeperClient:
         Returns:
             tuple: (response_data, status_code)
         """
-        data = {
-            "tenant_id": self.TENANT_ID,
-            "destination_account_code": destination_account_code,
-            "currency": currency,
-        }
-        response = self._post(f"accounts/{account_code}/close", data)
+        data = self._close_account_payload(destination_account_code, currency)
+        with self._invalidates([account_code, destination_account_code]):
+            response = self._post(f"accounts/{account_code}/close", data, route="accounts/{account_code}/close")
+        return self._result(response, f"Account {account_code} closed successfully")
 
-        if response.status_code == 204:
-            return {"message": f"Account {account_code} closed successfully"}, response.status_code
 
+# --- Async Client Class ---
+
+
+class AsyncBookKeeperClient(_BookKeeperBase):
+    """
+    An asyncio client for the book-keeper REST API.
+
+    Mirrors every public method of BookKeeperClient as a coroutine. All calls go
+    through one httpx.AsyncClient connection pool, which can also be passed in
+    to share it between several clients (e.g. one per tenant) on the same loop.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        tenant_id: str,
+        headers: Optional[Dict[str, str]],
+        logger: logging.Logger = logger,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: Optional[float] = 60.0,
+        http_client: Optional["httpx.AsyncClient"] = None,
+        validate_entries: bool = True,
+        compact_legs: bool = False,
+        transport: Optional["httpx.AsyncBaseTransport"] = None,
+    ):
+        if httpx is None:
+            raise ImportError("AsyncBookKeeperClient requires httpx (pip install httpx)")
+
+        super().__init__(base_url, tenant_id, headers, logger, validate_entries, compact_legs)
+
+        # A client passed in by the caller is shared, so it is left open on close().
+        # transport replaces the default connection pool (and its limits), e.g.
+        # httpx.ASGITransport(app) or httpx.AsyncHTTPTransport(uds="/run/book-keeper.sock").
+        self._owns_http_client = http_client is None
+        self._http_client = http_client or httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            transport=transport,
+        )
+
+    async def aclose(self) -> None:
+        """Closes the connection pool if this client created it."""
+        if self._owns_http_client:
+            await self._http_client.aclose()
+
+    async def __aenter__(self) -> "AsyncBookKeeperClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.aclose()
+
+    async def _post(self, endpoint: str, data: Dict[str, Any], route: Optional[str] = None) -> "httpx.Response":
+        """Helper for making POST requests with logging.
+
+        route is the endpoint with IDs replaced by placeholders, as for BookKeeperClient._request.
+        """
+        url = f"{self.base_url}/{endpoint}"
+
+        self.logger.info("BOOKKEEPER POST Request -> %s", url)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Payload: %s", json.dumps(data, indent=2))
+
+        body = _json_dumps(data)
+        with self._traced("POST", route or endpoint, url, len(body)) as (span, headers):
+            try:
+                response = await self._http_client.post(url, headers=headers, content=body)
+                self._end_span(span, response.status_code, len(response.content))
+                response.raise_for_status()
+
+                self.logger.info("BOOKKEEPER POST Success <- Status: %s", response.status_code)
+                return response
+
+            except httpx.HTTPStatusError as e:
+                self.logger.error(
+                    "BOOKKEEPER POST Failure <- HTTP Error: %s. Response: %s", e.response.status_code, e.response.text
+                )
+                raise
+
+            except httpx.HTTPError as e:
+                self.logger.error("BOOKKEEPER POST Failure <- Request Error: %s", e)
+                raise
+
+    async def _get(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> "httpx.Response":
+        """Helper for making GET requests with logging."""
+        url = f"{self.base_url}/{endpoint}"
+
+        self.logger.info("BOOKKEEPER GET Request -> %s", url)
+        self.logger.debug("Params: %s", params)
+
+        with self._traced("GET", endpoint, url, 0) as (span, headers):
+            try:
+                response = await self._http_client.get(url, headers=headers, params=params)
+                self._end_span(span, response.status_code, len(response.content))
+                response.raise_for_status()
+
+                self.logger.info("BOOKKEEPER GET Success <- Status: %s", response.status_code)
+                return response
+
+            except httpx.HTTPStatusError as e:
+                self.logger.error(
+                    "BOOKKEEPER GET Failure <- HTTP Error: %s. Response: %s", e.response.status_code, e.response.text
+                )
+                raise
+
+            except httpx.HTTPError as e:
+                self.logger.error("BOOKKEEPER GET Failure <- Request Error: %s", e)
+                raise
+
+    async def create_accounts(self, accounts: List[LedgerAccount]) -> tuple[Dict[str, Any], int]:
+        """Async variant of BookKeeperClient.create_accounts."""
+        response = await self._post("accounts", self._accounts_payload(accounts))
+        return self._result(response, "Accounts created successfully")
+
+    async def refill_limiter_accounts(
+        self, accounts_to_refill: List[RefillAccount], source_of_funds_account_code: str = "sys_rate_limiter_credit"
+    ) -> tuple[Dict[str, Any], int]:
+        """Async variant of BookKeeperClient.refill_limiter_accounts."""
+        data = self._refill_payload(accounts_to_refill, source_of_funds_account_code)
+        response = await self._post("admin/limiter-accounts/refill", data)
+        return self._result(response, "Limiter accounts refilled successfully")
+
+    async def atomic_compound_transfer(
+        self,
+        narration: str,
+        debit_legs: List[JournalLeg],
+        credit_legs: List[JournalLeg],
+        entry_date: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> tuple[Dict[str, Any], int]:
+        """Async variant of BookKeeperClient.atomic_compound_transfer."""
+        data = self._entry_payload(narration, debit_legs, credit_legs, entry_date, idempotency_key=idempotency_key)
+        response = await self._post("transfers/compound", data)
+        return self._result(response, "Compound transfer executed successfully")
+
+    async def simple_journal_entry(
+        self,
+        narration: str,
+        debit_legs: List[JournalLeg],
+        credit_legs: List[JournalLeg],
+        entry_date: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> tuple[Dict[str, Any], int]:
+        """Async variant of BookKeeperClient.simple_journal_entry."""
+        data = self._entry_payload(narration, debit_legs, credit_legs, entry_date, idempotency_key=idempotency_key)
+        response = await self._post("journal-entries", data)
+        return self._result(response, "Journal entry posted successfully")
+
+    async def get_account_balances(self, account_codes: List[str]) -> tuple[List[Dict[str, Any]], int]:
+        """Async variant of BookKeeperClient.get_account_balances."""
+        if not account_codes:
+            return [], 200
+
+        response = await self._get("accounts/balances", self._balances_params(account_codes))
         return response.json(), response.status_code
+
+    async def create_pending_journal_entry(
+        self,
+        narration: str,
+        debit_legs: List[JournalLeg],
+        credit_legs: List[JournalLeg],
+        timeout_seconds: int,
+        entry_date: Optional[str] = None,
+    ) -> tuple[Dict[str, Any], int]:
+        """Async variant of BookKeeperClient.create_pending_journal_entry."""
+        data = self._entry_payload(narration, debit_legs, credit_legs, entry_date, timeout_seconds)
+        response = await self._post("pending-journal-entries", data)
+        return self._result(response, "Pending journal entry created successfully")
+
+    async def create_pending_compound_transfer(
+        self,
+        narration: str,
+        debit_legs: List[JournalLeg],
+        credit_legs: List[JournalLeg],
+        timeout_seconds: int,
+        entry_date: Optional[str] = None,
+    ) -> tuple[Dict[str, Any], int]:
+        """Async variant of BookKeeperClient.create_pending_compound_transfer."""
+        data = self._entry_payload(narration, debit_legs, credit_legs, entry_date, timeout_seconds)
+        response = await self._post("pending-compound-transfers", data)
+        return self._result(response, "Pending compound transfer created successfully")
+
+    async def void_pending_journal_entry(self, entry_id: str) -> tuple[Dict[str, Any], int]:
+        """Async variant of BookKeeperClient.void_pending_journal_entry."""
+        response = await self._post(
+            f"pending-journal-entries/{entry_id}/void",
+            self._tenant_payload(),
+            route="pending-journal-entries/{entry_id}/void",
+        )
+        return self._result(response, f"Pending journal entry {entry_id} voided successfully")
+
+    async def post_pending_journal_entry(self, entry_id: str) -> tuple[Dict[str, Any], int]:
+        """Async variant of BookKeeperClient.post_pending_journal_entry."""
+        response = await self._post(
+            f"pending-journal-entries/{entry_id}/commit",
+            self._tenant_payload(),
+            route="pending-journal-entries/{entry_id}/commit",
+        )
+        return self._result(response, f"Pending journal entry {entry_id} posted successfully")
+
+    async def void_pending_compound_transfer(self, entry_id: str) -> tuple[Dict[str, Any], int]:
+        """Async variant of BookKeeperClient.void_pending_compound_transfer."""
+        response = await self._post(
+            f"pending-compound-transfers/{entry_id}/void",
+            self._tenant_payload(),
+            route="pending-compound-transfers/{entry_id}/void",
+        )
+        return self._result(response, f"Pending compound transfer {entry_id} voided successfully")
+
+    async def post_pending_compound_transfer(self, entry_id: str) -> tuple[Dict[str, Any], int]:
+        """Async variant of BookKeeperClient.post_pending_compound_transfer."""
+        response = await self._post(
+            f"pending-compound-transfers/{entry_id}/commit",
+            self._tenant_payload(),
+            route="pending-compound-transfers/{entry_id}/commit",
+        )
+        return self._result(response, f"Pending compound transfer {entry_id} posted successfully")
+
+    async def close_account(
+        self, account_code: str, destination_account_code: str = "PAYABLES_EXTERNAL", currency: str = "INR"
+    ) -> tuple[Dict[str, Any], int]:
+        """Async variant of BookKeeperClient.close_account."""
+        data = self._close_account_payload(destination_account_code, currency)
+        response = await self._post(f"accounts/{account_code}/close", data, route="accounts/{account_code}/close")
+        return self._result(response, f"Account {account_code} closed successfully")
@@ -0,0 +1,300 @@
+"""
+Bulk Ledger Jobs
+Long-running bulk operations built on BookKeeperClient.
+
+- PendingSweeper voids pending entries whose local lease has expired.
+- LimiterRefillEngine refills limiter accounts in checkpointed batches.
+"""
+
+import threading
+import time
+from bisect import bisect_right, insort
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from book_keeper_client import (
+    AdaptiveConcurrencyLimiter,
+    BookKeeperClient,
+    BulkResult,
+    Checkpoint,
+    RefillAccount,
+    offset_chunks,
+)
+
+# --- Pending Sweeper ---
+
+
+class PendingSweeper:
+    """
+    Background thread that voids pending entries whose local lease has expired.
+
+    A reservation orphaned by a crashed worker otherwise holds wallet and limiter
+    capacity until the server-side timeout_seconds runs out. The sweeper voids such
+    entries in bulk every `interval` seconds, using a client whose PendingRegistry is
+    shared with the workers (a SQLite file on the same host).
+    """
+
+    def __init__(
+        self,
+        client: BookKeeperClient,
+        interval: float = 5.0,
+        batch_size: int = 500,
+        concurrency: Union[int, AdaptiveConcurrencyLimiter] = 8,
+    ):
+        if client.pending_registry is None:
+            raise ValueError("PendingSweeper needs a client with a pending_registry")
+
+        self.client = client
+        self.registry = client.pending_registry
+        self.interval = interval
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.reclaimed = 0
+        self.failed = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sweep_once(self) -> int:
+        """Voids one batch of expired reservations. Returns how many were reclaimed."""
+        expired = self.registry.expired(self.client.TENANT_ID, limit=self.batch_size)
+        reclaimed = 0
+        for compound in (False, True):
+            entry_ids = [entry_id for entry_id, is_compound in expired if is_compound == compound]
+            if not entry_ids:
+                continue
+
+            done = []
+            for result in self.client.void_pending_entries(entry_ids, compound, self.concurrency, lane="bulk"):
+                entry_id = entry_ids[result.index]
+                if result.ok:
+                    reclaimed += 1
+                    done.append(entry_id)
+                elif result.status_code is not None and result.status_code < 500:
+                    # Already committed, voided or expired on the server: nothing left to reclaim.
+                    done.append(entry_id)
+                else:
+                    # Left in the registry and retried on the next sweep.
+                    self.failed += 1
+            self.registry.remove(done)
+
+        self.reclaimed += reclaimed
+        if reclaimed:
+            self.client.logger.info("BOOKKEEPER sweeper voided %s expired pending entries", reclaimed)
+        return reclaimed
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "outstanding": self.registry.outstanding(self.client.TENANT_ID),
+            "reclaimed": self.reclaimed,
+            "failed": self.failed,
+        }
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                while self.sweep_once() >= self.batch_size and not self._stop.is_set():
+                    pass
+            except Exception:
+                self.client.logger.exception("BOOKKEEPER pending sweeper failed")
+
+    def start(self) -> "PendingSweeper":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="bookkeeper-pending-sweeper", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+# --- Limiter Refills ---
+
+
+class LimiterRefillEngine:
+    """
+    Bulk limiter refill (e.g. the midnight reset of daily amount/count limiters).
+
+    Reads RefillAccounts lazily from any iterable (a generator over a DB cursor keeps
+    memory flat for millions of users), groups them into refill_limiter_accounts
+    requests of batch_size accounts and runs up to `concurrency` of them at once.
+    Progress (accounts/s and failures) is logged every progress_interval seconds and
+    available from stats().
+
+    Refills have no idempotency key, so a rerun must not send a batch again. With a
+    Checkpoint, every batch is recorded as soon as it succeeds: the checkpoint holds
+    the input offset up to which all batches succeeded plus the input ranges that
+    succeeded after it. A rerun over the same input skips the recorded accounts and
+    refills only the rest. Only a batch whose request was in flight when the process
+    died may be refilled twice; delta_only runs are not affected, since they top
+    limiters up to their cap.
+
+    With delta_only=True each RefillAccount's amount is treated as the limiter's cap:
+    the batch's current balances are read through get_account_balances and only the
+    consumed part (cap - balance) is refilled. Limiters already at their cap are
+    skipped, so users who did not touch their limit cost a balance lookup instead of
+    a transfer. Accounts missing from the balance response get the full amount.
+
+    Example:
+        refills = (RefillAccount(code, 1000000, "INR") for code in daily_amount_limiter_codes())
+        LimiterRefillEngine(client, checkpoint=Checkpoint("/tmp/refill-2024-06-01.json")).run(refills)
+    """
+
+    def __init__(
+        self,
+        client: BookKeeperClient,
+        batch_size: int = 1000,
+        concurrency: Union[int, AdaptiveConcurrencyLimiter] = 8,
+        source_of_funds_account_code: str = "sys_rate_limiter_credit",
+        checkpoint: Optional[Checkpoint] = None,
+        progress_interval: float = 10.0,
+        delta_only: bool = False,
+    ):
+        self.client = client
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.source_of_funds_account_code = source_of_funds_account_code
+        self.checkpoint = checkpoint
+        self.progress_interval = progress_interval
+        self.delta_only = delta_only
+        self._stats: Dict[str, Any] = {}
+        self._started = 0.0
+        self._lock = threading.Lock()
+        # Input offset up to which every batch succeeded, and the [start, end) ranges that
+        # succeeded beyond it (merged, sorted). _resumed holds those loaded from the checkpoint.
+        self._offset = 0
+        self._completed: List[List[int]] = []
+        self._resumed: List[Tuple[int, int]] = []
+
+    def _consumed(self, batch: List[RefillAccount]) -> List[RefillAccount]:
+        """Turns caps into the amounts needed to bring each limiter back to its cap."""
+        codes = [refill.account_code for refill in batch]
+        if self.client.balance_cache is not None:
+            # A stale cached balance would under-refill; always read the live value.
+            self.client.balance_cache.invalidate(self.client.TENANT_ID, codes)
+        rows, _ = self.client.get_account_balances(codes)
+        balances = {row["account_code"]: int(row["balance"]) for row in rows}
+
+        deltas = []
+        for refill in batch:
+            delta = refill.amount - max(balances.get(refill.account_code, 0), 0)
+            if delta > 0:
+                deltas.append(RefillAccount(refill.account_code, delta, refill.currency))
+        return deltas
+
+    def _done_before(self, index: int) -> bool:
+        """Returns True if the input item at index was refilled by an earlier run."""
+        position = bisect_right(self._resumed, (index, float("inf"))) - 1
+        return position >= 0 and index < self._resumed[position][1]
+
+    def _mark_done(self, start: int, end: int) -> None:
+        """Records a successful batch and saves the checkpoint."""
+        with self._lock:
+            if end > start:
+                insort(self._completed, [start, end])
+                merged: List[List[int]] = []
+                for done in self._completed:
+                    if merged and done[0] <= merged[-1][1]:
+                        merged[-1][1] = max(merged[-1][1], done[1])
+                    else:
+                        merged.append(done)
+                while merged and merged[0][0] <= self._offset:
+                    self._offset = max(self._offset, merged.pop(0)[1])
+                self._completed = merged
+            if self.checkpoint is not None:
+                self.checkpoint.save(self._offset, [tuple(done) for done in self._completed])
+
+    def _refill_batch(self, chunk: Tuple[int, List[RefillAccount]]) -> tuple[Dict[str, Any], int]:
+        end_offset, batch = chunk
+        start = end_offset - len(batch)
+        if self._resumed:
+            todo = [refill for index, refill in enumerate(batch, start) if not self._done_before(index)]
+            with self._lock:
+                self._stats["already_refilled"] += len(batch) - len(todo)
+            batch = todo
+        if self.delta_only and batch:
+            to_refill = self._consumed(batch)
+            with self._lock:
+                self._stats["skipped"] += len(batch) - len(to_refill)
+                self._stats["refilled_amount"] += sum(refill.amount for refill in to_refill)
+            batch = to_refill
+        if batch:
+            result = self.client.refill_limiter_accounts(batch, self.source_of_funds_account_code)
+        else:
+            result = {"message": "Nothing to refill"}, 200
+        self._mark_done(start, end_offset)
+        return result
+
+    def run(self, refills: Iterable[RefillAccount]) -> Dict[str, Any]:
+        """Refills every account from the iterable.
+
+        Failed batches are reported and do not stop the run; a rerun with the same
+        checkpoint retries them and skips every batch that succeeded.
+
+        Returns:
+            dict: Final stats (see stats()) plus a BulkResult per failed batch under
+            "errors" (index is the batch number).
+        """
+        start_offset, self._resumed = self.checkpoint.load_state() if self.checkpoint is not None else (0, [])
+        self._offset = start_offset
+        self._completed = [list(done) for done in self._resumed]
+        self._started = time.monotonic()
+        self._stats = {
+            "refilled": 0,
+            "skipped": 0,
+            "already_refilled": 0,
+            "refilled_amount": 0,
+            "failed": 0,
+            "batches": 0,
+            "failed_batches": 0,
+            "offset": start_offset,
+        }
+        errors: List[BulkResult] = []
+        last_progress = self._started
+
+        chunks = offset_chunks(refills, self.batch_size, start_offset)
+        for (_, batch), result in self.client.map_bulk(self._refill_batch, chunks, self.concurrency):
+            self._stats["batches"] += 1
+            if result.ok:
+                with self._lock:
+                    self._stats["refilled"] += len(batch)
+                    self._stats["offset"] = self._offset
+            else:
+                self._stats["failed"] += len(batch)
+                self._stats["failed_batches"] += 1
+                errors.append(result)
+
+            now = time.monotonic()
+            if now - last_progress >= self.progress_interval:
+                last_progress = now
+                self._log_progress()
+
+        self._stats["offset"] = self._offset
+        self._log_progress()
+        return {**self.stats(), "errors": errors}
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns counters of the current (or last) run and its throughput.
+
+        "refilled" counts accounts whose batch succeeded, including any skipped in
+        delta_only mode because they were already at their cap ("skipped") and any
+        refilled by an earlier run over the same checkpoint ("already_refilled").
+        """
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        with self._lock:
+            stats = dict(self._stats, elapsed_seconds=elapsed)
+        stats["accounts_per_second"] = stats.get("refilled", 0) / elapsed if elapsed else 0.0
+        return stats
+
+    def _log_progress(self) -> None:
+        stats = self.stats()
+        self.client.logger.info(
+            "BOOKKEEPER refill: %s accounts refilled (%.0f/s), %s failed in %s batches, offset %s",
+            stats["refilled"],
+            stats["accounts_per_second"],
+            stats["failed"],
+            stats["failed_batches"],
+            stats["offset"],
+        )
@@ -0,0 +1,345 @@
+"""
+Ledger Outbox
+Durable local queue of ledger writes, and the background drainer that delivers it.
+
+BookKeeperClient.enqueue_journal_entry stores a write in a LedgerOutbox and returns
+at once; an OutboxDrainer posts the queued writes to book-keeper:
+
+    outbox = LedgerOutbox("/var/lib/app/ledger-outbox.db")
+    client = BookKeeperClient(base_url, tenant_id, headers, outbox=outbox)
+    drainer = OutboxDrainer(client).start()
+    client.enqueue_journal_entry("Wallet top-up", debit_legs, credit_legs, ordering_keys=[wallet_code])
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from book_keeper_client import AdaptiveConcurrencyLimiter, BookKeeperClient
+
+_compact_json = json.JSONEncoder(separators=(",", ":"))
+
+# --- Durable Outbox ---
+
+
+class OutboxItem:
+    """A write waiting in a LedgerOutbox.
+
+    Writes sharing an ordering key are delivered in enqueue order; ordering_keys
+    defaults to account_codes. payload may be given as the stored JSON and is then
+    decoded on first access, so items the drainer skips are never decoded.
+    """
+
+    __slots__ = ("item_id", "endpoint", "_payload", "account_codes", "ordering_keys", "attempts", "next_attempt_at")
+
+    def __init__(
+        self,
+        item_id: int,
+        endpoint: str,
+        payload: Union[Dict[str, Any], bytes, str],
+        account_codes: List[str],
+        attempts: int,
+        next_attempt_at: float,
+        ordering_keys: Optional[List[str]] = None,
+    ):
+        self.item_id = item_id
+        self.endpoint = endpoint
+        self._payload = payload
+        self.account_codes = account_codes
+        self.ordering_keys = account_codes if ordering_keys is None else ordering_keys
+        self.attempts = attempts
+        self.next_attempt_at = next_attempt_at
+
+    @property
+    def payload(self) -> Dict[str, Any]:
+        if isinstance(self._payload, (bytes, str)):
+            self._payload = json.loads(self._payload)
+        return self._payload
+
+    def __repr__(self) -> str:
+        return f"OutboxItem(item_id={self.item_id}, endpoint={self.endpoint!r}, attempts={self.attempts})"
+
+
+class LedgerOutbox:
+    """
+    Durable local queue of ledger writes, delivered in the background by an OutboxDrainer.
+
+    Enqueueing is a single SQLite insert (tens of microseconds), so a user-facing request
+    does not wait on book-keeper. Items are delivered in enqueue order per ordering key
+    (by default, per account) and deleted once accepted; items the server rejects are kept with status "dead" for
+    inspection. With a file path the queue survives process restarts. The default
+    synchronous="NORMAL" survives application crashes; use "FULL" to also survive power
+    loss at the cost of an fsync per enqueue.
+
+    NOTE: run a single drainer per outbox file, otherwise per-key ordering is lost.
+    """
+
+    def __init__(self, path: str = ":memory:", synchronous: str = "NORMAL"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30.0)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(f"PRAGMA synchronous={synchronous}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " tenant_id TEXT NOT NULL,"
+            " endpoint TEXT NOT NULL,"
+            " payload BLOB NOT NULL,"
+            " account_codes TEXT NOT NULL,"
+            " enqueued_at REAL NOT NULL,"
+            " status TEXT NOT NULL DEFAULT 'queued',"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " next_attempt_at REAL NOT NULL DEFAULT 0,"
+            " last_error TEXT,"
+            " ordering_keys TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")}
+        if "ordering_keys" not in columns:
+            # Outbox files written before ordering keys existed; their items order on account_codes.
+            self._conn.execute("ALTER TABLE outbox ADD COLUMN ordering_keys TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS outbox_status ON outbox (tenant_id, status, id)")
+
+    def enqueue(
+        self,
+        tenant_id: str,
+        endpoint: str,
+        payload: Dict[str, Any],
+        account_codes: List[str],
+        ordering_keys: Optional[List[str]] = None,
+    ) -> int:
+        """Stores a POST of payload to endpoint. Returns the item id.
+
+        account_codes are the accounts whose cached balances the write invalidates.
+        Items sharing an ordering key are delivered in enqueue order; None orders the
+        item on account_codes.
+        """
+        keys = None if ordering_keys is None else json.dumps(ordering_keys)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO outbox (tenant_id, endpoint, payload, account_codes, ordering_keys, enqueued_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (tenant_id, endpoint, _compact_json.encode(payload), json.dumps(account_codes), keys, time.time()),
+            )
+        return cursor.lastrowid
+
+    def head(self, tenant_id: str, limit: int = 200, after_id: int = 0) -> List[OutboxItem]:
+        """Returns the oldest queued items after after_id, including those waiting for a retry."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, endpoint, payload, account_codes, attempts, next_attempt_at, ordering_keys FROM outbox"
+                " WHERE tenant_id = ? AND status = 'queued' AND id > ? ORDER BY id LIMIT ?",
+                (tenant_id, after_id, limit),
+            ).fetchall()
+        return [
+            OutboxItem(
+                item_id, endpoint, payload, json.loads(codes), attempts, next_attempt_at, keys and json.loads(keys)
+            )
+            for item_id, endpoint, payload, codes, attempts, next_attempt_at, keys in rows
+        ]
+
+    def delete(self, item_ids: Iterable[int]) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in item_ids])
+
+    def retry_later(self, item_id: int, delay: float, error: Optional[str]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (time.time() + delay, error, item_id),
+            )
+
+    def dead_letter(self, item_id: int, error: Optional[str]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = 'dead', attempts = attempts + 1, last_error = ? WHERE id = ?",
+                (error, item_id),
+            )
+
+    def depth(self, tenant_id: Optional[str] = None, status: str = "queued") -> int:
+        """Returns the number of items with the given status ("queued" or "dead")."""
+        with self._lock:
+            if tenant_id is None:
+                return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE status = ?", (status,)).fetchone()[0]
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE tenant_id = ? AND status = ?", (tenant_id, status)
+            ).fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# --- Outbox Drainer ---
+
+
+class OutboxDrainer:
+    """
+    Background thread that delivers a LedgerOutbox to book-keeper.
+
+    Each pass reads up to batch_size of the oldest deliverable items and splits them into
+    waves in which no two items share an ordering key; a wave is sent with up to
+    `concurrency` requests in flight, and waves run one after another, so writes sharing
+    a key reach the server in enqueue order. Items are keyed on all their accounts
+    unless enqueued with explicit ordering_keys; key writes on the per-user account
+    (e.g. the wallet) so that writes sharing a house account such as BANK_SUSPENSE
+    still go out concurrently. Connection errors, timeouts, 429 and 5xx responses are
+    retried with exponential backoff, and the failed item blocks later items on its
+    keys until it is delivered. Other 4xx responses move the
+    item to the dead letters (LedgerOutbox.depth(status="dead")).
+
+    Items carry an idempotency_key, so a write that timed out after being applied is
+    not applied twice on retry.
+    """
+
+    def __init__(
+        self,
+        client: BookKeeperClient,
+        outbox: Optional[LedgerOutbox] = None,
+        batch_size: int = 200,
+        concurrency: Union[int, AdaptiveConcurrencyLimiter] = 8,
+        interval: float = 0.05,
+        retry_backoff: float = 0.5,
+        max_backoff: float = 60.0,
+        rate_window: float = 60.0,
+    ):
+        outbox = outbox or client.outbox
+        if outbox is None:
+            raise ValueError("OutboxDrainer needs an outbox")
+
+        self.client = client
+        self.outbox = outbox
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.interval = interval
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.rate_window = rate_window
+        self.delivered = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self._deliveries: deque = deque()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _ready(self) -> List[OutboxItem]:
+        """Returns up to batch_size of the oldest items that may be sent now, in order.
+
+        An item waiting for a retry blocks the later items on its ordering keys (and,
+        through them, on their other keys). Pages past blocked items, so a key that
+        keeps failing only holds back its own writes; the payloads of skipped items
+        are not decoded.
+        """
+        now = time.time()
+        blocked: set = set()
+        ready: List[OutboxItem] = []
+        after_id = 0
+        while len(ready) < self.batch_size:
+            page = self.outbox.head(self.client.TENANT_ID, self.batch_size, after_id)
+            for item in page:
+                if item.next_attempt_at > now or blocked.intersection(item.ordering_keys):
+                    blocked.update(item.ordering_keys)
+                elif len(ready) < self.batch_size:
+                    ready.append(item)
+            if len(page) < self.batch_size:
+                break
+            after_id = page[-1].item_id
+        return ready
+
+    def _waves(self, items: List[OutboxItem]) -> List[List[OutboxItem]]:
+        """Groups items into waves of items with disjoint ordering keys, in order."""
+        last_wave: Dict[str, int] = {}
+        waves: List[List[OutboxItem]] = []
+        for item in items:
+            keys = item.ordering_keys
+            wave = max((last_wave.get(key, -1) for key in keys), default=-1) + 1
+            for key in keys:
+                last_wave[key] = wave
+            if wave == len(waves):
+                waves.append([])
+            waves[wave].append(item)
+        return waves
+
+    def _deliver(self, item: OutboxItem) -> tuple[Dict[str, Any], int]:
+        return self.client.post_prepared(item.endpoint, item.payload, item.account_codes)
+
+    def drain_once(self) -> int:
+        """Delivers one batch of queued items. Returns how many were delivered."""
+        blocked: set = set()
+        delivered = 0
+        for wave in self._waves(self._ready()):
+            deliverable = []
+            for item in wave:
+                if blocked.intersection(item.ordering_keys):
+                    blocked.update(item.ordering_keys)
+                else:
+                    deliverable.append(item)
+            done = []
+            for item, result in self.client.map_bulk(self._deliver, deliverable, self.concurrency):
+                if result.ok:
+                    done.append(item.item_id)
+                elif result.status_code is None or result.status_code in (408, 429) or result.status_code >= 500:
+                    delay = min(self.retry_backoff * 2**item.attempts, self.max_backoff)
+                    self.outbox.retry_later(item.item_id, delay, result.error)
+                    blocked.update(item.ordering_keys)
+                    self.retried += 1
+                else:
+                    self.outbox.dead_letter(item.item_id, f"{result.error}: {result.body}")
+                    self.dead_lettered += 1
+                    self.client.logger.error(
+                        "BOOKKEEPER outbox item %s rejected: %s", item.item_id, result.body or result.error
+                    )
+            self.outbox.delete(done)
+            delivered += len(done)
+
+        if delivered:
+            self.delivered += delivered
+            self._deliveries.append((time.monotonic(), delivered))
+        return delivered
+
+    def drain_rate(self) -> float:
+        """Returns delivered items per second over the last rate_window seconds."""
+        cutoff = time.monotonic() - self.rate_window
+        while self._deliveries and self._deliveries[0][0] < cutoff:
+            self._deliveries.popleft()
+        return sum(count for _, count in self._deliveries) / self.rate_window
+
+    def stats(self) -> Dict[str, Any]:
+        tenant_id = self.client.TENANT_ID
+        stats = {
+            "depth": self.outbox.depth(tenant_id),
+            "dead": self.outbox.depth(tenant_id, status="dead"),
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "dead_lettered": self.dead_lettered,
+            "drain_rate": self.drain_rate(),
+        }
+        self.client.metrics.set_gauge("outbox_depth", "POST", "outbox", stats["depth"])
+        self.client.metrics.set_gauge("outbox_drain_rate", "POST", "outbox", stats["drain_rate"])
+        return stats
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                while self.drain_once() and not self._stop.is_set():
+                    pass
+            except Exception:
+                self.client.logger.exception("BOOKKEEPER outbox drainer failed")
+
+    def start(self) -> "OutboxDrainer":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="bookkeeper-outbox-drainer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stops the drainer; undelivered items stay in the outbox for the next start."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,254 @@
+"""
+Book-keeper Transports
+requests transport adapters that reach a co-located book-keeper without TCP.
+
+Pass one to BookKeeperClient(transport=...); it is mounted for base_url only:
+
+    client = BookKeeperClient(base_url, tenant_id, headers, transport=UnixSocketTransport("/run/book-keeper.sock"))
+    client = BookKeeperClient(base_url, tenant_id, headers, transport=ASGITransport(app))
+"""
+
+import asyncio
+import logging
+import socket
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http import HTTPStatus
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+import requests
+import urllib3
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+logger = logging.getLogger(__name__)
+
+
+class _UnixSocketConnection(urllib3.connection.HTTPConnection):
+    """urllib3 connection that talks HTTP over a Unix domain socket instead of TCP."""
+
+    def __init__(self, *args, socket_path: str, **kwargs):
+        self.socket_path = socket_path
+        super().__init__(*args, **kwargs)
+
+    def _new_conn(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if isinstance(self.timeout, (int, float)):
+            sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise urllib3.exceptions.NewConnectionError(self, f"Failed to connect to {self.socket_path}: {e}") from e
+        return sock
+
+
+class _UnixSocketConnectionPool(urllib3.HTTPConnectionPool):
+    ConnectionCls = _UnixSocketConnection
+
+
+class UnixSocketTransport(HTTPAdapter):
+    """
+    Transport for a book-keeper sidecar listening on a Unix domain socket
+    (e.g. `uvicorn book_keeper.main:app --uds /run/book-keeper.sock`).
+
+    Keeps a keep-alive pool of pool_maxsize connections to the socket; the host in
+    the client's base_url is only used for the Host header.
+    """
+
+    def __init__(self, socket_path: str, pool_maxsize: int = 10, pool_block: bool = False):
+        self.socket_path = socket_path
+        self._unix_pool: Optional[_UnixSocketConnectionPool] = None
+        self._unix_pool_lock = threading.Lock()
+        super().__init__(pool_connections=1, pool_maxsize=pool_maxsize, pool_block=pool_block)
+
+    def _connection_pool(self, url: str) -> _UnixSocketConnectionPool:
+        with self._unix_pool_lock:
+            if self._unix_pool is None:
+                self._unix_pool = _UnixSocketConnectionPool(
+                    urlsplit(url).hostname or "localhost",
+                    maxsize=self._pool_maxsize,
+                    block=self._pool_block,
+                    socket_path=self.socket_path,
+                )
+            return self._unix_pool
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        return self._connection_pool(request.url)
+
+    def get_connection(self, url, proxies=None):
+        return self._connection_pool(url)
+
+    def close(self) -> None:
+        with self._unix_pool_lock:
+            if self._unix_pool is not None:
+                self._unix_pool.close()
+                self._unix_pool = None
+        super().close()
+
+
+class ASGITransport(BaseAdapter):
+    """
+    Transport that calls an ASGI app (e.g. book_keeper.main:app) in-process, with no
+    sockets or HTTP parsing in between.
+
+    The app runs on an event loop in a private daemon thread, started on first use;
+    with lifespan=True its startup/shutdown handlers run when the loop starts and on
+    close(). Request and response bodies are fully buffered.
+    """
+
+    def __init__(self, app: Callable[..., Any], lifespan: bool = True, client: Tuple[str, int] = ("127.0.0.1", 0)):
+        super().__init__()
+        self.app = app
+        self.lifespan = lifespan
+        self.client = client
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lifespan_queue: Optional[asyncio.Queue] = None
+        self._lifespan_task: Optional[Any] = None
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="bookkeeper-asgi", daemon=True)
+                thread.start()
+                if self.lifespan:
+                    asyncio.run_coroutine_threadsafe(self._startup(), loop).result()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    async def _startup(self) -> None:
+        self._lifespan_queue = queue = asyncio.Queue()
+        started = asyncio.get_running_loop().create_future()
+
+        async def receive() -> Dict[str, Any]:
+            return await queue.get()
+
+        async def send(message: Dict[str, Any]) -> None:
+            if message["type"] == "lifespan.startup.complete" and not started.done():
+                started.set_result(None)
+            elif message["type"] == "lifespan.startup.failed" and not started.done():
+                started.set_exception(RuntimeError(f"ASGI app startup failed: {message.get('message', '')}"))
+
+        async def run() -> None:
+            try:
+                await self.app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}, receive, send)
+            except Exception:
+                # Apps without lifespan support raise on the unknown scope type.
+                pass
+            finally:
+                if not started.done():
+                    started.set_result(None)
+
+        await queue.put({"type": "lifespan.startup"})
+        self._lifespan_task = asyncio.ensure_future(run())
+        await started
+
+    async def _shutdown(self) -> None:
+        if self._lifespan_task is not None and not self._lifespan_task.done():
+            await self._lifespan_queue.put({"type": "lifespan.shutdown"})
+            await asyncio.wait([self._lifespan_task], timeout=10)
+
+    async def _call(self, request: requests.PreparedRequest) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+        url = urlsplit(request.url)
+        body = request.body or b""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        headers = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in request.headers.items()]
+        if "Host" not in request.headers:
+            headers.insert(0, (b"host", url.netloc.encode("latin-1")))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": request.method,
+            "scheme": url.scheme,
+            "path": unquote(url.path),
+            "raw_path": url.path.encode("latin-1"),
+            "query_string": url.query.encode("latin-1"),
+            "root_path": "",
+            "headers": headers,
+            "server": (url.hostname, url.port or (443 if url.scheme == "https" else 80)),
+            "client": self.client,
+        }
+
+        request_sent = False
+        response_done = asyncio.Event()
+        status = None
+        response_headers: List[Tuple[bytes, bytes]] = []
+        chunks: List[bytes] = []
+
+        async def receive() -> Dict[str, Any]:
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await response_done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers.extend(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    response_done.set()
+
+        try:
+            await self.app(scope, receive, send)
+        except Exception:
+            # Error middleware (e.g. Starlette's ServerErrorMiddleware) sends a 500 and then
+            # re-raises for the server to log; a response that was fully sent is still the answer.
+            if status is None or not response_done.is_set():
+                raise
+            logger.debug("ASGI app raised after sending its response", exc_info=True)
+        finally:
+            response_done.set()
+        if status is None:
+            raise RuntimeError("ASGI app returned without sending a response")
+        return status, response_headers, b"".join(chunks)
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None) -> requests.Response:
+        if isinstance(timeout, tuple):
+            timeout = timeout[1]
+
+        future = asyncio.run_coroutine_threadsafe(self._call(request), self._get_loop())
+        try:
+            status, raw_headers, content = future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise requests.exceptions.ReadTimeout(f"ASGI app did not respond within {timeout}s", request=request)
+        except Exception as e:
+            raise requests.exceptions.ConnectionError(f"ASGI app failed: {e!r}", request=request) from e
+
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(
+            (name.decode("latin-1"), value.decode("latin-1")) for name, value in raw_headers
+        )
+        response._content = content
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.reason = HTTPStatus(status).phrase if status in HTTPStatus._value2member_map_ else ""
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self) -> None:
+        """Runs the app's shutdown handlers and stops the loop; a later request starts it again."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        if self.lifespan:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
@@ -0,0 +1,60 @@
+"""
+Shared fixtures for the unit tests that run without book-keeper.
+
+stub_client builds a BookKeeperClient whose requests are answered in-process by a
+handler(method, path, body) -> (status_code, response_data); path is relative to
+the API base (e.g. "journal-entries"). The requests it received are kept in
+client.transport.requests as (method, path, body).
+"""
+
+import json
+import threading
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from book_keeper_client import BookKeeperClient
+
+API_PREFIX = "/api/book-keeper/v1/"
+
+
+class StubTransport(BaseAdapter):
+    def __init__(self, handler):
+        super().__init__()
+        self.handler = handler
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        path, _, query = request.path_url.partition("?")
+        path = path[len(API_PREFIX):] if path.startswith(API_PREFIX) else path
+        body = json.loads(request.body) if request.body else query
+        with self._lock:
+            self.requests.append((request.method, path, body))
+        status_code, data = self.handler(request.method, path, body)
+
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = json.dumps(data).encode()
+        response.headers["Content-Type"] = "application/json"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def stub_client():
+    clients = []
+
+    def make(handler, tenant_id="stubtenant", **options):
+        client = BookKeeperClient("http://bookkeeper.local", tenant_id, None, transport=StubTransport(handler), **options)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
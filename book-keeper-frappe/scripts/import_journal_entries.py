@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Bulk Journal Importer
+Streams journal entry rows from a CSV or JSONL file into book-keeper with bounded memory.
+
+Each input row is one leg:
+
+    entry_ref,entry_date,narration,account_code,side,amount,currency
+    inv-1001,2024-01-01,Opening balance,cash,debit,1250.50,INR
+    inv-1001,2024-01-01,Opening balance,equity,credit,1250.50,INR
+
+Consecutive rows with the same entry_ref form one entry (the input must be grouped
+by entry_ref); entry_date and narration are taken from its first row. Rows without
+an entry_ref, and an entry_ref that comes back after other entries (within the last
+100,000 entries), are rejected rather than posted. Amounts are
+decimals in major units and are converted to integer minor units per currency.
+Every entry is sent with idempotency_key "<prefix><entry_ref>", so re-running an
+import (or resuming one) never posts an entry twice.
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from book_keeper_client import (
+    AdaptiveConcurrencyLimiter,
+    BookKeeperClient,
+    Checkpoint,
+    JournalEntry,
+    JournalLeg,
+    LedgerValidationError,
+    validate_journal_legs,
+)
+
+FIELDS = ("entry_ref", "entry_date", "narration", "account_code", "side", "amount", "currency")
+
+
+def read_rows(file_obj, fmt: str) -> Iterator[Dict[str, Any]]:
+    """Yields input rows as dicts, one at a time."""
+    if fmt == "csv":
+        reader = csv.reader(file_obj)
+        header = next(reader, None)
+        if header is None:
+            return
+        missing = set(FIELDS) - set(header)
+        if missing:
+            raise ValueError(f"CSV header is missing columns: {', '.join(sorted(missing))}")
+        for row in reader:
+            yield dict(zip(header, row))
+    else:
+        for line in file_obj:
+            if line.strip():
+                yield json.loads(line)
+
+
+class MinorUnits:
+    """Converts decimal amounts to integer minor units using each currency's exponent."""
+
+    def __init__(self, exponents: Dict[str, int], default_exponent: int = 2):
+        self.exponents = exponents
+        self.default_exponent = default_exponent
+        self._scales: Dict[str, Decimal] = {}
+
+    def __call__(self, amount: Any, currency: str) -> int:
+        scale = self._scales.get(currency)
+        if scale is None:
+            scale = self._scales[currency] = Decimal(10) ** self.exponents.get(currency, self.default_exponent)
+
+        try:
+            value = Decimal(str(amount)) * scale
+        except InvalidOperation:
+            raise ValueError(f"Invalid amount {amount!r}")
+        if value != value.to_integral_value():
+            raise ValueError(f"Amount {amount} has more decimals than {currency} allows")
+        return int(value)
+
+
+def parse_exponents(spec: str) -> Dict[str, int]:
+    """Parses "JPY=0,BHD=3" into {"JPY": 0, "BHD": 3}."""
+    exponents = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        currency, _, exponent = item.partition("=")
+        exponents[currency.strip()] = int(exponent)
+    return exponents
+
+
+def group_entries(
+    rows: Iterable[Dict[str, Any]],
+    start_row: int,
+    to_minor: MinorUnits,
+    compound: bool,
+    idempotency_prefix: str,
+    recent_refs: int = 100_000,
+) -> Iterator[Tuple[int, Optional[str], Optional[JournalEntry], Optional[str]]]:
+    """Groups consecutive rows into entries.
+
+    Yields (row offset after the entry, entry_ref, entry, error); entry is None and
+    error describes the problem when the rows cannot form a valid entry. Rows without
+    an entry_ref are an error, and so is an entry_ref used by one of the last
+    recent_refs entries: its entry would share the earlier one's idempotency key, so
+    the server would drop its rows.
+    """
+    offset = start_row
+    seen: "OrderedDict[str, int]" = OrderedDict()
+    for entry_ref, entry_rows in itertools.groupby(rows, key=lambda row: row.get("entry_ref") or None):
+        debit_legs: List[JournalLeg] = []
+        credit_legs: List[JournalLeg] = []
+        error = None
+        first = None
+        first_row = offset + 1
+        for row in entry_rows:
+            offset += 1
+            if first is None:
+                first = row
+            if error is not None:
+                continue
+            try:
+                leg = JournalLeg(row["account_code"], to_minor(row["amount"], row["currency"]), row["currency"])
+                side = row["side"].lower()
+                if side == "debit":
+                    debit_legs.append(leg)
+                elif side == "credit":
+                    credit_legs.append(leg)
+                else:
+                    raise ValueError(f"Invalid side {row['side']!r}")
+            except (KeyError, ValueError) as e:
+                error = f"row {offset}: {e}"
+
+        rows_label = f"row {offset}" if first_row == offset else f"rows {first_row}-{offset}"
+        if entry_ref is None:
+            error = f"{rows_label}: missing entry_ref"
+        elif entry_ref in seen:
+            error = (
+                f"{rows_label}: entry_ref {entry_ref!r} was already used by the entry ending at row"
+                f" {seen[entry_ref]}; rows of an entry must be consecutive"
+            )
+        else:
+            seen[entry_ref] = offset
+            if len(seen) > recent_refs:
+                seen.popitem(last=False)
+
+        if error is None:
+            try:
+                validate_journal_legs(debit_legs, credit_legs)
+            except LedgerValidationError as e:
+                error = str(e)
+
+        if error is not None:
+            yield offset, entry_ref, None, error
+            continue
+
+        entry = JournalEntry(
+            first.get("narration") or entry_ref,
+            debit_legs,
+            credit_legs,
+            first.get("entry_date") or None,
+            compound,
+            idempotency_prefix + entry_ref,
+        )
+        yield offset, entry_ref, entry, None
+
+
+def import_entries(
+    client: BookKeeperClient,
+    rows: Iterable[Dict[str, Any]],
+    to_minor: MinorUnits,
+    concurrency: Union[int, AdaptiveConcurrencyLimiter] = 16,
+    checkpoint: Optional[Checkpoint] = None,
+    failures=None,
+    compound: bool = False,
+    idempotency_prefix: str = "import:",
+    progress_interval: float = 10.0,
+    checkpoint_interval: float = 2.0,
+) -> Dict[str, Any]:
+    """Submits the entries formed by rows and returns the run's counters.
+
+    The checkpoint holds the number of input rows whose entries are done: posted, or
+    rejected and written to `failures`. It stops advancing at the first entry that
+    failed transiently (connection error, timeout, 429 or 5xx) so that resuming
+    retries it. It is saved every checkpoint_interval seconds and when the import
+    ends or is interrupted; entries after a crash's last save are re-sent on resume
+    and deduplicated by their idempotency keys.
+    """
+    start_row = checkpoint.load() if checkpoint is not None else 0
+    stats = {"rows": 0, "entries": 0, "rejected": 0, "retryable": 0, "offset": start_row}
+    started = last_progress = last_save = time.monotonic()
+    saved_offset = start_row
+
+    def submit(item: Tuple[int, Optional[str], Optional[JournalEntry], Optional[str]]) -> tuple[Dict[str, Any], int]:
+        _, _, entry, error = item
+        if error is not None:
+            raise LedgerValidationError(error)
+        return client.submit_journal_entry(entry)
+
+    def report() -> None:
+        elapsed = time.monotonic() - started
+        rate = stats["rows"] / elapsed if elapsed else 0.0
+        print(
+            f"rows: {stats['rows']} ({rate:.0f}/s), entries: {stats['entries']}, "
+            f"rejected: {stats['rejected']}, retryable failures: {stats['retryable']}, "
+            f"offset: {stats['offset']}"
+        )
+
+    def save() -> None:
+        nonlocal saved_offset, last_save
+        last_save = time.monotonic()
+        if checkpoint is not None and stats["offset"] != saved_offset:
+            if failures is not None:
+                # Rejected entries up to the offset must be on disk before the offset is.
+                failures.flush()
+            checkpoint.save(stats["offset"])
+            saved_offset = stats["offset"]
+
+    entries = group_entries(itertools.islice(rows, start_row, None), start_row, to_minor, compound, idempotency_prefix)
+    try:
+        for (offset, entry_ref, _, error), result in client.map_bulk(submit, entries, concurrency):
+            stats["rows"] = offset - start_row
+            rejected = error is not None or (
+                result.status_code is not None
+                and 400 <= result.status_code < 500
+                and result.status_code not in (408, 429)
+            )
+            if result.ok:
+                stats["entries"] += 1
+            elif rejected:
+                stats["rejected"] += 1
+                if failures is not None:
+                    failures.write(json.dumps({"entry_ref": entry_ref, "status_code": result.status_code,
+                                               "error": result.error, "response": result.body}) + "\n")
+            else:
+                stats["retryable"] += 1
+                print(f"Entry {entry_ref} failed: {result.error}", file=sys.stderr)
+
+            if not stats["retryable"]:
+                stats["offset"] = offset
+
+            now = time.monotonic()
+            if now - last_save >= checkpoint_interval:
+                save()
+            if now - last_progress >= progress_interval:
+                last_progress = now
+                report()
+    finally:
+        save()
+
+    report()
+    stats["elapsed_seconds"] = time.monotonic() - started
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import journal entries into book-keeper from CSV or JSONL")
+    parser.add_argument('input', help="Input file (.csv or .jsonl, - for stdin)")
+    parser.add_argument('--format', choices=('csv', 'jsonl'), help="Input format (default: from the file extension)")
+    parser.add_argument('--base-url', default=os.getenv("BOOKKEEPER_HOST", "http://localhost:9000"),
+                        help="book-keeper URL (default: $BOOKKEEPER_HOST or http://localhost:9000)")
+    parser.add_argument('--tenant-id', default=os.getenv("BOOKKEEPER_TENANT_ID"), help="Tenant ID (default: $BOOKKEEPER_TENANT_ID)")
+    parser.add_argument('--concurrency', type=int, default=16, help="Entries in flight (default: 16)")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="Adapt entries in flight to book-keeper's latency and errors, up to --concurrency")
+    parser.add_argument('--checkpoint', help="Checkpoint file; an interrupted import resumes from it")
+    parser.add_argument('--checkpoint-interval', type=float, default=2.0,
+                        help="Seconds between checkpoint saves (default: 2)")
+    parser.add_argument('--failures', help="Write rejected entries to this JSONL file (default: stderr)")
+    parser.add_argument('--compound', action='store_true', help="Submit entries as compound transfers")
+    parser.add_argument('--minor-units', default="", help="Currency exponents that are not 2, e.g. JPY=0,BHD=3")
+    parser.add_argument('--idempotency-prefix', default="import:", help="Prefix for idempotency keys (default: import:)")
+    parser.add_argument('--progress-interval', type=float, default=10.0, help="Seconds between progress lines (default: 10)")
+    parser.add_argument('--verbose', '-v', action='store_true', help="Log every request")
+
+    args = parser.parse_args()
+    if not args.tenant_id:
+        parser.error("--tenant-id (or BOOKKEEPER_TENANT_ID) is required")
+
+    fmt = args.format or ('csv' if args.input.endswith('.csv') else 'jsonl')
+    in_file = sys.stdin if args.input == '-' else open(args.input, newline='' if fmt == 'csv' else None)
+    failures = open(args.failures, 'a') if args.failures else sys.stderr
+    checkpoint = Checkpoint(args.checkpoint) if args.checkpoint else None
+    if checkpoint is not None and args.input == '-':
+        parser.error("--checkpoint needs a file input")
+
+    client = BookKeeperClient(args.base_url, args.tenant_id, None, pool_maxsize=args.concurrency)
+    client.logger.setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    try:
+        stats = import_entries(
+            client,
+            read_rows(in_file, fmt),
+            MinorUnits(parse_exponents(args.minor_units)),
+            concurrency=AdaptiveConcurrencyLimiter(min(4, args.concurrency), max_limit=args.concurrency)
+            if args.adaptive
+            else args.concurrency,
+            checkpoint=checkpoint,
+            failures=failures,
+            compound=args.compound,
+            idempotency_prefix=args.idempotency_prefix,
+            progress_interval=args.progress_interval,
+            checkpoint_interval=args.checkpoint_interval,
+        )
+        print(f"Import finished: {stats['entries']} entries from {stats['rows']} rows "
+              f"in {stats['elapsed_seconds']:.1f}s, {stats['rejected']} rejected, "
+              f"{stats['retryable']} to retry (resume from row {stats['offset']})")
+        if stats["rejected"] or stats["retryable"]:
+            sys.exit(1)
+    except KeyboardInterrupt:
+        print("\nInterrupted by user")
+        sys.exit(130)
+    finally:
+        client.close()
+        if in_file is not sys.stdin:
+            in_file.close()
+        if failures is not sys.stderr:
+            failures.close()
+
+
+if __name__ == "__main__":
+    main()
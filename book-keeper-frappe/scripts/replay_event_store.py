@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Event Store Replay
+Rebuilds book-keeper ledger state offline from its KurrentDB event store
+(EVENT_STORE_BACKEND=kurrentdb in develop.yaml) into a local SQLite file, and answers
+point-in-time balance and volume queries from it without touching the live API.
+
+    replay_event_store.py --db ledger.db replay --url "esdb://localhost:2113?tls=false"
+    replay_event_store.py --db ledger.db balance --tenant-id my-tenant --as-of 2024-03-31 cash revenue
+    replay_event_store.py --db ledger.db volume --tenant-id my-tenant --from 2024-03-01 --to 2024-03-31
+
+replay reads $all in commit order and stores every posting with its entry_date and
+the time the event was recorded. The commit position of the last replayed event is
+saved in the same transaction as each batch, so running replay again continues where
+the previous run stopped. Events are decoded with balance_projection.parse_ledger_event;
+a pending entry reaches the postings when its commit event is replayed.
+
+Queries bound by entry_date (the default) or, with --by recorded_at, by the time each
+event was recorded. Both read per-day rollups, so a balance costs one indexed range
+sum however long the account's history is. Balances follow the TigerBeetle convention
+credits - debits.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from balance_projection import Posting, parse_ledger_event
+
+try:
+    from kurrentdbclient import KurrentDBClient
+except ImportError:
+    # kurrentdbclient is only needed to read from KurrentDB (the replay command)
+    KurrentDBClient = None
+
+
+def _recorded_at(value: Optional[datetime]) -> str:
+    """Formats a timestamp as fixed-width UTC ISO 8601, so stored values sort as strings."""
+    value = value or datetime.now(timezone.utc)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def _recorded_bound(value: str, end_of_day: bool) -> str:
+    """Turns a date or timestamp argument into a recorded_at bound.
+
+    A date means its whole day: for an upper bound (end_of_day) the returned value is
+    the start of the next day, to be compared with "<".
+    """
+    if len(value) == 10:
+        day = date.fromisoformat(value) + timedelta(days=1 if end_of_day else 0)
+        return f"{day.isoformat()}T00:00:00.000000Z"
+    return _recorded_at(datetime.fromisoformat(value.replace("Z", "+00:00")))
+
+
+class LedgerStore:
+    """
+    SQLite store of replayed postings.
+
+    Tables:
+        postings:       one row per leg, indexed by (tenant, account, recorded_at)
+        daily_totals:   debits/credits/legs per (tenant, account, currency, day), once
+                        by entry_date and once by the day the event was recorded
+        pending_entries: pending entries waiting for their commit or void event
+        replay_state:   commit position of the last replayed event
+    """
+
+    def __init__(self, path: str, synchronous: str = "NORMAL"):
+        self.path = path
+        self._conn = sqlite3.connect(path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={synchronous}")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            " position INTEGER NOT NULL, tenant_id TEXT NOT NULL, account_code TEXT NOT NULL,"
+            " currency TEXT NOT NULL, amount INTEGER NOT NULL, entry_date TEXT NOT NULL,"
+            " recorded_at TEXT NOT NULL, entry_id TEXT, event_type TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS postings_account"
+            " ON postings (tenant_id, account_code, recorded_at, currency, amount);"
+            "CREATE INDEX IF NOT EXISTS postings_recorded ON postings (tenant_id, recorded_at);"
+            "CREATE TABLE IF NOT EXISTS daily_totals ("
+            " tenant_id TEXT NOT NULL, basis TEXT NOT NULL, account_code TEXT NOT NULL, currency TEXT NOT NULL,"
+            " day TEXT NOT NULL, debits INTEGER NOT NULL, credits INTEGER NOT NULL, legs INTEGER NOT NULL,"
+            " PRIMARY KEY (tenant_id, basis, account_code, currency, day)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS daily_totals_day ON daily_totals (tenant_id, basis, day);"
+            "CREATE TABLE IF NOT EXISTS pending_entries ("
+            " tenant_id TEXT NOT NULL, entry_id TEXT NOT NULL, entry_date TEXT NOT NULL, postings TEXT NOT NULL,"
+            " PRIMARY KEY (tenant_id, entry_id));"
+            "CREATE TABLE IF NOT EXISTS replay_state (key TEXT PRIMARY KEY, value INTEGER NOT NULL);"
+        )
+
+    @property
+    def position(self) -> Optional[int]:
+        """Commit position of the last replayed event, or None for an empty store."""
+        row = self._conn.execute("SELECT value FROM replay_state WHERE key = 'commit_position'").fetchone()
+        return row[0] if row else None
+
+    def _insert(self, rows: List[Tuple], daily: Dict[Tuple[str, str, str, str, str], List[int]]) -> None:
+        self._conn.executemany("INSERT INTO postings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self._conn.executemany(
+            "INSERT INTO daily_totals VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (tenant_id, basis, account_code, currency, day) DO UPDATE SET"
+            " debits = debits + excluded.debits, credits = credits + excluded.credits, legs = legs + excluded.legs",
+            [key + tuple(totals) for key, totals in daily.items()],
+        )
+
+    def apply_batch(self, events: List[Tuple[int, str, bytes, Optional[datetime]]], stats: Dict[str, int]) -> None:
+        """Replays (commit_position, event_type, data, recorded_at) events in one transaction."""
+        rows: List[Tuple] = []
+        daily: Dict[Tuple[str, str, str, str, str], List[int]] = {}
+
+        def add(position: int, event: Any, postings: List[Posting], entry_date: str, recorded_at: str) -> None:
+            for code, currency, amount in postings:
+                rows.append((position, event.tenant_id, code, currency, amount, entry_date, recorded_at,
+                             event.entry_id, event.event_type))
+                for basis, day in (("entry_date", entry_date), ("recorded_at", recorded_at[:10])):
+                    totals = daily.setdefault((event.tenant_id, basis, code, currency, day), [0, 0, 0])
+                    totals[0 if amount < 0 else 1] += abs(amount)
+                    totals[2] += 1
+
+        conn = self._conn
+        conn.execute("BEGIN")
+        try:
+            for position, event_type, data, recorded in events:
+                stats["events"] += 1
+                try:
+                    event = parse_ledger_event(event_type, data)
+                except ValueError as e:
+                    stats["undecodable"] += 1
+                    print(f"Skipping event at {position}: {e}", file=sys.stderr)
+                    continue
+                if event.kind == "ignored" or event.tenant_id is None:
+                    stats["ignored"] += 1
+                    continue
+
+                recorded_at = _recorded_at(recorded)
+                entry_date = event.entry_date or recorded_at[:10]
+                if event.kind == "posted":
+                    add(position, event, event.postings, entry_date, recorded_at)
+                    continue
+
+                if event.entry_id is None:
+                    stats["unmatched"] += 1
+                    continue
+                if event.kind == "pending":
+                    conn.execute(
+                        "INSERT OR REPLACE INTO pending_entries VALUES (?, ?, ?, ?)",
+                        (event.tenant_id, str(event.entry_id), entry_date, json.dumps(event.postings)),
+                    )
+                    stats["pending"] += 1
+                    continue
+
+                key = (event.tenant_id, str(event.entry_id))
+                reserved = conn.execute(
+                    "SELECT entry_date, postings FROM pending_entries WHERE tenant_id = ? AND entry_id = ?", key
+                ).fetchone()
+                conn.execute("DELETE FROM pending_entries WHERE tenant_id = ? AND entry_id = ?", key)
+                if event.kind == "commit":
+                    if reserved is not None:
+                        entry_date = event.entry_date or reserved[0]
+                        postings = event.postings or [tuple(p) for p in json.loads(reserved[1])]
+                    else:
+                        postings = event.postings
+                    if not postings:
+                        stats["unmatched"] += 1
+                        continue
+                    add(position, event, postings, entry_date, recorded_at)
+
+            self._insert(rows, daily)
+            if events:
+                conn.execute(
+                    "INSERT OR REPLACE INTO replay_state VALUES ('commit_position', ?)", (events[-1][0],)
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        stats["postings"] += len(rows)
+
+    def _rollup(self, tenant_id: str, basis: str, lo_day: str, hi_day: str, codes: Optional[List[str]]) -> List[Tuple]:
+        sql = (
+            "SELECT account_code, currency, SUM(debits), SUM(credits), SUM(legs) FROM daily_totals"
+            " WHERE tenant_id = ? AND basis = ? AND day >= ? AND day < ?"
+        )
+        params: List[Any] = [tenant_id, basis, lo_day, hi_day]
+        if codes:
+            sql += f" AND account_code IN ({', '.join('?' * len(codes))})"
+            params.extend(codes)
+        return self._conn.execute(sql + " GROUP BY account_code, currency", params).fetchall()
+
+    def _scan(self, tenant_id: str, lo: str, hi: str, codes: Optional[List[str]]) -> List[Tuple]:
+        sql = (
+            "SELECT account_code, currency, -SUM(MIN(amount, 0)), SUM(MAX(amount, 0)), COUNT(*) FROM postings"
+            " WHERE tenant_id = ? AND recorded_at >= ? AND recorded_at < ?"
+        )
+        params: List[Any] = [tenant_id, lo, hi]
+        if codes:
+            sql += f" AND account_code IN ({', '.join('?' * len(codes))})"
+            params.extend(codes)
+        return self._conn.execute(sql + " GROUP BY account_code, currency", params).fetchall()
+
+    def totals(
+        self,
+        tenant_id: str,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        account_codes: Optional[List[str]] = None,
+        by: str = "entry_date",
+    ) -> Dict[Tuple[str, str], List[int]]:
+        """Returns [debits, credits, legs] per (account_code, currency) between start and end (inclusive).
+
+        start and end are dates, or with by="recorded_at" also timestamps. Whole days are
+        read from the daily rollup; only the partial days at either end of a recorded_at
+        range are summed from the postings.
+        """
+        if by == "entry_date":
+            lo_day = start or ""
+            hi_day = (date.fromisoformat(end) + timedelta(days=1)).isoformat() if end else "9999"
+            parts = self._rollup(tenant_id, by, lo_day, hi_day, account_codes)
+        else:
+            lo = _recorded_bound(start, False) if start else ""
+            hi = _recorded_bound(end, True) if end else "9999"
+            # Whole days are those from the first midnight at or after lo up to hi's day
+            lo_day = lo[:10]
+            if lo and not lo.endswith("T00:00:00.000000Z"):
+                lo_day = (date.fromisoformat(lo_day) + timedelta(days=1)).isoformat()
+            hi_day = hi[:10]
+            if lo_day >= hi_day:
+                parts = self._scan(tenant_id, lo, hi, account_codes)
+            else:
+                parts = self._rollup(tenant_id, by, lo_day, hi_day, account_codes)
+                parts += self._scan(tenant_id, lo, f"{lo_day}T00:00:00.000000Z", account_codes) if lo else []
+                parts += self._scan(tenant_id, f"{hi_day}T00:00:00.000000Z", hi, account_codes)
+
+        totals: Dict[Tuple[str, str], List[int]] = {}
+        for code, currency, debits, credits, legs in parts:
+            row = totals.setdefault((code, currency), [0, 0, 0])
+            row[0] += debits
+            row[1] += credits
+            row[2] += legs
+        return totals
+
+    def balances(
+        self, tenant_id: str, account_codes: List[str], as_of: Optional[str] = None, by: str = "entry_date"
+    ) -> List[Dict[str, Any]]:
+        """Returns {"account_code", "currency", "balance"} rows as of a date or time (inclusive)."""
+        totals = self.totals(tenant_id, None, as_of, account_codes, by)
+        order = {code: i for i, code in enumerate(account_codes)}
+        return [
+            {"account_code": code, "currency": currency, "balance": credits - debits}
+            for (code, currency), (debits, credits, _) in sorted(totals.items(), key=lambda kv: (order[kv[0][0]], kv[0]))
+        ]
+
+    def volume(
+        self,
+        tenant_id: str,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        account_codes: Optional[List[str]] = None,
+        by: str = "entry_date",
+    ) -> List[Dict[str, Any]]:
+        """Returns debits, credits and leg counts per account and currency between start and end (inclusive)."""
+        totals = self.totals(tenant_id, start, end, account_codes, by)
+        return [
+            {"account_code": code, "currency": currency, "debits": debits, "credits": credits, "legs": legs}
+            for (code, currency), (debits, credits, legs) in sorted(totals.items())
+        ]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def read_event_store(
+    url: str, after_position: Optional[int] = None, stream_prefix: Optional[str] = None
+) -> Iterator[Tuple[int, str, bytes, Optional[datetime]]]:
+    """Yields (commit_position, event_type, data, recorded_at) for events after after_position.
+
+    System events are left out; with stream_prefix only streams starting with it are read.
+    """
+    if KurrentDBClient is None:
+        raise ImportError("kurrentdbclient is required to read from KurrentDB (pip install kurrentdbclient)")
+
+    client = KurrentDBClient(url)
+    try:
+        filters: Dict[str, Any] = {}
+        if stream_prefix:
+            filters = {"filter_include": [stream_prefix], "filter_by_stream_name": True, "filter_by_prefix": True}
+        # read_all includes the event at commit_position itself
+        for event in client.read_all(commit_position=after_position, **filters):
+            if after_position is not None and event.commit_position <= after_position:
+                continue
+            yield event.commit_position, event.type, event.data, event.recorded_at
+    finally:
+        client.close()
+
+
+def replay(
+    store: LedgerStore,
+    events: Iterable[Tuple[int, str, bytes, Optional[datetime]]],
+    batch_size: int = 5000,
+    progress_interval: float = 10.0,
+) -> Dict[str, Any]:
+    """Replays events into store in batches of batch_size and returns the run's counters."""
+    stats = {"events": 0, "postings": 0, "pending": 0, "ignored": 0, "undecodable": 0, "unmatched": 0}
+    started = last_progress = time.monotonic()
+    batch: List[Tuple[int, str, bytes, Optional[datetime]]] = []
+
+    def flush() -> None:
+        nonlocal last_progress
+        store.apply_batch(batch, stats)
+        batch.clear()
+        now = time.monotonic()
+        if now - last_progress >= progress_interval:
+            last_progress = now
+            rate = stats["events"] / (now - started)
+            print(f"events: {stats['events']} ({rate:.0f}/s), postings: {stats['postings']}, "
+                  f"position: {store.position}")
+
+    for event in events:
+        batch.append(event)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    stats["elapsed_seconds"] = time.monotonic() - started
+    return stats
+
+
+def print_rows(rows: List[Dict[str, Any]], as_json: bool) -> None:
+    if as_json:
+        print(json.dumps(rows, indent=2))
+        return
+    if not rows:
+        print("No postings found")
+        return
+    columns = list(rows[0])
+    widths = [max(len(col), *(len(str(row[col])) for row in rows)) for col in columns]
+    print("  ".join(col.ljust(w) for col, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(str(row[col]).ljust(w) for col, w in zip(columns, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay book-keeper's KurrentDB events into SQLite and query them")
+    parser.add_argument('--db', required=True, help="SQLite file holding the replayed ledger")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    replay_parser = commands.add_parser('replay', help="Read new events from KurrentDB into the store")
+    replay_parser.add_argument('--url', default=os.getenv("KURRENTDB_URL", "esdb://localhost:2113?tls=false"),
+                               help="KurrentDB URL (default: $KURRENTDB_URL or esdb://localhost:2113?tls=false)")
+    replay_parser.add_argument('--stream-prefix', help="Only replay streams whose name starts with this prefix")
+    replay_parser.add_argument('--batch-size', type=int, default=5000, help="Events per transaction (default: 5000)")
+    replay_parser.add_argument('--progress-interval', type=float, default=10.0,
+                               help="Seconds between progress lines (default: 10)")
+
+    for name, help_text in (("balance", "Balances as of a date"), ("volume", "Debit and credit volume over a period")):
+        query = commands.add_parser(name, help=help_text)
+        query.add_argument('--tenant-id', default=os.getenv("BOOKKEEPER_TENANT_ID"),
+                           help="Tenant ID (default: $BOOKKEEPER_TENANT_ID)")
+        query.add_argument('--by', choices=('entry_date', 'recorded_at'), default='entry_date',
+                           help="Date the bounds apply to (default: entry_date)")
+        query.add_argument('--json', action='store_true', help="Print rows as JSON")
+        if name == "balance":
+            query.add_argument('--as-of', help="Date or timestamp, inclusive (default: everything replayed)")
+            query.add_argument('account_codes', nargs='+', help="Account codes")
+        else:
+            query.add_argument('--from', dest='start', help="First date or timestamp, inclusive")
+            query.add_argument('--to', dest='end', help="Last date or timestamp, inclusive")
+            query.add_argument('account_codes', nargs='*', help="Account codes (default: all)")
+
+    args = parser.parse_args()
+    if args.command != 'replay' and not args.tenant_id:
+        parser.error("--tenant-id (or BOOKKEEPER_TENANT_ID) is required")
+
+    store = LedgerStore(args.db)
+    try:
+        if args.command == 'replay':
+            position = store.position
+            print(f"Replaying from {'the start' if position is None else f'commit position {position}'}...")
+            stats = replay(
+                store,
+                read_event_store(args.url, position, args.stream_prefix),
+                batch_size=args.batch_size,
+                progress_interval=args.progress_interval,
+            )
+            print(f"Replay finished: {stats['events']} events, {stats['postings']} postings "
+                  f"in {stats['elapsed_seconds']:.1f}s ({stats['ignored']} ignored, "
+                  f"{stats['undecodable']} undecodable, {stats['unmatched']} unmatched commits), "
+                  f"position: {store.position}")
+            return
+
+        started = time.perf_counter()
+        if args.command == 'balance':
+            rows = store.balances(args.tenant_id, args.account_codes, args.as_of, args.by)
+        else:
+            rows = store.volume(args.tenant_id, args.start, args.end, args.account_codes, args.by)
+        print_rows(rows, args.json)
+        print(f"({(time.perf_counter() - started) * 1000:.1f} ms)", file=sys.stderr)
+    except KeyboardInterrupt:
+        print(f"\nInterrupted by user (replayed up to position {store.position})")
+        sys.exit(130)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
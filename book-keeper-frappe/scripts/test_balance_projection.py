@@ -0,0 +1,232 @@
+"""
+Unit tests for the NATS balance projection (balance_projection.py).
+
+Tests cover:
+- Posted, pending, committed and voided entries, and limiter refills
+- Duplicate and redelivered events
+- Gap recording for sequences missing from the stream
+- Persisting to SQLite and reloading
+- ProjectionSubscriber against InMemoryEventSource
+
+Runs without book-keeper or NATS.
+"""
+
+import json
+import time
+
+import pytest
+
+from balance_projection import BalanceProjection, InMemoryEventSource, ProjectionSubscriber, parse_ledger_event
+
+TENANT_ID = "projectiontenant"
+
+
+def entry(debits, credits, **extra):
+    """Builds an event payload in the shape of a journal entry request."""
+    return {
+        "tenant_id": TENANT_ID,
+        "entry_date": "2024-01-01",
+        "debit_legs": [{"account_code": code, "amount": amount, "currency": "INR"} for code, amount in debits],
+        "credit_legs": [{"account_code": code, "amount": amount, "currency": "INR"} for code, amount in credits],
+        **extra,
+    }
+
+
+def raw(sequence, event_type, payload):
+    return sequence, f"bk.events.{event_type}", json.dumps(payload).encode()
+
+
+# ============================================================================
+# Fixtures
+# ============================================================================
+
+
+@pytest.fixture
+def projection():
+    projection = BalanceProjection()
+    yield projection
+    projection.close()
+
+
+# ============================================================================
+# Test Class: Event Decoding
+# ============================================================================
+
+
+class TestParseLedgerEvent:
+    def test_posted_entry(self):
+        event = parse_ledger_event("bk.events.JournalEntryPosted", json.dumps(entry([("cash", 5)], [("revenue", 5)])))
+        assert event.kind == "posted"
+        assert event.event_type == "JournalEntryPosted"
+        assert event.postings == [("cash", "INR", -5), ("revenue", "INR", 5)]
+
+    def test_wrapped_payload(self):
+        payload = {"event_type": "JournalEntryPosted", "data": entry([("cash", 5)], [("revenue", 5)])}
+        event = parse_ledger_event("bk.events.x", payload)
+        assert event.kind == "posted"
+        assert event.tenant_id == TENANT_ID
+
+    def test_refill_debits_source_of_funds(self):
+        payload = {
+            "tenant_id": TENANT_ID,
+            "source_of_funds_account_code": "sys_rate_limiter_credit",
+            "accounts_to_refill": [{"account_code": "limit", "amount": 10, "currency": "QTY"}],
+        }
+        event = parse_ledger_event("bk.events.LimiterAccountsRefilled", payload)
+        assert event.postings == [("limit", "QTY", 10), ("sys_rate_limiter_credit", "QTY", -10)]
+
+    def test_event_without_legs_is_ignored(self):
+        event = parse_ledger_event("bk.events.AccountCreated", {"tenant_id": TENANT_ID, "code": "cash"})
+        assert event.kind == "ignored"
+
+    @pytest.mark.parametrize("data", [b"not json", b"[1, 2]"])
+    def test_invalid_payload(self, data):
+        with pytest.raises(ValueError):
+            parse_ledger_event("bk.events.JournalEntryPosted", data)
+
+    def test_malformed_leg(self):
+        payload = {"tenant_id": TENANT_ID, "debit_legs": [{"account_code": "cash"}], "credit_legs": []}
+        with pytest.raises(ValueError):
+            parse_ledger_event("bk.events.JournalEntryPosted", payload)
+
+
+# ============================================================================
+# Test Class: Projection
+# ============================================================================
+
+
+class TestBalanceProjection:
+    def test_posted_entries(self, projection):
+        assert projection.apply([
+            raw(1, "JournalEntryPosted", entry([("cash", 100)], [("revenue", 100)])),
+            raw(2, "JournalEntryPosted", entry([("revenue", 30)], [("cash", 30)])),
+        ]) == 2
+
+        assert projection.balance(TENANT_ID, "cash") == -70
+        assert projection.balance(TENANT_ID, "revenue") == 70
+        assert projection.balance(TENANT_ID, "unknown") is None
+        assert projection.balance("other-tenant", "cash") is None
+        assert projection.get_account_balances(TENANT_ID, ["revenue", "unknown", "cash"]) == [
+            {"account_code": "revenue", "balance": 70, "currency": "INR"},
+            {"account_code": "cash", "balance": -70, "currency": "INR"},
+        ]
+
+    def test_pending_then_commit(self, projection):
+        pending = entry([("wallet", 40)], [("payable", 40)], journal_id="p1")
+        projection.apply([raw(1, "PendingJournalEntryCreated", pending)])
+        account = projection.account(TENANT_ID, "wallet")
+        assert account["balance"] == 0
+        assert account["debits_pending"] == 40
+
+        projection.apply([raw(2, "PendingJournalEntryCommitted", {"tenant_id": TENANT_ID, "journal_id": "p1"})])
+        account = projection.account(TENANT_ID, "wallet")
+        assert account["balance"] == -40
+        assert account["debits_pending"] == 0
+        assert projection.balance(TENANT_ID, "payable") == 40
+        assert projection.stats()["pending_entries"] == 0
+
+    def test_pending_then_void(self, projection):
+        projection.apply([
+            raw(1, "PendingJournalEntryCreated", entry([("wallet", 40)], [("payable", 40)], journal_id="p1")),
+            raw(2, "PendingJournalEntryVoided", {"tenant_id": TENANT_ID, "journal_id": "p1"}),
+        ])
+        account = projection.account(TENANT_ID, "wallet")
+        assert account["balance"] == 0
+        assert account["debits_pending"] == 0
+        assert projection.stats()["pending_entries"] == 0
+
+    def test_commit_of_unknown_pending_entry(self, projection):
+        projection.apply([raw(1, "PendingJournalEntryCommitted", {"tenant_id": TENANT_ID, "journal_id": "nope"})])
+        assert projection.stats()["unmatched"] == 1
+        assert projection.last_sequence == 1
+
+    def test_duplicates_are_skipped(self, projection):
+        event = raw(1, "JournalEntryPosted", entry([("cash", 5)], [("revenue", 5)]))
+        projection.apply([event])
+        assert projection.apply([event]) == 0
+
+        assert projection.balance(TENANT_ID, "cash") == -5
+        assert projection.stats()["duplicates"] == 1
+
+    def test_gap_is_recorded(self, projection):
+        projection.apply([
+            raw(1, "JournalEntryPosted", entry([("cash", 5)], [("revenue", 5)])),
+            raw(4, "JournalEntryPosted", entry([("cash", 5)], [("revenue", 5)])),
+        ])
+        assert projection.gaps == [(2, 3)]
+        assert projection.last_sequence == 4
+        assert projection.balance(TENANT_ID, "cash") == -10
+
+    def test_undecodable_event_advances_sequence(self, projection):
+        projection.apply([
+            (1, "bk.events.JournalEntryPosted", b"not json"),
+            raw(2, "JournalEntryPosted", entry([("cash", 5)], [("revenue", 5)])),
+        ])
+        assert projection.stats()["undecodable"] == 1
+        assert projection.last_sequence == 2
+        assert projection.balance(TENANT_ID, "cash") == -5
+
+    def test_reload_from_sqlite(self, tmp_path):
+        path = str(tmp_path / "balances.db")
+        projection = BalanceProjection(path)
+        projection.apply([
+            raw(1, "JournalEntryPosted", entry([("cash", 100)], [("revenue", 100)])),
+            raw(2, "PendingJournalEntryCreated", entry([("cash", 10)], [("revenue", 10)], journal_id="p1")),
+            raw(5, "JournalEntryPosted", entry([("cash", 1)], [("revenue", 1)])),
+        ])
+        projection.close()
+
+        reloaded = BalanceProjection(path)
+        assert reloaded.last_sequence == 5
+        assert reloaded.gaps == [(3, 4)]
+        assert reloaded.account(TENANT_ID, "cash") == projection.account(TENANT_ID, "cash")
+
+        # The pending entry survives the restart and can still be committed.
+        reloaded.apply([raw(6, "PendingJournalEntryCommitted", {"tenant_id": TENANT_ID, "journal_id": "p1"})])
+        assert reloaded.balance(TENANT_ID, "cash") == -111
+        reloaded.close()
+
+
+# ============================================================================
+# Test Class: Subscriber
+# ============================================================================
+
+
+class TestProjectionSubscriber:
+    def test_catches_up_and_follows(self, projection):
+        source = InMemoryEventSource()
+        for _ in range(250):
+            source.publish("bk.events.JournalEntryPosted", entry([("cash", 1)], [("revenue", 1)]))
+
+        subscriber = ProjectionSubscriber(projection, source, batch_size=100, fetch_timeout=0.05)
+        subscriber.start()
+        try:
+            assert subscriber.wait_caught_up(5)
+            assert projection.balance(TENANT_ID, "cash") == -250
+
+            sequence = source.publish("bk.events.JournalEntryPosted", entry([("cash", 1)], [("revenue", 1)]))
+            for _ in range(100):
+                if projection.last_sequence == sequence:
+                    break
+                time.sleep(0.01)
+            assert projection.balance(TENANT_ID, "cash") == -251
+        finally:
+            subscriber.stop()
+
+    def test_resumes_after_purged_events(self, projection):
+        source = InMemoryEventSource()
+        source.publish("bk.events.JournalEntryPosted", entry([("cash", 1)], [("revenue", 1)]))
+        projection.apply([raw(1, "JournalEntryPosted", entry([("cash", 1)], [("revenue", 1)]))])
+        source.publish("bk.events.JournalEntryPosted", entry([("cash", 2)], [("revenue", 2)]))
+        source.purge(2)
+        source.publish("bk.events.JournalEntryPosted", entry([("cash", 4)], [("revenue", 4)]))
+
+        subscriber = ProjectionSubscriber(projection, source, fetch_timeout=0.05)
+        subscriber.start()
+        try:
+            assert subscriber.wait_caught_up(5)
+        finally:
+            subscriber.stop()
+
+        assert projection.gaps == [(2, 2)]
+        assert projection.balance(TENANT_ID, "cash") == -5
@@ -0,0 +1,645 @@
+"""
+Unit tests for the client-side logic in book_keeper_client.py.
+
+Tests cover:
+- BalanceCache expiry, eviction and invalidation
+- LatencyHistogram quantile estimates
+- CircuitBreaker state transitions
+- Journal leg validation
+- Checkpoints for resumable bulk jobs
+- Chunking of bulk job input
+- Leg compaction, alone and in BookKeeperClient's entry payloads
+- PriorityLanes budgets and priority, and the lane of bulk helpers' requests
+- AdaptiveConcurrencyLimiter latency baselines per route
+- Hedged GETs and deadlines, and validation of hedge_after
+- BalanceCoalescer batching of concurrent balance lookups
+
+Runs without book-keeper: the few requests sent are answered by a stub transport (conftest.py).
+"""
+
+import threading
+import time
+
+import pytest
+import requests
+
+from book_keeper_client import (
+    AdaptiveConcurrencyLimiter,
+    BalanceCache,
+    BalanceCoalescer,
+    BookKeeperClient,
+    Checkpoint,
+    CircuitBreaker,
+    JournalLeg,
+    LatencyHistogram,
+    LedgerValidationError,
+    PriorityLanes,
+    compact_journal_legs,
+    offset_chunks,
+    validate_journal_legs,
+)
+
+TENANT_ID = "clienttenant"
+
+
+def legs(*specs):
+    """Builds JournalLegs from (account_code, amount) or (account_code, amount, currency) tuples."""
+    return [JournalLeg(spec[0], spec[1], spec[2] if len(spec) > 2 else "INR") for spec in specs]
+
+
+def as_tuples(leg_list):
+    return [(leg.account_code, leg.amount, leg.currency) for leg in leg_list]
+
+
+# ============================================================================
+# Fixtures
+# ============================================================================
+
+
+@pytest.fixture
+def client():
+    client = BookKeeperClient("http://bookkeeper.local", TENANT_ID, None)
+    yield client
+    client.close()
+
+
+# ============================================================================
+# Test Class: Balance Cache
+# ============================================================================
+
+
+class TestBalanceCache:
+    @staticmethod
+    def row(code, balance=0):
+        return {"account_code": code, "balance": balance, "currency": "INR"}
+
+    def test_hits_and_misses(self):
+        cache = BalanceCache()
+        cache.put_many(TENANT_ID, [self.row("cash", 5)])
+
+        found, missing = cache.get_many(TENANT_ID, ["cash", "revenue", "cash"])
+        assert found == {"cash": self.row("cash", 5)}
+        assert missing == ["revenue"]
+        assert cache.get_many("other-tenant", ["cash"]) == ({}, ["cash"])
+        assert cache.stats() == {"hits": 1, "misses": 2, "size": 1}
+
+    def test_entries_expire(self):
+        cache = BalanceCache(ttl=0.01)
+        cache.put_many(TENANT_ID, [self.row("cash")])
+        time.sleep(0.02)
+        assert cache.get_many(TENANT_ID, ["cash"]) == ({}, ["cash"])
+        assert cache.stats()["size"] == 0
+
+    def test_least_recently_used_is_evicted(self):
+        cache = BalanceCache(max_entries=2)
+        cache.put_many(TENANT_ID, [self.row("a"), self.row("b")])
+        cache.get_many(TENANT_ID, ["a"])
+        cache.put_many(TENANT_ID, [self.row("c")])
+
+        found, missing = cache.get_many(TENANT_ID, ["a", "b", "c"])
+        assert sorted(found) == ["a", "c"]
+        assert missing == ["b"]
+
+    def test_invalidate_codes_and_tenant(self):
+        cache = BalanceCache()
+        cache.put_many(TENANT_ID, [self.row("a"), self.row("b")])
+        cache.put_many("other-tenant", [self.row("a")])
+
+        cache.invalidate(TENANT_ID, ["a"])
+        assert cache.get_many(TENANT_ID, ["a", "b"])[1] == ["a"]
+        cache.invalidate(TENANT_ID)
+        assert cache.get_many(TENANT_ID, ["b"])[1] == ["b"]
+        assert cache.get_many("other-tenant", ["a"])[1] == []
+
+    def test_put_after_invalidation_is_skipped(self):
+        cache = BalanceCache()
+        generation = cache.generation
+        # A write invalidates the code while a fetch for it is in flight.
+        cache.invalidate(TENANT_ID, ["cash"])
+        cache.put_many(TENANT_ID, [self.row("cash", 5)], generation)
+        assert cache.get_many(TENANT_ID, ["cash"]) == ({}, ["cash"])
+
+        cache.put_many(TENANT_ID, [self.row("cash", 5)], cache.generation)
+        assert cache.get_many(TENANT_ID, ["cash"])[0] == {"cash": self.row("cash", 5)}
+
+
+# ============================================================================
+# Test Class: Latency Histogram
+# ============================================================================
+
+
+class TestLatencyHistogram:
+    def test_empty(self):
+        assert LatencyHistogram().quantile(0.5) is None
+
+    def test_interpolates_inside_bucket(self):
+        histogram = LatencyHistogram()
+        for _ in range(10):
+            histogram.observe(0.02)
+        assert histogram.count == 10
+        assert histogram.sum == pytest.approx(0.2)
+        # All samples are in the (0.01, 0.025] bucket.
+        assert histogram.quantile(0.5) == pytest.approx(0.0175)
+        assert histogram.quantile(1.0) == pytest.approx(0.025)
+
+    def test_quantiles_across_buckets(self):
+        histogram = LatencyHistogram()
+        for value in [0.001] * 90 + [0.3] * 10:
+            histogram.observe(value)
+        assert histogram.quantile(0.5) <= 0.005
+        assert 0.25 < histogram.quantile(0.99) <= 0.5
+
+    def test_overflow_reports_largest_bound(self):
+        histogram = LatencyHistogram()
+        histogram.observe(120.0)
+        assert histogram.quantile(0.99) == LatencyHistogram.BUCKETS[-1]
+
+
+# ============================================================================
+# Test Class: Circuit Breaker
+# ============================================================================
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=60)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.allow_request()
+
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow_request()
+
+    def test_half_open_probe_closes_on_success(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+
+        assert breaker.allow_request()
+        assert not breaker.allow_request()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_half_open_probe_reopens_on_failure(self):
+        breaker = CircuitBreaker(failure_threshold=5, recovery_timeout=0.01)
+        for _ in range(5):
+            breaker.record_failure()
+        time.sleep(0.02)
+        assert breaker.allow_request()
+
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow_request()
+
+    def test_released_probe_can_be_retried(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        assert breaker.allow_request()
+        breaker.release_probe()
+        assert breaker.allow_request()
+
+
+# ============================================================================
+# Test Class: Validation
+# ============================================================================
+
+
+class TestValidateJournalLegs:
+    def test_balanced_entry(self):
+        validate_journal_legs(legs(("cash", 100)), legs(("revenue", 60), ("tax", 40)))
+
+    def test_zero_amount_leg_is_accepted(self):
+        validate_journal_legs(legs(("cash", 100), ("fee", 0)), legs(("revenue", 100)))
+
+    def test_balanced_per_currency(self):
+        validate_journal_legs(legs(("cash", 5, "INR"), ("cash", 7, "USD")), legs(("a", 5, "INR"), ("b", 7, "USD")))
+
+    @pytest.mark.parametrize(
+        "debits, credits, message",
+        [
+            ([], legs(("revenue", 1)), "no debit legs"),
+            (legs(("cash", 1)), [], "no credit legs"),
+            (legs(("cash", -1)), legs(("revenue", -1)), "non-negative integer"),
+            (legs(("cash", 1.5)), legs(("revenue", 1.5)), "non-negative integer"),
+            (legs(("cash", True)), legs(("revenue", 1)), "non-negative integer"),
+            (legs(("", 1)), legs(("revenue", 1)), "no account_code"),
+            (legs(("cash", 1, "")), legs(("revenue", 1, "")), "no currency"),
+            (legs(("cash", 10)), legs(("revenue", 4)), "INR debits exceed credits by 6"),
+            (legs(("cash", 5, "INR")), legs(("revenue", 5, "USD")), "unbalanced"),
+        ],
+    )
+    def test_rejected(self, debits, credits, message):
+        with pytest.raises(LedgerValidationError, match=message):
+            validate_journal_legs(debits, credits)
+
+    def test_validation_error_is_a_value_error(self):
+        assert issubclass(LedgerValidationError, ValueError)
+
+
+# ============================================================================
+# Test Class: Checkpoint
+# ============================================================================
+
+
+class TestCheckpoint:
+    def test_save_load_and_clear(self, tmp_path):
+        checkpoint = Checkpoint(str(tmp_path / "job.json"))
+        assert checkpoint.load() == 0
+
+        checkpoint.save(1200)
+        assert Checkpoint(checkpoint.path).load() == 1200
+        assert [path.name for path in tmp_path.iterdir()] == ["job.json"]
+
+        checkpoint.clear()
+        checkpoint.clear()
+        assert checkpoint.load() == 0
+
+
+# ============================================================================
+# Test Class: Bulk Job Helpers
+# ============================================================================
+
+
+class TestOffsetChunks:
+    def test_chunks_with_end_offsets(self):
+        assert list(offset_chunks(range(7), 3)) == [(3, [0, 1, 2]), (6, [3, 4, 5]), (7, [6])]
+
+    def test_resumes_from_offset(self):
+        assert list(offset_chunks(iter(range(7)), 3, start_offset=4)) == [(7, [4, 5, 6])]
+
+    def test_reads_lazily(self):
+        consumed = []
+
+        def items():
+            for i in range(100):
+                consumed.append(i)
+                yield i
+
+        chunks = offset_chunks(items(), 10)
+        next(chunks)
+        assert len(consumed) == 10
+
+    def test_always_yields_once(self):
+        assert list(offset_chunks([], 3)) == [(0, [])]
+        assert list(offset_chunks(range(3), 3, start_offset=3)) == [(3, [])]
+
+    def test_chunk_size_must_be_positive(self):
+        with pytest.raises(ValueError):
+            list(offset_chunks(range(3), 0))
+
+
+# ============================================================================
+# Test Class: Compaction
+# ============================================================================
+
+
+class TestCompactJournalLegs:
+    def test_merges_legs_per_account_and_currency(self):
+        debits, credits = compact_journal_legs(
+            legs(("suspense", 10), ("cash", 5), ("suspense", 20), ("suspense", 3, "USD")),
+            legs(("revenue", 35), ("fx", 3, "USD")),
+        )
+        assert as_tuples(debits) == [("cash", 5, "INR"), ("suspense", 30, "INR"), ("suspense", 3, "USD")]
+        assert as_tuples(credits) == [("fx", 3, "USD"), ("revenue", 35, "INR")]
+
+    def test_nets_accounts_on_both_sides(self):
+        debits, credits = compact_journal_legs(legs(("wallet", 100), ("fee", 2)), legs(("wallet", 30), ("bank", 72)))
+        assert as_tuples(debits) == [("fee", 2, "INR"), ("wallet", 70, "INR")]
+        assert as_tuples(credits) == [("bank", 72, "INR")]
+
+    def test_drops_zero_and_cancelling_legs(self):
+        debits, credits = compact_journal_legs(legs(("wallet", 50), ("fee", 0)), legs(("wallet", 50)))
+        assert debits == []
+        assert credits == []
+
+    def test_entry_payload_compacts_before_validating(self, client):
+        client.compact_legs = True
+        data = client._entry_payload("fee", legs(("cash", 10), ("fee", 0)), legs(("revenue", 10)), "2024-01-01")
+        assert data["debit_legs"] == [{"account_code": "cash", "amount": 10, "currency": "INR"}]
+        assert data["credit_legs"] == [{"account_code": "revenue", "amount": 10, "currency": "INR"}]
+
+    def test_entry_payload_rejects_entry_that_nets_to_nothing(self, client):
+        client.compact_legs = True
+        with pytest.raises(LedgerValidationError, match="moves nothing"):
+            client._entry_payload("noop", legs(("wallet", 5)), legs(("wallet", 5)))
+
+    def test_entry_payload_rejects_negative_leg_before_netting(self, client):
+        client.compact_legs = True
+        # Netted, these would become a valid cash -> revenue entry of 5.
+        with pytest.raises(LedgerValidationError, match="non-negative integer"):
+            client._entry_payload("bad", legs(("cash", 10), ("revenue", -5)), legs(("revenue", 5)))
+
+
+# ============================================================================
+# Test Class: Priority Lanes
+# ============================================================================
+
+
+class TestPriorityLanes:
+    def test_budgets_must_be_positive(self):
+        with pytest.raises(ValueError):
+            PriorityLanes({"interactive": 1, "bulk": 0})
+
+    def test_unknown_lane(self):
+        with pytest.raises(ValueError, match="Unknown lane"):
+            PriorityLanes().acquire("batch")
+
+    def test_bulk_lane_is_capped_at_its_budget(self):
+        lanes = PriorityLanes({"interactive": 1, "bulk": 2})
+        assert lanes.acquire("bulk", 0)
+        assert lanes.acquire("bulk", 0)
+        assert not lanes.acquire("bulk", 0.01)
+        assert lanes.stats()["bulk"] == {"budget": 2, "in_flight": 2, "waiting": 0}
+
+        lanes.release("bulk")
+        assert lanes.acquire("bulk", 0)
+
+    def test_interactive_borrows_idle_budget(self):
+        lanes = PriorityLanes({"interactive": 1, "bulk": 2})
+        assert all(lanes.acquire("interactive", 0) for _ in range(3))
+        assert not lanes.acquire("interactive", 0.01)
+        assert not lanes.acquire("bulk", 0.01)
+
+    def test_bulk_yields_to_waiting_interactive(self):
+        lanes = PriorityLanes({"interactive": 1, "bulk": 1})
+        assert lanes.acquire("interactive", 0)
+        assert lanes.acquire("bulk", 0)
+
+        acquired = []
+        threads = [
+            threading.Thread(target=lambda: acquired.append(("interactive", lanes.acquire("interactive", 5)))),
+            threading.Thread(target=lambda: acquired.append(("bulk", lanes.acquire("bulk", 5)))),
+        ]
+        threads[0].start()
+        while lanes.stats()["interactive"]["waiting"] == 0:
+            time.sleep(0.001)
+        threads[1].start()
+        while lanes.stats()["bulk"]["waiting"] == 0:
+            time.sleep(0.001)
+
+        # A freed bulk slot goes to the waiting interactive request first.
+        lanes.release("bulk")
+        threads[0].join(5)
+        assert acquired == [("interactive", True)]
+        lanes.release("interactive")
+        threads[1].join(5)
+        assert acquired == [("interactive", True), ("bulk", True)]
+
+
+
+def lane_counts(client):
+    return {lane: waits["count"] for lane, waits in client.metrics.lane_waits().items()}
+
+
+class TestRequestLanes:
+    @pytest.fixture
+    def lanes_client(self, stub_client):
+        return stub_client(lambda method, path, body: (200, {"message": "ok"}), TENANT_ID, lanes=PriorityLanes())
+
+    def test_finalizing_uses_the_callers_lane(self, lanes_client):
+        lanes_client.commit_pending_entries(["p1", "p2"])
+        assert lane_counts(lanes_client) == {"interactive": 2}
+
+        with lanes_client.lane("bulk"):
+            lanes_client.void_pending_entries(["p3"])
+        assert lane_counts(lanes_client) == {"interactive": 2, "bulk": 1}
+
+    def test_finalizing_in_an_explicit_lane(self, lanes_client):
+        lanes_client.void_pending_entries(["p1", "p2"], lane="bulk")
+        assert lane_counts(lanes_client) == {"bulk": 2}
+
+    def test_bulk_helpers_default_to_bulk_unless_the_caller_chose(self, lanes_client):
+        def get(code):
+            return lanes_client.get_account_balances([code])
+
+        list(lanes_client.map_bulk(get, ["a", "b"]))
+        assert lane_counts(lanes_client) == {"bulk": 2}
+
+        with lanes_client.lane("interactive"):
+            list(lanes_client.map_bulk(get, ["c"]))
+        assert lane_counts(lanes_client) == {"bulk": 2, "interactive": 1}
+
+
+# ============================================================================
+# Test Class: Adaptive Concurrency Limiter
+# ============================================================================
+
+
+class TestAdaptiveConcurrencyLimiter:
+    def test_slower_route_is_not_read_as_inflation(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=4, max_limit=8)
+        for _ in range(20):
+            limiter.on_result(0.003, 200, "GET", "accounts/balances")
+            limiter.on_result(0.03, 200, "POST", "admin/limiter-accounts/refill")
+
+        assert limiter.decreases == 0
+        assert limiter.limit > 4
+        assert limiter.stats()["baseline_latency"] == {
+            "GET accounts/balances": pytest.approx(0.003),
+            "POST admin/limiter-accounts/refill": pytest.approx(0.03),
+        }
+
+    def test_inflation_on_a_route_backs_off(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=4, max_limit=8)
+        limiter.on_result(0.003, 200, "GET", "accounts/balances")
+        limiter.on_result(0.03, 200, "POST", "journal-entries")
+        limiter.on_result(0.1, 200, "POST", "journal-entries")
+
+        assert limiter.decreases == 1
+        assert limiter.limit == 2
+
+    def test_failures_back_off(self):
+        limiter = AdaptiveConcurrencyLimiter(initial=4)
+        limiter.on_result(0.01, 503, "POST", "journal-entries")
+        assert limiter.limit == 2
+
+
+# ============================================================================
+# Test Class: Hedged GETs
+# ============================================================================
+
+
+class SlowFirstBalances:
+    """Stub balances endpoint whose first `slow` responses are held until finish() (at most 5s)."""
+
+    def __init__(self, slow=1):
+        self.slow = slow
+        self.calls = 0
+        self.in_flight = 0
+        self._released = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, method, path, body):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            slow = self.calls <= self.slow
+        if slow:
+            self._released.wait(5)
+        with self._lock:
+            self.in_flight -= 1
+        return 200, [{"account_code": "cash", "balance": 5, "currency": "INR"}]
+
+    def finish(self):
+        """Releases the held responses and waits for the abandoned attempts to complete."""
+        self._released.set()
+        while self.in_flight:
+            time.sleep(0.001)
+
+
+def counters(client):
+    return client.metrics.snapshot()["GET accounts/balances"]["counters"]
+
+
+class TestHedgedGets:
+    @pytest.mark.parametrize("hedge_after", [0.05, 2, "p95", "p99.9"])
+    def test_valid_hedge_after(self, hedge_after):
+        BookKeeperClient("http://bookkeeper.local", TENANT_ID, None, hedge_after=hedge_after).close()
+
+    @pytest.mark.parametrize("hedge_after", ["95", "p", "p0", "p100", "p95ms", -0.1, True])
+    def test_invalid_hedge_after_fails_at_construction(self, hedge_after):
+        with pytest.raises(ValueError, match="hedge_after"):
+            BookKeeperClient("http://bookkeeper.local", TENANT_ID, None, hedge_after=hedge_after)
+
+    def test_slow_get_is_hedged(self, stub_client):
+        balances = SlowFirstBalances()
+        client = stub_client(balances, TENANT_ID, hedge_after=0.02)
+
+        rows, status_code = client.get_account_balances(["cash"])
+        balances.finish()
+        assert (rows[0]["balance"], status_code) == (5, 200)
+        assert balances.calls == 2
+        assert counters(client) == {"hedges": 1, "hedge_wins": 1}
+
+    def test_fast_get_is_not_hedged(self, stub_client):
+        balances = SlowFirstBalances(slow=0)
+        client = stub_client(balances, TENANT_ID, hedge_after=0.2)
+
+        client.get_account_balances(["cash"])
+        assert balances.calls == 1
+        assert counters(client) == {}
+
+    def test_quantile_hedge_waits_for_samples(self, stub_client):
+        balances = SlowFirstBalances(slow=0)
+        client = stub_client(balances, TENANT_ID, hedge_after="p50", hedge_min_samples=5)
+        for _ in range(5):
+            client.get_account_balances(["cash"])
+        assert counters(client) == {}
+
+        # With five fast samples the p50 is a few milliseconds, so a slow call is hedged.
+        balances.slow, balances.calls = 1, 0
+        client.get_account_balances(["cash"])
+        balances.finish()
+        assert balances.calls == 2
+        assert counters(client)["hedges"] == 1
+
+    def test_deadline_exceeded(self, stub_client):
+        balances = SlowFirstBalances()
+        client = stub_client(balances, TENANT_ID)
+
+        started = time.monotonic()
+        with pytest.raises(requests.exceptions.Timeout, match="deadline"):
+            client.get_account_balances(["cash"], deadline=0.05)
+        assert time.monotonic() - started < 1
+        balances.finish()
+        assert counters(client) == {"deadline_exceeded": 1}
+
+    def test_deadline_met(self, stub_client):
+        client = stub_client(SlowFirstBalances(slow=0), TENANT_ID)
+        rows, _ = client.get_account_balances(["cash"], deadline=1.0)
+        assert rows[0]["balance"] == 5
+
+
+# ============================================================================
+# Test Class: Balance Coalescer
+# ============================================================================
+
+
+class RecordingFetch:
+    """Balance fetch that records the code lists it was called with; codes starting with "x" are unknown."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = []
+
+    def __call__(self, codes):
+        self.calls.append(codes)
+        if self.error is not None:
+            raise self.error
+        return [{"account_code": code, "balance": len(code)} for code in codes if not code.startswith("x")], 200
+
+
+def call_concurrently(call, code_lists):
+    """Calls call(codes) for every code list at once, one thread each; returns results or exceptions."""
+    barrier = threading.Barrier(len(code_lists))
+    results = [None] * len(code_lists)
+
+    def run(i):
+        barrier.wait()
+        try:
+            results[i] = call(code_lists[i])
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(code_lists))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+class TestBalanceCoalescer:
+    def test_concurrent_lookups_share_one_request(self):
+        coalescer = BalanceCoalescer(window=0.2)
+        fetch = RecordingFetch()
+        results = call_concurrently(lambda codes: coalescer.load(codes, fetch), [[f"a{i}", "shared"] for i in range(8)])
+
+        assert len(fetch.calls) == 1
+        assert sorted(fetch.calls[0]) == sorted([f"a{i}" for i in range(8)] + ["shared"])
+        for i, (rows, status_code) in enumerate(results):
+            assert status_code == 200
+            assert [row["account_code"] for row in rows] == [f"a{i}", "shared"]
+        assert coalescer.stats() == {"calls": 8, "requests": 1, "calls_per_request": 8.0}
+
+    def test_returns_own_rows_in_order_without_duplicates_or_unknown_codes(self):
+        rows, _ = BalanceCoalescer(window=0).load(["b", "xmissing", "a", "b"], RecordingFetch())
+        assert [row["account_code"] for row in rows] == ["b", "a"]
+
+    def test_full_batch_is_sent_without_waiting_for_the_window(self):
+        coalescer = BalanceCoalescer(window=5, max_codes=2)
+        started = time.monotonic()
+        coalescer.load(["a", "b"], RecordingFetch())
+        assert time.monotonic() - started < 1
+
+    def test_error_is_raised_in_every_caller(self):
+        coalescer = BalanceCoalescer(window=0.2)
+        fetch = RecordingFetch(requests.exceptions.ConnectionError("down"))
+        results = call_concurrently(lambda codes: coalescer.load(codes, fetch), [["a"], ["b"], ["c"]])
+        assert results == [fetch.error] * 3
+        assert len(fetch.calls) == 1
+
+    def test_client_coalesces_concurrent_balance_lookups(self, stub_client):
+        def balances(method, path, body):
+            return 200, [{"account_code": code, "balance": 1, "currency": "INR"} for code in "abcd"]
+
+        client = stub_client(balances, TENANT_ID, balance_coalesce_window=0.2)
+        results = call_concurrently(client.get_account_balances, [["a"], ["b"], ["c"], ["d"]])
+
+        assert [[row["account_code"] for row in rows] for rows, _ in results] == [["a"], ["b"], ["c"], ["d"]]
+        assert len(client.transport.requests) == 1
+        assert client.balance_coalescer.stats()["calls_per_request"] == 4.0
+
+    def test_client_does_not_coalesce_lookups_with_a_deadline(self, stub_client):
+        client = stub_client(lambda method, path, body: (200, []), TENANT_ID, balance_coalesce_window=5)
+        started = time.monotonic()
+        client.get_account_balances(["a"], deadline=1.0)
+        assert time.monotonic() - started < 1
+        assert client.balance_coalescer.stats()["calls"] == 0
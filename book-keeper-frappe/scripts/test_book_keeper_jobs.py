@@ -0,0 +1,187 @@
+"""
+Unit tests for the bulk ledger jobs in book_keeper_jobs.py.
+
+Tests cover:
+- PendingSweeper: voiding pending entries once their lease has expired, and the lease
+  a client with a PendingRegistry must have
+- LimiterRefillEngine: checkpointed runs, and resuming after a failed batch
+  without refilling any account twice
+- LimiterRefillEngine with an AdaptiveConcurrencyLimiter over delta_only runs, which
+  mix fast balance reads with slower refills
+
+Runs without book-keeper: a stub transport (conftest.py) answers the client's requests.
+"""
+
+import threading
+import time
+from collections import Counter
+from urllib.parse import parse_qs
+
+import pytest
+
+from book_keeper_client import (
+    AdaptiveConcurrencyLimiter,
+    BookKeeperClient,
+    Checkpoint,
+    JournalLeg,
+    PendingRegistry,
+    RefillAccount,
+)
+from book_keeper_jobs import LimiterRefillEngine, PendingSweeper
+
+TENANT_ID = "jobstenant"
+
+
+class RefillLedger:
+    """Stub balance and refill endpoints that credit limiter accounts and can fail chosen requests once.
+
+    Every limiter reads a zero balance; delays holds a response time per method.
+    """
+
+    def __init__(self, fail_once_for=()):
+        self.credited = Counter()
+        self.fail_once_for = set(fail_once_for)
+        self.delays = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, method, path, body):
+        time.sleep(self.delays.get(method, 0))
+        if (method, path) == ("GET", "accounts/balances"):
+            codes = parse_qs(body)["account_codes"]
+            return 200, [{"account_code": code, "balance": 0, "currency": "INR"} for code in codes]
+
+        assert (method, path) == ("POST", "admin/limiter-accounts/refill")
+        codes = [account["account_code"] for account in body["accounts_to_refill"]]
+        with self._lock:
+            failing = self.fail_once_for.intersection(codes)
+            if failing:
+                self.fail_once_for -= failing
+                return 503, {"detail": "unavailable"}
+            for account in body["accounts_to_refill"]:
+                self.credited[account["account_code"]] += account["amount"]
+        return 200, {"message": "Refilled"}
+
+
+class PendingLedger:
+    """Stub pending-journal-entries endpoints that record which entries were committed and voided."""
+
+    def __init__(self):
+        self.created = 0
+        self.finalized = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, method, path, body):
+        with self._lock:
+            if path == "pending-journal-entries":
+                self.created += 1
+                return 201, {"journal_id": f"p{self.created}"}
+            _, entry_id, action = path.split("/")
+            if entry_id in self.finalized:
+                return 409, {"detail": f"Pending entry already {self.finalized[entry_id]}"}
+            self.finalized[entry_id] = action
+        return 200, {"message": "ok"}
+
+
+def refills(count=100, amount=100):
+    return (RefillAccount(f"u{i}", amount, "INR") for i in range(count))
+
+
+# ============================================================================
+# Fixtures
+# ============================================================================
+
+
+@pytest.fixture
+def ledger():
+    return RefillLedger()
+
+
+@pytest.fixture
+def client(stub_client, ledger):
+    return stub_client(ledger, TENANT_ID)
+
+
+# ============================================================================
+# Test Class: PendingSweeper
+# ============================================================================
+
+
+class TestPendingSweeper:
+    def test_registry_needs_a_lease(self):
+        with pytest.raises(ValueError, match="pending_lease_seconds"):
+            BookKeeperClient("http://bookkeeper.local", TENANT_ID, None, pending_registry=PendingRegistry())
+
+    def test_voids_entries_whose_lease_expired(self, stub_client):
+        ledger = PendingLedger()
+        client = stub_client(ledger, TENANT_ID, pending_registry=PendingRegistry(), pending_lease_seconds=0.05)
+        sweeper = PendingSweeper(client)
+        debit, credit = [JournalLeg("wallet", 100, "INR")], [JournalLeg("merchant", 100, "INR")]
+
+        with client.two_phase("Cart 1", debit, credit, timeout_seconds=600):
+            pass
+        client.create_pending_journal_entry("Cart 2", debit, credit, 600)
+        assert sweeper.sweep_once() == 0
+
+        time.sleep(0.06)
+        assert sweeper.sweep_once() == 1
+        assert ledger.finalized == {"p1": "commit", "p2": "void"}
+        assert sweeper.stats() == {"outstanding": 0, "reclaimed": 1, "failed": 0}
+
+
+# ============================================================================
+# Test Class: LimiterRefillEngine
+# ============================================================================
+
+
+class TestLimiterRefillEngine:
+    def test_refills_every_account_once(self, client, ledger, tmp_path):
+        checkpoint = Checkpoint(str(tmp_path / "refill.json"))
+        stats = LimiterRefillEngine(client, batch_size=10, concurrency=4, checkpoint=checkpoint).run(refills())
+
+        assert stats["refilled"] == 100
+        assert stats["batches"] == 10
+        assert stats["errors"] == []
+        assert ledger.credited == {f"u{i}": 100 for i in range(100)}
+        assert checkpoint.load_state() == (100, [])
+
+    def test_resume_after_failed_batch_does_not_refill_twice(self, client, ledger, tmp_path):
+        ledger.fail_once_for = {"u0"}
+        checkpoint = Checkpoint(str(tmp_path / "refill.json"))
+
+        stats = LimiterRefillEngine(client, batch_size=10, concurrency=4, checkpoint=checkpoint).run(refills())
+        assert stats["failed_batches"] == 1
+        assert stats["offset"] == 0
+        assert "u0" not in ledger.credited
+        assert checkpoint.load_state() == (0, [(10, 100)])
+
+        sent = len(client.transport.requests)
+        stats = LimiterRefillEngine(client, batch_size=10, concurrency=4, checkpoint=checkpoint).run(refills())
+        assert stats["errors"] == []
+        assert stats["already_refilled"] == 90
+        assert stats["offset"] == 100
+        # Only the failed batch is sent again.
+        assert len(client.transport.requests) == sent + 1
+        assert ledger.credited == {f"u{i}": 100 for i in range(100)}
+
+    def test_resume_with_a_different_batch_size(self, client, ledger, tmp_path):
+        ledger.fail_once_for = {"u25"}
+        checkpoint = Checkpoint(str(tmp_path / "refill.json"))
+        LimiterRefillEngine(client, batch_size=10, concurrency=4, checkpoint=checkpoint).run(refills())
+        assert checkpoint.load_state() == (20, [(30, 100)])
+
+        stats = LimiterRefillEngine(client, batch_size=7, concurrency=4, checkpoint=checkpoint).run(refills())
+        assert stats["errors"] == []
+        assert stats["already_refilled"] == 70
+        assert ledger.credited == {f"u{i}": 100 for i in range(100)}
+
+    def test_limiter_keeps_a_baseline_per_route(self, client, ledger):
+        ledger.delays = {"GET": 0.003, "POST": 0.03}
+        limiter = AdaptiveConcurrencyLimiter(initial=4, max_limit=8)
+        stats = LimiterRefillEngine(client, batch_size=5, concurrency=limiter, delta_only=True).run(refills(80))
+
+        assert stats["errors"] == []
+        assert ledger.credited == {f"u{i}": 100 for i in range(80)}
+        # Refills are ten times slower than balance reads without being inflated.
+        baselines = limiter.stats()["baseline_latency"]
+        assert set(baselines) == {"GET accounts/balances", "POST admin/limiter-accounts/refill"}
+        assert limiter.limit > 1
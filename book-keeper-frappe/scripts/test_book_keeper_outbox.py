@@ -0,0 +1,168 @@
+"""
+Unit tests for the ledger outbox in book_keeper_outbox.py.
+
+Tests cover:
+- LedgerOutbox: ordering keys, outbox files written before ordering keys existed
+- OutboxDrainer: concurrency for writes sharing a house account, enqueue order per
+  ordering key, retries blocking only their own keys
+
+Runs without book-keeper: a stub transport (conftest.py) answers the client's requests.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+import pytest
+
+from book_keeper_client import JournalLeg
+from book_keeper_outbox import LedgerOutbox, OutboxDrainer
+
+TENANT_ID = "outboxtenant"
+
+
+class JournalLedger:
+    """Stub journal-entries endpoint that records delivery order and peak concurrency."""
+
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.fail_once_for = set()
+        self.delivered = defaultdict(list)
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, method, path, body):
+        assert (method, path) == ("POST", "journal-entries")
+        with self._lock:
+            if body["narration"] in self.fail_once_for:
+                self.fail_once_for.discard(body["narration"])
+                return 503, {"detail": "unavailable"}
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+            wallet = body["credit_legs"][0]["account_code"]
+            self.delivered[wallet].append(body["narration"])
+        return 201, {"message": "Journal entry created"}
+
+
+def top_up(client, wallet, narration, keyed=True):
+    return client.enqueue_journal_entry(
+        narration,
+        [JournalLeg("BANK_SUSPENSE", 100, "INR")],
+        [JournalLeg(wallet, 100, "INR")],
+        ordering_keys=[wallet] if keyed else None,
+    )
+
+
+# ============================================================================
+# Fixtures
+# ============================================================================
+
+
+@pytest.fixture
+def ledger():
+    return JournalLedger()
+
+
+@pytest.fixture
+def client(stub_client, ledger):
+    outbox = LedgerOutbox()
+    yield stub_client(ledger, TENANT_ID, outbox=outbox)
+    outbox.close()
+
+
+# ============================================================================
+# Test Class: LedgerOutbox
+# ============================================================================
+
+
+class TestLedgerOutbox:
+    def test_ordering_keys_default_to_account_codes(self):
+        outbox = LedgerOutbox()
+        outbox.enqueue(TENANT_ID, "journal-entries", {"n": 1}, ["BANK_SUSPENSE", "w1"])
+        outbox.enqueue(TENANT_ID, "journal-entries", {"n": 2}, ["BANK_SUSPENSE", "w2"], ordering_keys=["w2"])
+
+        first, second = outbox.head(TENANT_ID)
+        assert first.ordering_keys == ["BANK_SUSPENSE", "w1"]
+        assert second.account_codes == ["BANK_SUSPENSE", "w2"]
+        assert second.ordering_keys == ["w2"]
+        assert second.payload == {"n": 2}
+        outbox.close()
+
+    def test_opens_outbox_written_before_ordering_keys(self, tmp_path):
+        path = str(tmp_path / "outbox.db")
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "CREATE TABLE outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, tenant_id TEXT NOT NULL,"
+            " endpoint TEXT NOT NULL, payload BLOB NOT NULL, account_codes TEXT NOT NULL,"
+            " enqueued_at REAL NOT NULL, status TEXT NOT NULL DEFAULT 'queued',"
+            " attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL DEFAULT 0, last_error TEXT)"
+        )
+        conn.execute(
+            "INSERT INTO outbox (tenant_id, endpoint, payload, account_codes, enqueued_at) VALUES (?, ?, ?, ?, ?)",
+            (TENANT_ID, "journal-entries", "{}", '["w1"]', 0),
+        )
+        conn.commit()
+        conn.close()
+
+        outbox = LedgerOutbox(path)
+        outbox.enqueue(TENANT_ID, "journal-entries", {}, ["BANK_SUSPENSE", "w2"], ordering_keys=["w2"])
+        assert [item.ordering_keys for item in outbox.head(TENANT_ID)] == [["w1"], ["w2"]]
+        outbox.close()
+
+
+# ============================================================================
+# Test Class: OutboxDrainer
+# ============================================================================
+
+
+class TestOutboxDrainer:
+    def test_keyed_writes_sharing_a_house_account_run_concurrently(self, client, ledger):
+        for i in range(40):
+            top_up(client, f"w{i}", f"top-up {i}")
+        drainer = OutboxDrainer(client, concurrency=8)
+
+        assert len(drainer._waves(drainer._ready())) == 1
+        assert drainer.drain_once() == 40
+        assert ledger.peak > 1
+        assert client.outbox.depth(TENANT_ID) == 0
+
+    def test_unkeyed_writes_are_ordered_on_every_account(self, client, ledger):
+        for i in range(10):
+            top_up(client, f"w{i}", f"top-up {i}", keyed=False)
+        drainer = OutboxDrainer(client, concurrency=8)
+
+        # All ten share BANK_SUSPENSE, so each is its own wave.
+        assert len(drainer._waves(drainer._ready())) == 10
+        assert drainer.drain_once() == 10
+        assert ledger.peak == 1
+
+    def test_writes_sharing_a_key_are_delivered_in_order(self, client, ledger):
+        for i in range(5):
+            for wallet in ("w1", "w2", "w3"):
+                top_up(client, wallet, f"{wallet} #{i}")
+
+        assert OutboxDrainer(client, concurrency=8).drain_once() == 15
+        for wallet in ("w1", "w2", "w3"):
+            assert ledger.delivered[wallet] == [f"{wallet} #{i}" for i in range(5)]
+
+    def test_retry_blocks_only_its_own_key(self, client, ledger):
+        ledger.fail_once_for = {"w1 #0"}
+        for i in range(3):
+            for wallet in ("w1", "w2"):
+                top_up(client, wallet, f"{wallet} #{i}")
+        drainer = OutboxDrainer(client, concurrency=8, retry_backoff=0.05)
+
+        assert drainer.drain_once() == 3
+        assert drainer.retried == 1
+        assert ledger.delivered == {"w2": ["w2 #0", "w2 #1", "w2 #2"]}
+        # Later w1 writes wait behind the failed one.
+        assert drainer.drain_once() == 0
+
+        time.sleep(0.06)
+        assert drainer.drain_once() == 3
+        assert ledger.delivered["w1"] == ["w1 #0", "w1 #1", "w1 #2"]
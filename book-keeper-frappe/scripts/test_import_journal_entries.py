@@ -0,0 +1,116 @@
+"""
+Unit tests for the bulk journal importer in import_journal_entries.py.
+
+Tests cover:
+- MinorUnits conversion per currency exponent
+- group_entries: grouping consecutive rows, invalid legs, rows without an entry_ref,
+  entry_refs that come back after other entries
+- import_entries: rejected rows are reported and do not stop the import
+
+Runs without book-keeper: a stub transport (conftest.py) answers the client's requests.
+"""
+
+import io
+import json
+
+import pytest
+
+from import_journal_entries import MinorUnits, group_entries, import_entries, read_rows
+
+TENANT_ID = "importtenant"
+
+
+def row(entry_ref, account_code, side, amount="10.00", **fields):
+    values = {"entry_date": "2024-01-01", "narration": "Opening balance", "currency": "INR", **fields}
+    if entry_ref is not None:
+        values["entry_ref"] = entry_ref
+    return {"account_code": account_code, "side": side, "amount": amount, **values}
+
+
+def balanced(entry_ref, amount="10.00"):
+    return [row(entry_ref, "cash", "debit", amount), row(entry_ref, "equity", "credit", amount)]
+
+
+def grouped(rows, **options):
+    return list(group_entries(rows, 0, MinorUnits({}), False, "import:", **options))
+
+
+# ============================================================================
+# Test Class: MinorUnits
+# ============================================================================
+
+
+class TestMinorUnits:
+    def test_converts_with_currency_exponent(self):
+        to_minor = MinorUnits({"JPY": 0, "BHD": 3})
+        assert to_minor("1250.50", "INR") == 125050
+        assert to_minor("1250", "JPY") == 1250
+        assert to_minor("1.005", "BHD") == 1005
+
+    def test_rejects_extra_decimals(self):
+        with pytest.raises(ValueError, match="more decimals"):
+            MinorUnits({})("1.005", "INR")
+
+
+# ============================================================================
+# Test Class: group_entries
+# ============================================================================
+
+
+class TestGroupEntries:
+    def test_groups_consecutive_rows(self):
+        (offset_a, ref_a, entry_a, error_a), (offset_b, ref_b, entry_b, error_b) = grouped(
+            balanced("inv-1") + balanced("inv-2", "2.50")
+        )
+
+        assert (offset_a, ref_a, error_a) == (2, "inv-1", None)
+        assert entry_a.idempotency_key == "import:inv-1"
+        assert [leg.amount for leg in entry_a.debit_legs] == [1000]
+        assert (offset_b, ref_b, error_b) == (4, "inv-2", None)
+        assert [leg.amount for leg in entry_b.credit_legs] == [250]
+
+    def test_invalid_side_is_an_error(self):
+        [(offset, ref, entry, error)] = grouped([row("inv-1", "cash", "sideways"), row("inv-1", "equity", "credit")])
+        assert (offset, ref, entry) == (2, "inv-1", None)
+        assert error == "row 1: Invalid side 'sideways'"
+
+    def test_rows_without_entry_ref_are_rejected(self):
+        results = grouped(balanced("inv-1") + [row(None, "cash", "debit"), row("", "equity", "credit")])
+
+        assert results[0][3] is None
+        assert results[1] == (4, None, None, "rows 3-4: missing entry_ref")
+
+    def test_repeated_entry_ref_is_rejected(self):
+        results = grouped(balanced("inv-1") + balanced("inv-2") + balanced("inv-1"))
+
+        assert [error for _, _, _, error in results[:2]] == [None, None]
+        offset, ref, entry, error = results[2]
+        assert (offset, ref, entry) == (6, "inv-1", None)
+        assert "'inv-1' was already used by the entry ending at row 2" in error
+
+    def test_repeats_are_tracked_within_recent_refs(self):
+        results = grouped(balanced("inv-1") + balanced("inv-2") + balanced("inv-3") + balanced("inv-1"), recent_refs=2)
+        # inv-1 has left the window of the last two entries.
+        assert [error for _, _, _, error in results] == [None, None, None, None]
+
+
+# ============================================================================
+# Test Class: import_entries
+# ============================================================================
+
+
+class TestImportEntries:
+    def test_rejected_rows_are_reported_and_the_import_continues(self, stub_client):
+        client = stub_client(lambda method, path, body: (201, {"message": "Journal entry created"}), TENANT_ID)
+        lines = [json.dumps(r) for r in balanced("inv-1") + [row(None, "cash", "debit")] + balanced("inv-2")]
+        failures = io.StringIO()
+
+        rows = read_rows(io.StringIO("\n".join(lines)), "jsonl")
+        stats = import_entries(client, rows, MinorUnits({}), concurrency=2, failures=failures, progress_interval=60)
+
+        assert (stats["entries"], stats["rejected"], stats["offset"]) == (2, 1, 5)
+        [failure] = [json.loads(line) for line in failures.getvalue().splitlines()]
+        assert failure["entry_ref"] is None
+        assert failure["error"] == "row 3: missing entry_ref"
+        posted = [body["idempotency_key"] for _, _, body in client.transport.requests]
+        assert posted == ["import:inv-1", "import:inv-2"]
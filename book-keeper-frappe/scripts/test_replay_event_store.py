@@ -0,0 +1,177 @@
+"""
+Unit tests for the event store replay (replay_event_store.py).
+
+Tests cover:
+- Replaying posted, pending, committed and voided entries, and skipped events
+- Resuming a replay from the saved commit position
+- Point-in-time balances by entry_date and by recorded_at
+- Volume over date and timestamp ranges, including partial days
+
+Runs without book-keeper or KurrentDB: events are passed to replay() directly.
+"""
+
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from replay_event_store import LedgerStore, replay
+
+TENANT_ID = "replaytenant"
+
+
+def entry(debits, credits, entry_date, tenant_id=TENANT_ID, **extra):
+    """Builds an event payload in the shape of a journal entry request."""
+    return {
+        "tenant_id": tenant_id,
+        "entry_date": entry_date,
+        "debit_legs": [{"account_code": code, "amount": amount, "currency": "INR"} for code, amount in debits],
+        "credit_legs": [{"account_code": code, "amount": amount, "currency": "INR"} for code, amount in credits],
+        **extra,
+    }
+
+
+def event(position, event_type, payload, recorded_at):
+    data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+    return position, event_type, data, datetime.fromisoformat(recorded_at).replace(tzinfo=timezone.utc)
+
+
+# Posted on its entry_date, a backdated posting recorded days later, a pending entry
+# committed the next day, a voided one, and events that move nothing.
+EVENTS = [
+    event(10, "JournalEntryPosted", entry([("cash", 100)], [("revenue", 100)], "2024-03-01"), "2024-03-01T10:00:00"),
+    event(20, "JournalEntryPosted", entry([("cash", 50)], [("revenue", 50)], "2024-03-02"), "2024-03-05T23:30:00"),
+    event(
+        30,
+        "PendingJournalEntryCreated",
+        entry([("wallet", 40)], [("payable", 40)], "2024-03-03", journal_id="p1"),
+        "2024-03-03T12:00:00",
+    ),
+    event(40, "PendingJournalEntryCommitted", {"tenant_id": TENANT_ID, "journal_id": "p1"}, "2024-03-04T08:00:00"),
+    event(
+        50,
+        "PendingJournalEntryCreated",
+        entry([("wallet", 7)], [("payable", 7)], "2024-03-04", journal_id="p2"),
+        "2024-03-04T09:00:00",
+    ),
+    event(60, "PendingJournalEntryVoided", {"tenant_id": TENANT_ID, "journal_id": "p2"}, "2024-03-04T09:05:00"),
+    event(70, "JournalEntryPosted", b"{not json", "2024-03-04T10:00:00"),
+    event(80, "AccountCreated", {"tenant_id": TENANT_ID, "code": "cash"}, "2024-03-04T11:00:00"),
+    event(
+        90, "JournalEntryPosted", entry([("cash", 9)], [("revenue", 9)], "2024-03-01", "other"), "2024-03-01T10:00:00"
+    ),
+]
+
+
+def balances(store, codes, as_of, by="entry_date"):
+    return {row["account_code"]: row["balance"] for row in store.balances(TENANT_ID, codes, as_of, by)}
+
+
+# ============================================================================
+# Fixtures
+# ============================================================================
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LedgerStore(str(tmp_path / "ledger.db"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def replayed(store, capsys):
+    replay(store, EVENTS, batch_size=3, progress_interval=60)
+    capsys.readouterr()
+    return store
+
+
+# ============================================================================
+# Test Class: Replay
+# ============================================================================
+
+
+class TestReplay:
+    def test_stats_and_position(self, store, capsys):
+        stats = replay(store, EVENTS, batch_size=3, progress_interval=60)
+
+        assert {key: value for key, value in stats.items() if key != "elapsed_seconds"} == {
+            "events": 9,
+            "postings": 8,
+            "pending": 2,
+            "ignored": 1,
+            "undecodable": 1,
+            "unmatched": 0,
+        }
+        assert store.position == 90
+        assert "Skipping event at 70" in capsys.readouterr().err
+
+    def test_resume_from_saved_position(self, tmp_path, replayed, capsys):
+        path = str(tmp_path / "resumed.db")
+        # Stop between a pending entry and its commit; the reservation is kept in the store.
+        store = LedgerStore(path)
+        replay(store, EVENTS[:3], progress_interval=60)
+        store.close()
+
+        store = LedgerStore(path)
+        assert store.position == 30
+        replay(store, [e for e in EVENTS if e[0] > store.position], progress_interval=60)
+        capsys.readouterr()
+
+        codes = ["cash", "revenue", "wallet", "payable"]
+        assert balances(store, codes, None) == balances(replayed, codes, None)
+        store.close()
+
+    def test_commit_of_unknown_pending_entry(self, store):
+        payload = {"tenant_id": TENANT_ID, "journal_id": "x"}
+        stats = replay(store, [event(1, "PendingJournalEntryCommitted", payload, "2024-03-01T00:00:00")])
+        assert stats["unmatched"] == 1
+        assert store.position == 1
+
+
+# ============================================================================
+# Test Class: Queries
+# ============================================================================
+
+
+class TestQueries:
+    def test_balances_by_entry_date(self, replayed):
+        codes = ["cash", "revenue", "wallet"]
+        assert balances(replayed, codes, "2024-03-01") == {"cash": -100, "revenue": 100}
+        assert balances(replayed, codes, "2024-03-02") == {"cash": -150, "revenue": 150}
+        # The committed pending entry counts from its own entry_date; the voided one never does.
+        assert balances(replayed, codes, "2024-03-03") == {"cash": -150, "revenue": 150, "wallet": -40}
+        assert balances(replayed, codes, None) == {"cash": -150, "revenue": 150, "wallet": -40}
+
+    def test_balances_by_recorded_at(self, replayed):
+        codes = ["cash", "wallet"]
+        assert balances(replayed, codes, "2024-03-03", by="recorded_at") == {"cash": -100}
+        assert balances(replayed, codes, "2024-03-04", by="recorded_at") == {"cash": -100, "wallet": -40}
+        assert balances(replayed, codes, "2024-03-05T23:00:00Z", by="recorded_at") == {"cash": -100, "wallet": -40}
+        assert balances(replayed, codes, "2024-03-05T23:31:00Z", by="recorded_at") == {"cash": -150, "wallet": -40}
+
+    def test_balances_keep_input_order(self, replayed):
+        rows = replayed.balances(TENANT_ID, ["wallet", "cash"])
+        assert [row["account_code"] for row in rows] == ["wallet", "cash"]
+        assert rows[0] == {"account_code": "wallet", "currency": "INR", "balance": -40}
+
+    def test_volume_by_entry_date(self, replayed):
+        assert replayed.volume(TENANT_ID, "2024-03-02", "2024-03-03") == [
+            {"account_code": "cash", "currency": "INR", "debits": 50, "credits": 0, "legs": 1},
+            {"account_code": "payable", "currency": "INR", "debits": 0, "credits": 40, "legs": 1},
+            {"account_code": "revenue", "currency": "INR", "debits": 0, "credits": 50, "legs": 1},
+            {"account_code": "wallet", "currency": "INR", "debits": 40, "credits": 0, "legs": 1},
+        ]
+
+    def test_volume_over_partial_recorded_days(self, replayed):
+        # Starts after the first posting on 03-01 and ends before the backdated one on 03-05.
+        volume = replayed.volume(
+            TENANT_ID, "2024-03-01T12:00:00Z", "2024-03-05T12:00:00Z", ["cash", "wallet"], "recorded_at"
+        )
+        assert volume == [{"account_code": "wallet", "currency": "INR", "debits": 40, "credits": 0, "legs": 1}]
+
+        volume = replayed.volume(TENANT_ID, "2024-03-01T09:00:00Z", "2024-03-05", ["cash"], "recorded_at")
+        assert volume == [{"account_code": "cash", "currency": "INR", "debits": 150, "credits": 0, "legs": 2}]
+
+    def test_tenants_are_separate(self, replayed):
+        assert replayed.balances("other", ["cash"]) == [{"account_code": "cash", "currency": "INR", "balance": -9}]
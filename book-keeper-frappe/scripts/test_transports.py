@@ -0,0 +1,235 @@
+"""
+Unit tests for the local transports in book_keeper_transports.py.
+
+Tests cover:
+- ASGITransport: lifespan handling, request scope and body, responses, app errors
+  after and before a response was sent, timeouts
+- UnixSocketTransport: requests over a Unix domain socket, keep-alive reuse
+- BookKeeperClient with each transport mounted
+
+Runs without book-keeper: a stub ASGI app and a stub HTTP server stand in for it.
+"""
+
+import asyncio
+import json
+import os
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+from book_keeper_client import BookKeeperClient
+from book_keeper_transports import ASGITransport, UnixSocketTransport
+
+TENANT_ID = "transporttenant"
+BASE_URL = "http://bookkeeper.local"
+
+
+class StubApp:
+    """ASGI app that echoes the request; /error (or account code "broken") and /crash fail."""
+
+    def __init__(self):
+        self.events = []
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    self.events.append("startup")
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    self.events.append("shutdown")
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+
+        message = await receive()
+        path = scope["path"]
+        failing = path == "/error" or b"account_codes=broken" in scope["query_string"]
+        if path == "/crash":
+            raise RuntimeError("boom")
+        if path == "/slow":
+            await asyncio.sleep(1)
+
+        if failing:
+            status, body = 500, b"Internal Server Error"
+        elif path.endswith("/accounts/balances"):
+            status = 200
+            body = json.dumps([{"account_code": "cash", "balance": 5, "currency": "INR"}]).encode()
+        else:
+            status = 200
+            body = json.dumps(
+                {
+                    "method": scope["method"],
+                    "path": path,
+                    "query": scope["query_string"].decode(),
+                    "headers": {name.decode(): value.decode() for name, value in scope["headers"]},
+                    "body": message["body"].decode(),
+                }
+            ).encode()
+
+        await send(
+            {"type": "http.response.start", "status": status, "headers": [(b"content-type", b"application/json")]}
+        )
+        await send({"type": "http.response.body", "body": body})
+        if failing:
+            # Like Starlette's ServerErrorMiddleware: send the 500, then re-raise for the server to log.
+            raise RuntimeError("handler failed")
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        body = json.dumps([{"account_code": "cash", "balance": 7, "currency": "INR", "path": self.path}]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# ============================================================================
+# Fixtures
+# ============================================================================
+
+
+@pytest.fixture
+def app():
+    return StubApp()
+
+
+@pytest.fixture
+def asgi_session(app):
+    transport = ASGITransport(app)
+    session = requests.Session()
+    session.mount(BASE_URL, transport)
+    yield session, transport
+    session.close()
+
+
+@pytest.fixture
+def unix_server(tmp_path):
+    path = str(tmp_path / "book-keeper.sock")
+    server = _UnixHTTPServer(path, _StubHandler)
+    server.connections = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield path, server
+    server.shutdown()
+    server.server_close()
+    os.unlink(path)
+
+
+# ============================================================================
+# Test Class: ASGITransport
+# ============================================================================
+
+
+class TestASGITransport:
+    def test_request_scope_and_body(self, asgi_session):
+        session, _ = asgi_session
+        response = session.post(f"{BASE_URL}/api/items%20x?a=1&a=2", json={"amount": 5}, timeout=5)
+
+        assert response.status_code == 200
+        assert response.reason == "OK"
+        assert response.headers["Content-Type"] == "application/json"
+        echoed = response.json()
+        assert echoed["method"] == "POST"
+        assert echoed["path"] == "/api/items x"
+        assert echoed["query"] == "a=1&a=2"
+        assert echoed["headers"]["host"] == "bookkeeper.local"
+        assert json.loads(echoed["body"]) == {"amount": 5}
+
+    def test_lifespan_runs_on_first_use_and_close(self, app, asgi_session):
+        session, transport = asgi_session
+        assert app.events == []
+        session.get(f"{BASE_URL}/ping", timeout=5)
+        session.get(f"{BASE_URL}/ping", timeout=5)
+        assert app.events == ["startup"]
+
+        transport.close()
+        assert app.events == ["startup", "shutdown"]
+
+        # A later request starts the loop, and the app, again.
+        session.get(f"{BASE_URL}/ping", timeout=5)
+        assert app.events == ["startup", "shutdown", "startup"]
+        transport.close()
+
+    def test_app_error_after_response_returns_the_response(self, asgi_session):
+        session, _ = asgi_session
+        response = session.get(f"{BASE_URL}/error", timeout=5)
+        assert response.status_code == 500
+        assert response.text == "Internal Server Error"
+
+    def test_app_error_before_response_is_connection_error(self, asgi_session):
+        session, _ = asgi_session
+        with pytest.raises(requests.exceptions.ConnectionError, match="boom"):
+            session.get(f"{BASE_URL}/crash", timeout=5)
+
+    def test_timeout(self, asgi_session):
+        session, _ = asgi_session
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            session.get(f"{BASE_URL}/slow", timeout=(1, 0.05))
+
+    def test_client_raises_http_error_for_500(self, app):
+        transport = ASGITransport(app)
+        with BookKeeperClient(BASE_URL, TENANT_ID, None, transport=transport, breaker_failure_threshold=None) as client:
+            assert client.get_account_balances(["cash"]) == (
+                [{"account_code": "cash", "balance": 5, "currency": "INR"}],
+                200,
+            )
+            with pytest.raises(requests.exceptions.HTTPError) as excinfo:
+                client.get_account_balances(["broken"])
+        assert excinfo.value.response.status_code == 500
+
+
+# ============================================================================
+# Test Class: UnixSocketTransport
+# ============================================================================
+
+
+class TestUnixSocketTransport:
+    def test_requests_reuse_one_connection(self, unix_server):
+        socket_path, server = unix_server
+        session = requests.Session()
+        session.mount(BASE_URL, UnixSocketTransport(socket_path, pool_maxsize=2))
+        try:
+            for _ in range(3):
+                response = session.get(f"{BASE_URL}/api/x?a=1", timeout=5)
+                assert response.status_code == 200
+                assert response.json()[0]["path"] == "/api/x?a=1"
+        finally:
+            session.close()
+        assert server.connections == 1
+
+    def test_client_over_unix_socket(self, unix_server):
+        socket_path, _ = unix_server
+        transport = UnixSocketTransport(socket_path)
+        with BookKeeperClient(BASE_URL, TENANT_ID, None, transport=transport) as client:
+            rows, status_code = client.get_account_balances(["cash"])
+        assert status_code == 200
+        assert rows[0]["balance"] == 7
+        assert rows[0]["path"].startswith("/api/book-keeper/v1/accounts/balances?")
+
+    def test_missing_socket_is_connection_error(self, tmp_path):
+        session = requests.Session()
+        session.mount(BASE_URL, UnixSocketTransport(str(tmp_path / "missing.sock")))
+        try:
+            with pytest.raises(requests.exceptions.ConnectionError):
+                session.get(f"{BASE_URL}/ping", timeout=5)
+        finally:
+            session.close()